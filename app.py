@@ -10,7 +10,9 @@ API Documentation available at:
 - ReDoc: /redoc
 """
 
+import asyncio
 import logging
+import queue
 import sys
 import os
 from datetime import datetime
@@ -18,12 +20,15 @@ from typing import Optional
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 # Add src to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
 
 from src.api.recommendation_endpoint import HybridRecommendationSystem
+from src.ml.keyword_index import KeywordIndex
+from src.ml.early_exit import EarlyExitBackend
 
 # Configure logging
 logging.basicConfig(
@@ -134,6 +139,7 @@ class FeedbackResponse(BaseModel):
     reward: Optional[float]
     total_interactions: int
     linucb_weight: float
+    queue_position: Optional[int] = None
 
 class StatsResponse(BaseModel):
     """Response model for system statistics."""
@@ -143,6 +149,13 @@ class StatsResponse(BaseModel):
     current_alpha: float
     linucb_weight: float
     model_details: dict
+    feedback_queue: Optional[dict] = None
+    user_models: Optional[dict] = None
+    emotion_batcher: Optional[dict] = None
+    emotion_cache: Optional[dict] = None
+    keyword_index: Optional[dict] = None
+    emotion_cascade: Optional[dict] = None
+    emotion_early_exit: Optional[dict] = None
 
 class HealthResponse(BaseModel):
     """Response model for health check."""
@@ -183,9 +196,42 @@ app.add_middleware(
 
 # Initialize recommendation system with real YouTube service
 logger.info("Initializing Wellness Recommendation System...")
-recommendation_system = HybridRecommendationSystem()
+recommendation_system = HybridRecommendationSystem(
+    # e.g. LINUCB_CHECKPOINT_DIR=./models logs every update and snapshots in the background
+    checkpoint_dir=os.environ.get('LINUCB_CHECKPOINT_DIR'),
+    # LINUCB_ASYNC_FEEDBACK=1 acknowledges feedback immediately and applies it in batches
+    async_feedback=os.environ.get('LINUCB_ASYNC_FEEDBACK', '0') == '1',
+    # e.g. LINUCB_SHARED_MEMORY=wellness_linucb with `uvicorn app:app --workers 4`
+    shared_memory_name=os.environ.get('LINUCB_SHARED_MEMORY'),
+    # e.g. LINUCB_USER_MODELS=./models/user_models.sqlite
+    user_model_path=os.environ.get('LINUCB_USER_MODELS'),
+    user_model_capacity=int(os.environ.get('LINUCB_USER_MODEL_CAPACITY', 50_000)),
+    # EMOTION_BATCHING=1 coalesces concurrent emotion detections; EMOTION_BATCH_WAIT_MS trades latency for batch size
+    emotion_batching=os.environ.get('EMOTION_BATCHING', '0') == '1',
+    emotion_batch_size=int(os.environ.get('EMOTION_BATCH_SIZE', 32)),
+    emotion_batch_wait_ms=float(os.environ.get('EMOTION_BATCH_WAIT_MS', 5.0)),
+    # e.g. EMOTION_CACHE_SIZE=10000 lets repeated moods skip inference; EMOTION_CACHE_PATH (sqlite) keeps it warm across restarts
+    emotion_cache_size=int(os.environ.get('EMOTION_CACHE_SIZE', 0)),
+    emotion_cache_ttl=float(os.environ.get('EMOTION_CACHE_TTL', 24 * 3600)),
+    emotion_cache_path=os.environ.get('EMOTION_CACHE_PATH'),
+    # EMOTION_BACKEND=onnx runs the classifier as int8 ONNX on CPU-only nodes (exported once to ./models/onnx)
+    # EMOTION_BACKEND=early_exit stops confident texts at an intermediate layer (scripts/train_emotion_model.py --exit-heads)
+    emotion_backend=os.environ.get('EMOTION_BACKEND', 'torch'),
+    emotion_exit_threshold=float(os.environ.get('EMOTION_EXIT_THRESHOLD', 0.9)),
+    # EMOTION_CLASSIFIER=shared drops DistilBERT for a head on KeyBERT's encoder (scripts/train_emotion_head.py)
+    emotion_classifier=os.environ.get('EMOTION_CLASSIFIER', 'distilbert'),
+    # e.g. EMOTION_KEYWORD_INDEX=./models/keyword_index (scripts/build_keyword_index.py)
+    emotion_keyword_index=os.environ.get('EMOTION_KEYWORD_INDEX'),
+    # EMOTION_CASCADE=1 answers rule-decided texts without the classifier (see scripts/evaluate_nlp.py --cascade)
+    emotion_cascade=os.environ.get('EMOTION_CASCADE', '0') == '1'
+)
 logger.info("System initialized successfully!")
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Drain background workers and persist LinUCB learning (when checkpointing is enabled) on server stop."""
+    recommendation_system.shutdown()
+
 # ═══════════════════════════════════════════════════════════
 # ENDPOINTS
 # ═══════════════════════════════════════════════════════════
@@ -216,7 +262,8 @@ async def health_check():
     try:
         # Check components
         components = {
-            "emotion_detector": "healthy",
+            "emotion_detector": (f"healthy ({recommendation_system.emotion_detector.backend.name})"
+                                 if recommendation_system.emotion_detector.backend else "healthy (shared encoder)"),
             "linucb_recommender": "healthy",
             "youtube_service": "healthy (mock)" if recommendation_system.youtube else "unavailable",
             "feature_normalizer": "healthy"
@@ -260,7 +307,12 @@ async def detect_emotion(request: EmotionRequest):
     logger.info(f"Emotion detection request: '{request.text[:50]}...'")
     
     try:
-        emotion, confidence, keywords = recommendation_system.detect_emotion_and_context(request.text)
+        if recommendation_system.emotion_batcher is not None:
+            # Await the batch without holding the event loop, so concurrent requests can join it
+            emotion, confidence, keywords = await asyncio.wrap_future(
+                recommendation_system.emotion_batcher.submit(request.text))
+        else:
+            emotion, confidence, keywords = recommendation_system.detect_emotion_and_context(request.text)
         
         logger.info(f"Detected: {emotion} (confidence: {confidence:.3f})")
         
@@ -270,6 +322,9 @@ async def detect_emotion(request: EmotionRequest):
             confidence=round(confidence, 4),
             keywords=keywords
         )
+    except queue.Full:
+        logger.warning("Emotion batch queue full; rejecting request")
+        raise HTTPException(status_code=503, detail="Emotion detection is overloaded, retry later")
     except Exception as e:
         logger.error(f"Emotion detection failed: {e}")
         raise HTTPException(status_code=500, detail=f"Emotion detection failed: {str(e)}")
@@ -303,7 +358,9 @@ async def get_recommendations(request: RecommendationRequest):
     logger.info(f"Recommendation request from user '{request.user_id}': '{request.user_input[:50]}...'")
     
     try:
-        result = recommendation_system.get_recommendations(
+        # Worker thread: the pipeline blocks on emotion detection (batched with other requests) and YouTube
+        result = await run_in_threadpool(
+            recommendation_system.get_recommendations,
             user_input=request.user_input,
             user_id=request.user_id,
             category=request.category,
@@ -385,8 +442,12 @@ async def submit_feedback(request: FeedbackRequest):
             status=result['status'],
             reward=result.get('reward'),
             total_interactions=result.get('total_interactions', 0),
-            linucb_weight=result.get('linucb_weight', 0.2)
+            linucb_weight=result.get('linucb_weight', 0.2),
+            queue_position=result.get('queue_position')
         )
+    except queue.Full:
+        logger.warning("Feedback queue full; rejecting feedback")
+        raise HTTPException(status_code=503, detail="Feedback queue is full, retry later")
     except Exception as e:
         logger.error(f"Feedback processing failed: {e}")
         raise HTTPException(status_code=500, detail=f"Feedback processing failed: {str(e)}")
@@ -416,7 +477,23 @@ async def get_stats():
             models_trained=stats['models_trained'],
             current_alpha=stats['current_alpha'],
             linucb_weight=recommendation_system._get_linucb_weight(),
-            model_details=stats['model_details']
+            model_details=stats['model_details'],
+            feedback_queue=(recommendation_system.feedback_queue.metrics()
+                            if recommendation_system.feedback_queue else None),
+            user_models=(recommendation_system.user_models.stats()
+                         if recommendation_system.user_models else None),
+            emotion_batcher=(recommendation_system.emotion_batcher.metrics()
+                             if recommendation_system.emotion_batcher else None),
+            emotion_cache=(recommendation_system.emotion_cache.stats()
+                           if recommendation_system.emotion_cache else None),
+            keyword_index=(recommendation_system.emotion_detector.keybert_model.stats()
+                           if isinstance(recommendation_system.emotion_detector.keybert_model, KeywordIndex)
+                           else None),
+            emotion_cascade=(recommendation_system.emotion_detector.cascade_stats()
+                             if recommendation_system.emotion_detector.cascade else None),
+            emotion_early_exit=(recommendation_system.emotion_detector.backend.stats()
+                                if isinstance(recommendation_system.emotion_detector.backend, EarlyExitBackend)
+                                else None)
         )
     except Exception as e:
         logger.error(f"Stats retrieval failed: {e}")
@@ -0,0 +1,124 @@
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.rl.linucb_recommender import CATEGORIES, CONTEXT_DIM, EMOTIONS, LinUCBRecommender
+from src.rl.context_pipeline import ContextPipeline
+from src.utils.metrics import LatencyRecorder
+
+class HighDimTraffic:
+    """
+    Seeded linear bandit over the base context plus `ext_dim` extended features.
+
+    Extended features mimic title embeddings: unit vectors spanned by a `latent`-dim
+    subspace plus isotropic noise. Expected reward is linear in the base context and
+    in the latent coordinates, so a model needs the extended features to do well.
+    """
+    def __init__(self, ext_dim=400, latent=16, n_videos=2000, candidates=12, noise=0.1, seed=0):
+        rng = np.random.default_rng(seed)
+        self.rng = rng
+        self.candidates = candidates
+        self.noise = noise
+        basis = rng.normal(size=(latent, ext_dim))
+        codes = rng.normal(size=(n_videos, latent))
+        emb = codes @ basis + 0.3 * rng.normal(size=(n_videos, ext_dim))
+        self.embeddings = emb / np.linalg.norm(emb, axis=1, keepdims=True)
+        self.video_features = rng.uniform(0.0, 1.0, size=(n_videos, 5))
+        self.w_base = rng.normal(scale=0.3, size=CONTEXT_DIM)
+        self.w_ext = rng.normal(size=ext_dim)
+        self.w_ext *= 2.0 / np.abs(self.embeddings @ self.w_ext).max()
+
+    def request(self):
+        rng = self.rng
+        emotion = EMOTIONS[rng.integers(len(EMOTIONS))]
+        category = CATEGORIES[rng.integers(len(CATEGORIES))]
+        videos = rng.choice(len(self.embeddings), size=self.candidates, replace=False)
+        user = {'avg_feedback': rng.uniform(-1, 1), 'interaction_count': rng.integers(200), 'success_rate': rng.random()}
+        return emotion, category, videos, user
+
+def run_config(name, traffic_seed, requests, context_dim, covariance, rank, pipeline, ext_dim, seed):
+    traffic = HighDimTraffic(ext_dim=ext_dim, seed=traffic_seed)
+    rec = LinUCBRecommender(context_dim=context_dim, alpha=0.5, covariance=covariance, rank=rank)
+    score_latency, update_latency = LatencyRecorder(seed=seed), LatencyRecorder(seed=seed + 1)
+    regret = 0.0
+    for _ in range(requests):
+        emotion, category, videos, user = traffic.request()
+        base = rec.build_context_matrix(emotion, category, traffic.video_features[videos], user)
+        ext = traffic.embeddings[videos]
+        expected = base @ traffic.w_base + ext @ traffic.w_ext
+
+        if pipeline == 'raw':
+            X = np.hstack([base, ext])
+        elif pipeline == 'base':
+            X = base
+        else:
+            X = pipeline.transform(base, ext)
+
+        start = time.perf_counter()
+        _, _, ucb = rec.score_batch(emotion, category, X)
+        score_latency.add(time.perf_counter() - start)
+        choice = int(np.argmax(ucb))
+        reward = expected[choice] + traffic.rng.normal(scale=traffic.noise)
+
+        start = time.perf_counter()
+        rec.update(emotion, category, X[choice].reshape(-1, 1), reward)
+        update_latency.add(time.perf_counter() - start)
+        regret += expected.max() - expected[choice]
+
+    registry = rec.registry
+    return {
+        'config': name,
+        'context_dim': context_dim,
+        'covariance': covariance,
+        'models': len(registry),
+        'bytes_per_model': registry.parameter_bytes // registry.capacity,
+        'registry_bytes': registry.parameter_bytes,
+        'cumulative_regret': regret,
+        'mean_regret': regret / requests,
+        'score': score_latency.summary(),
+        'update': update_latency.summary(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs low-rank covariance and raw vs projected contexts for high-dimensional LinUCB.")
+    parser.add_argument('--ext-dim', type=int, default=400)
+    parser.add_argument('--out-dim', type=int, default=32)
+    parser.add_argument('--rank', type=int, default=16)
+    parser.add_argument('--method', choices=['hash', 'projection'], default='projection')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    pipeline = ContextPipeline(args.ext_dim, args.out_dim, method=args.method, seed=args.seed)
+    raw_dim = CONTEXT_DIM + args.ext_dim
+    configs = [
+        ('base-only full', CONTEXT_DIM, 'full', 'base'),
+        (f'raw d={raw_dim} full', raw_dim, 'full', 'raw'),
+        (f'raw d={raw_dim} lowrank', raw_dim, 'lowrank', 'raw'),
+        (f'{args.method} d={pipeline.context_dim} full', pipeline.context_dim, 'full', pipeline),
+        (f'{args.method} d={pipeline.context_dim} lowrank', pipeline.context_dim, 'lowrank', pipeline),
+    ]
+
+    results = []
+    print(f"{'config':<28} {'KB/model':>9} {'update us':>10} {'score us':>9} {'regret':>9}")
+    for name, dim, covariance, source in configs:
+        r = run_config(name, args.seed, args.requests, dim, covariance, min(args.rank, dim), source, args.ext_dim, args.seed)
+        results.append(r)
+        print(f"{name:<28} {r['bytes_per_model'] / 1024:>9.1f} {r['update']['mean_us']:>10.1f} "
+              f"{r['score']['mean_us']:>9.1f} {r['mean_regret']:>9.4f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Build the vocabulary embedding index used for keyword extraction
+(EmotionDetector(keyword_index=...), EMOTION_KEYWORD_INDEX).
+
+The vocabulary is every unigram KeyBERT would consider as a candidate
+(CountVectorizer, English stop words) that appears at least --min-count times
+in the emotion dataset, plus the EmotionValidator keyword lists. Each word is
+embedded once with KeyBERT's sentence encoder and written as a float32 matrix
+that the server memory-maps.
+"""
+import os
+import sys
+import argparse
+from collections import Counter
+from datasets import load_dataset
+from keybert import KeyBERT
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from scripts.train_emotion_model import DATASET_NAME
+from src.ml.emotion_head import ENCODER_NAME
+from src.ml.emotion_validator import EmotionValidator
+from src.ml.keyword_index import INDEX_PATH, KeywordIndex
+
+def build_vocabulary(texts, min_count=2, max_words=50_000):
+    analyzer = CountVectorizer(ngram_range=(1, 1), stop_words='english').build_analyzer()
+    counts = Counter(word for text in texts for word in analyzer(text))
+    words = [word for word, count in counts.most_common(max_words) if count >= min_count]
+
+    validator = EmotionValidator()
+    for keywords in (validator.stress_keywords, validator.anxiety_keywords, validator.anger_keywords,
+                     validator.sadness_keywords, validator.happy_keywords):
+        for phrase in keywords:
+            words.extend(analyzer(phrase))
+    return list(dict.fromkeys(words))
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute keyword candidate embeddings")
+    parser.add_argument('--encoder', default=ENCODER_NAME, help="Sentence encoder (must match KeyBERT's)")
+    parser.add_argument('--output', default=INDEX_PATH, help="Index prefix (<output>.npy, <output>.vocab.txt)")
+    parser.add_argument('--min-count', type=int, default=2)
+    parser.add_argument('--max-words', type=int, default=50_000)
+    args = parser.parse_args()
+
+    print("Loading dataset...")
+    dataset = load_dataset(DATASET_NAME)
+    texts = [text for split in dataset.values() for text in split["text"]]
+
+    words = build_vocabulary(texts, args.min_count, args.max_words)
+    print(f"Vocabulary: {len(words)} words")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    print(f"Embedding with {args.encoder}...")
+    index = KeywordIndex.build(KeyBERT(args.encoder).model, words, args.output)
+    print(f"Saved {len(index)} x {index.matrix.shape[1]} embeddings to {args.output}.npy")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import sys
+import os
+import argparse
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.rl.linucb_recommender import LinUCBRecommender
+from src.rl.snapshot import read_snapshot
+
+def convert(pkl_path, snapshot_path, context_dim=19):
+    """Convert a pickled linucb_models.pkl into the binary snapshot format."""
+    if not os.path.exists(pkl_path):
+        raise FileNotFoundError(pkl_path)
+        
+    recommender = LinUCBRecommender(context_dim=context_dim)
+    recommender.load(pkl_path)
+    recommender.save_snapshot(snapshot_path)
+    
+    # Round-trip check with full checksum verification
+    registry, header = read_snapshot(snapshot_path, verify=True)
+    print(f"Converted {header['n_models']} models ({header['total_interactions']} interactions) -> {snapshot_path}")
+    return header
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert LinUCB pickle state to the binary snapshot format.")
+    parser.add_argument('--input', default='./models/linucb_models.pkl')
+    parser.add_argument('--output', default='./models/linucb_state.snap')
+    parser.add_argument('--context-dim', type=int, default=19)
+    args = parser.parse_args()
+    convert(args.input, args.output, args.context_dim)
+
+if __name__ == "__main__":
+    main()
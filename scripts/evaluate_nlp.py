@@ -1,6 +1,7 @@
 
 import sys
 import os
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -10,10 +11,100 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT_DIR)
 
 from src.ml.emotion_detector import EmotionDetector
+from src.ml.inference_backend import BACKENDS, TorchBackend
+from src.ml.early_exit import EXIT_THRESHOLD, EarlyExitBackend
 
-def evaluate_emotion_system():
+def benchmark_batch_throughput(detector, texts, repeats=20):
+    """Compare single-text and batched inference on the same texts (CPU throughput + agreement)."""
+    workload = texts * repeats
+    
+    start = time.perf_counter()
+    single = [detector.predict_emotion(text) for text in workload]
+    single_secs = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    batched = detector.predict_emotion_batch(workload)
+    batch_secs = time.perf_counter() - start
+    
+    mismatches = sum(a[0] != b[0] or a[2] != b[2] or abs(a[1] - b[1]) > 1e-6 for a, b in zip(single, batched))
+    print(f"\n⚡ Throughput on {len(workload)} texts: single {len(workload) / single_secs:.1f}/s, "
+          f"batched {len(workload) / batch_secs:.1f}/s ({single_secs / batch_secs:.1f}x), {mismatches} mismatches")
+
+def compare_backends(detector, texts, repeats=20):
+    """Parity (raw label + system emotion agreement) and CPU latency of detector.backend vs PyTorch."""
+    import torch
+    backends = {'torch': TorchBackend(detector.model), detector.backend.name: detector.backend}
+    encoded = [detector.tokenizer(text, return_tensors="pt", truncation=True) for text in texts]
+    
+    probs, latency = {}, {}
+    for name, backend in backends.items():
+        probs[name] = np.vstack([torch.softmax(backend.logits(inputs), dim=-1)[0].numpy() for inputs in encoded])
+        timings = []
+        for _ in range(repeats):
+            for inputs in encoded:
+                start = time.perf_counter()
+                backend.logits(inputs)
+                timings.append(time.perf_counter() - start)
+        latency[name] = np.array(timings) * 1000.0
+    
+    reference = detector.backend
+    detector.backend = backends['torch']
+    torch_emotions = [r[0] for r in detector.predict_emotion_batch(texts)]
+    detector.backend = reference
+    backend_emotions = [r[0] for r in detector.predict_emotion_batch(texts)]
+    
+    name = reference.name
+    label_agreement = np.mean(probs['torch'].argmax(1) == probs[name].argmax(1))
+    emotion_agreement = np.mean([a == b for a, b in zip(torch_emotions, backend_emotions)])
+    print(f"\n🔁 Backend parity ({name} vs torch) on {len(texts)} texts: "
+          f"label agreement {label_agreement:.2%}, system emotion agreement {emotion_agreement:.2%}, "
+          f"max |Δp| {np.abs(probs['torch'] - probs[name]).max():.4f}")
+    for backend_name, ms in latency.items():
+        print(f"   {backend_name:>5}: p50 {np.percentile(ms, 50):.1f} ms, p95 {np.percentile(ms, 95):.1f} ms per text")
+    print(f"   speedup (p50): {np.percentile(latency['torch'], 50) / np.percentile(latency[name], 50):.1f}x")
+    return label_agreement
+
+def evaluate_cascade(detector, texts, repeats=5):
+    """Share of texts the rule-first cascade answers, latency saved and emotion agreement with the full pipeline."""
+    cache, cascade = detector.cache, detector.cascade
+    detector.cache = None  # Time inference, not cache hits
+    timings = {}
+    outputs = {}
+    for mode in (False, True):
+        detector.cascade = mode
+        outputs[mode] = [detector.predict_emotion(text) for text in texts]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                detector.predict_emotion(text)
+        timings[mode] = (time.perf_counter() - start) / (repeats * len(texts)) * 1000.0
+    detector.cache, detector.cascade = cache, cascade
+    
+    decided = [detector.validator.decide(text) is not None for text in texts]
+    agreement = np.mean([a[0] == b[0] for a, b in zip(outputs[False], outputs[True])])
+    rule_agreement = np.mean([a[0] == b[0] for a, b, d in zip(outputs[False], outputs[True], decided) if d]) if any(decided) else 1.0
+    print(f"\n🪜 Rule-first cascade on {len(texts)} texts: {np.mean(decided):.1%} short-circuited, "
+          f"{timings[False]:.1f} -> {timings[True]:.1f} ms per text ({timings[False] - timings[True]:.1f} ms saved), "
+          f"emotion agreement {agreement:.2%} overall / {rule_agreement:.2%} on rule-decided texts")
+    return agreement
+
+def report_early_exit(detector, texts, thresholds=(0.8, 0.9, 0.95, 0.99)):
+    """Per-exit-layer traffic, average layers run and label agreement with the full model, per threshold."""
+    full = TorchBackend(detector.model)
+    encoded = [detector.tokenizer(text, return_tensors="pt", truncation=True) for text in texts]
+    reference = np.array([full.logits(inputs)[0].argmax().item() for inputs in encoded])
+    print(f"\n🚪 Early exit on {len(texts)} texts (exits after layers {detector.backend.heads.exit_layers}):")
+    for threshold in thresholds:
+        backend = EarlyExitBackend(detector.model, detector.backend.heads, threshold)
+        predicted = np.array([backend.logits(inputs)[0].argmax().item() for inputs in encoded])
+        stats = backend.stats()
+        share = ", ".join(f"L{layer} {count / len(texts):.0%}" for layer, count in stats['exits'].items())
+        print(f"   threshold {threshold}: {share} | avg layers {stats['avg_layers']:.2f} | "
+              f"agreement with full model {np.mean(predicted == reference):.2%}")
+
+def evaluate_emotion_system(backend='torch', cascade=False, exit_threshold=EXIT_THRESHOLD):
     print("🚀 Initializing Realistic Emotion Evaluation (System-Aligned)...")
-    detector = EmotionDetector()
+    detector = EmotionDetector(backend=backend, exit_threshold=exit_threshold)
     
     # These labels match the 'system_emotion' output defined in detector.map_to_system_emotion
     test_data = [
@@ -32,9 +123,18 @@ def evaluate_emotion_system():
         ("Just a quiet evening.", "calm"), # neutral -> calm
     ]
     
+    texts = [text for text, _ in test_data]
+    predictions = detector.predict_emotion_batch(texts)
+    benchmark_batch_throughput(detector, texts)
+    if detector.backend.name != 'torch':
+        compare_backends(detector, texts)
+    if isinstance(detector.backend, EarlyExitBackend):
+        report_early_exit(detector, texts)
+    if cascade:
+        evaluate_cascade(detector, texts)
+    
     results = []
-    for text, expected in test_data:
-        pred, conf, kws = detector.predict_emotion(text)
+    for (text, expected), (pred, conf, kws) in zip(test_data, predictions):
         results.append({
             "Text": text,
             "Expected": expected,
@@ -71,4 +171,13 @@ def evaluate_emotion_system():
         print("📝 Updated PROJECT_REPORT.md with realistic accuracy.")
 
 if __name__ == "__main__":
-    evaluate_emotion_system()
+    import argparse
+    parser = argparse.ArgumentParser(description="Evaluate the emotion detector on the system-aligned set")
+    parser.add_argument('--backend', choices=BACKENDS, default='torch',
+                        help="Classifier backend; 'onnx' and 'early_exit' also report parity and latency against PyTorch")
+    parser.add_argument('--exit-threshold', type=float, default=EXIT_THRESHOLD,
+                        help="Softmax confidence at which the early_exit backend stops a text")
+    parser.add_argument('--cascade', action='store_true',
+                        help="Also report how much traffic the rule-first cascade short-circuits")
+    args = parser.parse_args()
+    evaluate_emotion_system(backend=args.backend, cascade=args.cascade, exit_threshold=args.exit_threshold)
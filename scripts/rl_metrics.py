@@ -1,38 +1,65 @@
-import numpy as np
-import matplotlib.pyplot as plt
+import sys
 import os
+import json
+import argparse
+import matplotlib.pyplot as plt
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.rl.offline_eval import sweep
+from src.utils.metrics import StreamingMean
 
 class LinUCBEvaluator:
-    def __init__(self):
-        self.rewards = []
-        
+    """
+    Streaming reward metrics in constant memory.
+
+    The learning curve keeps at most `max_points` cumulative-reward samples: when
+    it fills up every other point is dropped and the sampling stride doubles.
+    """
+    def __init__(self, max_points=2048):
+        self.stats = StreamingMean()
+        self.cumulative_reward = 0.0
+        self.successes = 0
+        self.max_points = max_points
+        self.stride = 1
+        self.curve = []  # (interaction index, cumulative reward)
+
     def log_interaction(self, reward):
-        self.rewards.append(reward)
-        
+        self.stats.add(reward)
+        self.cumulative_reward += reward
+        if reward > 0:
+            self.successes += 1
+        if self.stats.count % self.stride == 0:
+            self.curve.append((self.stats.count, self.cumulative_reward))
+            if len(self.curve) >= self.max_points:
+                self.curve = self.curve[1::2]
+                self.stride *= 2
+
     def get_metrics(self):
-        total = len(self.rewards)
+        total = self.stats.count
         if total == 0:
             return {'total': 0, 'cumulative_reward': 0, 'success_rate': 0.0}
-            
-        cum_reward = sum(self.rewards)
-        success_rate = len([r for r in self.rewards if r > 0]) / total
-        
+
         return {
             'total': total,
-            'cumulative_reward': cum_reward,
-            'success_rate': success_rate
+            'cumulative_reward': self.cumulative_reward,
+            'success_rate': self.successes / total,
+            'mean_reward': self.stats.mean,
+            'reward_std': self.stats.summary()['std']
         }
-        
+
     def plot_learning_curve(self, save_path='./evaluation/learning_curve.png'):
-        if not self.rewards:
+        if not self.curve:
             return
-            
+
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        
-        cumulative = np.cumsum(self.rewards)
-        
+
+        steps, cumulative = zip(*self.curve)
+
         plt.figure(figsize=(10, 5))
-        plt.plot(cumulative, label='Cumulative Reward')
+        plt.plot(steps, cumulative, label='Cumulative Reward')
         plt.title('LinUCB Learning Curve')
         plt.xlabel('Interactions')
         plt.ylabel('Reward')
@@ -40,3 +67,28 @@ class LinUCBEvaluator:
         plt.grid(True)
         plt.savefig(save_path)
         plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay / IPS / DR evaluation of LinUCB over a parameter grid.")
+    parser.add_argument('--log', required=True, help='Impression log (.npz, see src.rl.offline_eval.ImpressionLog)')
+    parser.add_argument('--alphas', type=float, nargs='+', default=[0.25, 0.5, 1.0, 2.0])
+    parser.add_argument('--lambdas', type=float, nargs='+', default=[0.95, 0.99, 1.0])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    report = sweep(args.log, args.alphas, args.lambdas, workers=args.workers)
+    print(f"{'alpha':>6} {'lambda':>7} {'match':>6} {'replay':>8} {'ips':>8} {'dr':>8} {'ev/s':>9}")
+    for r in report['results']:
+        print(f"{r['alpha']:>6.2f} {r['lambda_forget']:>7.3f} {r['match_rate']:>6.1%} {r['replay']['mean']:>8.4f} "
+              f"{r['ips']['mean']:>8.4f} {r['dr']['mean']:>8.4f} {r['events_per_sec']:>9.0f}")
+    print(f"{report['configs']} configs, {report['events']} events in {report['seconds']:.1f}s "
+          f"({report['events_per_sec']:.0f} events/sec)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
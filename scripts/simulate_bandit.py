@@ -0,0 +1,67 @@
+import sys
+import os
+import json
+import argparse
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.rl.linucb_recommender import CONTEXT_DIM, LinUCBRecommender
+from src.rl.simulator import BanditSimulator
+from src.rl.user_models import UserModelStore
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded synthetic traffic benchmark for LinUCB (headless).")
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--videos', type=int, default=5000)
+    parser.add_argument('--candidates', type=int, default=12)
+    parser.add_argument('--requests', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', choices=['linucb', 'random'], default='linucb')
+    parser.add_argument('--user-models', type=int, default=0, metavar='CAPACITY',
+                        help='Hybrid LinUCB with this many resident per-user models (0 = shared models only)')
+    parser.add_argument('--user-store', default=None, help='sqlite file for spilled user models (default: in memory)')
+    parser.add_argument('--precision', choices=['float64', 'float32'], default='float64')
+    parser.add_argument('--compare-precision', choices=['float64', 'float32'], default=None,
+                        help='Shadow a recommender in this precision and report ranking agreement')
+    parser.add_argument('--trace-memory', action='store_true')
+    parser.add_argument('--output', default=None, help='Optional JSON report path')
+    args = parser.parse_args()
+
+    user_models = UserModelStore(capacity=args.user_models, path=args.user_store) if args.user_models else None
+    sim = BanditSimulator(n_users=args.users, n_videos=args.videos, candidates=args.candidates,
+                          seed=args.seed, policy=args.policy, user_models=user_models,
+                          recommender=LinUCBRecommender(context_dim=CONTEXT_DIM, precision=args.precision),
+                          shadow=(LinUCBRecommender(context_dim=CONTEXT_DIM, precision=args.compare_precision)
+                                  if args.compare_precision else None))
+    report = sim.run(args.requests, trace_memory=args.trace_memory)
+
+    print(f"{report['requests']} requests in {report['seconds']:.1f}s ({report['requests_per_sec']:.0f} req/s)")
+    print(f"Regret: cumulative {report['cumulative_regret']:.1f}, mean {report['mean_regret']:.4f}; "
+          f"mean reward {report['mean_reward']:.4f}")
+    for name, lat in report['latency'].items():
+        print(f"{name:>6}: mean {lat['mean_us']:.1f}us p50 {lat['p50_us']:.1f}us p99 {lat['p99_us']:.1f}us")
+    memory = dict(report['memory'])
+    user_stats = memory.pop('user_models', None)
+    print(json.dumps(memory, indent=2))
+    if user_stats:
+        print(f"User models: {user_stats['resident']}/{user_stats['capacity']} resident "
+              f"({user_stats['resident_bytes'] / 2**20:.1f} MB), hit rate {user_stats['hit_rate']:.1%}, "
+              f"{user_stats['reloads']} reloads, {user_stats['spills']} spills")
+        for name, lat in user_stats['latency'].items():
+            print(f"{name:>6}: mean {lat['mean_us']:.1f}us p50 {lat['p50_us']:.1f}us p99 {lat['p99_us']:.1f}us")
+    shadow = report['shadow']
+    if shadow:
+        print(f"{shadow['shadow_precision']} vs {shadow['serving_precision']}: top-1 agreement {shadow['top1_agreement']:.2%}, "
+              f"rank correlation {shadow['rank_correlation']:.4f}, max |ucb diff| {shadow['max_abs_score_diff']:.2e}, "
+              f"registry {shadow['shadow_registry_bytes']} vs {shadow['serving_registry_bytes']} bytes "
+              f"({shadow['memory_ratio']:.0%})")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Train the shared-encoder emotion head (EmotionDetector(classifier='shared')).
+
+Uses the same dataset and metrics as train_emotion_model.py, but instead of
+fine-tuning DistilBERT it embeds every text once with KeyBERT's sentence
+encoder and fits a logistic regression head on the frozen embeddings. The
+regularization strength is picked on the validation split.
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from datasets import load_dataset
+from sentence_transformers import SentenceTransformer
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from scripts.train_emotion_model import DATASET_NAME, compute_metrics
+from src.ml.emotion_head import ENCODER_NAME, HEAD_PATH, EmotionHead
+
+C_GRID = (0.25, 1.0, 4.0, 16.0)
+
+def embed_split(encoder, split, batch_size=256):
+    return encoder.encode(split["text"], batch_size=batch_size, show_progress_bar=True), np.array(split["label"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a logistic emotion head on sentence embeddings")
+    parser.add_argument('--encoder', default=ENCODER_NAME, help="Sentence encoder (must match KeyBERT's)")
+    parser.add_argument('--output', default=HEAD_PATH)
+    args = parser.parse_args()
+
+    print("Loading dataset...")
+    dataset = load_dataset(DATASET_NAME)
+    labels = dataset["train"].features["label"].names
+
+    print(f"Embedding splits with {args.encoder}...")
+    encoder = SentenceTransformer(args.encoder)
+    X_train, y_train = embed_split(encoder, dataset["train"])
+    X_val, y_val = embed_split(encoder, dataset["validation"])
+    X_test, y_test = embed_split(encoder, dataset["test"])
+
+    best, best_f1 = None, -1.0
+    for C in C_GRID:
+        head = EmotionHead.fit(X_train, y_train, labels, encoder=args.encoder, C=C)
+        metrics = compute_metrics((head.logits(X_val), y_val))
+        print(f"C={C}: validation {metrics}")
+        if metrics['f1'] > best_f1:
+            best, best_f1 = head, metrics['f1']
+
+    print(f"Test Results: {compute_metrics((best.logits(X_test), y_test))}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    print(f"Saving head to {args.output}")
+    best.save(args.output)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
 import os
+import sys
+import argparse
 import torch
 import numpy as np
 from datasets import load_dataset
 from transformers import (
     AutoTokenizer, 
     AutoModelForSequenceClassification, 
+    DataCollatorWithPadding,
     TrainingArguments, 
     Trainer
 )
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.ml.early_exit import EXIT_HEADS_PATH, ExitHeads
+
 # Constants
 MODEL_CHECKPOINT = "distilbert-base-uncased"
 DATASET_NAME = "dair-ai/emotion" # Standard emotion dataset
@@ -94,5 +103,98 @@ def main():
     print(f"Saving model to {OUTPUT_DIR}")
     trainer.save_model(OUTPUT_DIR)
 
+def exit_logits(model, heads, loader, device):
+    """Per-exit-layer and final logits (plus labels) over a loader, frozen model and heads."""
+    outputs = {layer: [] for layer in heads.exit_layers + [model.config.n_layers]}
+    labels = []
+    with torch.no_grad():
+        for batch in loader:
+            batch = {k: v.to(device) for k, v in batch.items()}
+            labels.append(batch.pop('labels').cpu())
+            result = model(**batch, output_hidden_states=True)
+            for layer in heads.exit_layers:
+                outputs[layer].append(heads(layer, result.hidden_states[layer][:, 0]).cpu())
+            outputs[model.config.n_layers].append(result.logits.cpu())
+    return {layer: torch.cat(chunks) for layer, chunks in outputs.items()}, torch.cat(labels)
+
+def report_exits(logits, labels, thresholds=(0.8, 0.9, 0.95, 0.99)):
+    """Exit distribution, average layers and accuracy/agreement vs the full model per threshold."""
+    layers = sorted(logits)
+    full = logits[layers[-1]].argmax(-1)
+    for layer in layers:
+        acc = (logits[layer].argmax(-1) == labels).float().mean().item()
+        print(f"  exit {layer}: accuracy {acc:.2%}")
+    for threshold in thresholds:
+        exit_at = torch.full_like(labels, layers[-1])
+        for layer in reversed(layers[:-1]):
+            confident = torch.softmax(logits[layer], -1).max(-1).values >= threshold
+            exit_at[confident] = layer
+        predicted = torch.stack([logits[int(layer)][i].argmax() for i, layer in enumerate(exit_at)])
+        share = {layer: f"{(exit_at == layer).float().mean().item():.1%}" for layer in layers}
+        print(f"  threshold {threshold}: exits {share}, avg layers {exit_at.float().mean().item():.2f}, "
+              f"accuracy {(predicted == labels).float().mean().item():.2%}, "
+              f"agreement with full model {(predicted == full).float().mean().item():.2%}")
+
+def train_exit_heads(model_dir=OUTPUT_DIR, output=EXIT_HEADS_PATH, epochs=3, batch_size=32, learning_rate=1e-3):
+    """
+    Early-exit extension: train heads on the intermediate layers of a fine-tuned classifier.
+
+    The whole classifier is frozen (main() already freezes the lower layers; here the
+    top layers and final head stay fixed too, so the full-depth path is unchanged).
+    Every head starts from the final head's weights and learns the dataset labels from
+    its layer's [CLS] state; the summed cross-entropy trains them jointly.
+    """
+    print("Loading dataset...")
+    dataset = load_dataset(DATASET_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    encoded = dataset.map(lambda examples: tokenizer(examples["text"], truncation=True), batched=True)
+    encoded = encoded.remove_columns(["text"]).rename_column("label", "labels")
+    collator = DataCollatorWithPadding(tokenizer)
+    loader = lambda split, shuffle: torch.utils.data.DataLoader(
+        encoded[split], batch_size=batch_size, shuffle=shuffle, collate_fn=collator)
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir).to(device).eval()
+    for param in model.parameters():
+        param.requires_grad = False
+    heads = ExitHeads.for_model(model, model_name=model_dir).to(device)
+    print(f"Training exit heads after layers {heads.exit_layers} of {model.config.n_layers}...")
+
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=learning_rate, weight_decay=0.01)
+    for epoch in range(epochs):
+        heads.train()
+        total = 0.0
+        for step, batch in enumerate(loader("train", True)):
+            batch = {k: v.to(device) for k, v in batch.items()}
+            labels = batch.pop('labels')
+            with torch.no_grad():
+                hidden_states = model(**batch, output_hidden_states=True).hidden_states
+            loss = sum(torch.nn.functional.cross_entropy(heads(layer, hidden_states[layer][:, 0]), labels)
+                       for layer in heads.exit_layers)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item()
+        print(f"Epoch {epoch + 1}: mean summed loss {total / (step + 1):.4f}")
+        heads.eval()
+        print("Validation:")
+        report_exits(*exit_logits(model, heads, loader("validation", False), device))
+
+    print("Test:")
+    report_exits(*exit_logits(model, heads, loader("test", False), device))
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    print(f"Saving exit heads to {output}")
+    heads.cpu().save(output)
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fine-tune the emotion classifier")
+    parser.add_argument('--exit-heads', action='store_true',
+                        help="Train early-exit heads on an already fine-tuned model instead")
+    parser.add_argument('--model', default=OUTPUT_DIR, help="Fine-tuned checkpoint for --exit-heads")
+    parser.add_argument('--output', default=EXIT_HEADS_PATH, help="Where --exit-heads saves the heads")
+    args = parser.parse_args()
+    if args.exit_heads:
+        train_exit_heads(args.model, args.output)
+    else:
+        main()
@@ -0,0 +1,31 @@
+import sys
+import os
+import time
+import argparse
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.rl.warm_start import warm_start
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk warm-start LinUCB from historical watch-time logs.")
+    parser.add_argument('--input', required=True, help='Event log (.csv streamed in chunks, or .parquet)')
+    parser.add_argument('--output', default='./models/linucb_state.snap')
+    parser.add_argument('--lambda-forget', type=float, default=0.99)
+    parser.add_argument('--alpha', type=float, default=1.0)
+    parser.add_argument('--chunk-size', type=int, default=500_000)
+    parser.add_argument('--workers', type=int, default=None, help='Process-pool size (default: in-process)')
+    parser.add_argument('--precision', choices=['float64', 'float32'], default='float64')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    recommender = warm_start(args.input, args.output, lambda_forget=args.lambda_forget, alpha=args.alpha,
+                             chunk_size=args.chunk_size, workers=args.workers, precision=args.precision)
+    stats = recommender.get_statistics()
+    print(f"Warm-started {len(recommender.registry)} models from {stats['total_interactions']} events "
+          f"in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import time
+import queue
+import bisect
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence
+
+from src.utils.metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class _Histogram:
+    """Fixed-bucket histogram (counts per upper bound, last bucket unbounded) plus rolling percentiles."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.stats = RollingStats()
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.stats.add(value)
+
+    def summary(self) -> Dict:
+        labels = [f'<={bound:g}' for bound in self.bounds] + [f'>{self.bounds[-1]:g}']
+        return dict(self.stats.summary(), buckets=dict(zip(labels, self.counts)))
+
+
+class EmotionMicroBatcher:
+    """
+    Dynamic micro-batching in front of EmotionDetector.
+
+    Request threads `submit()` a text and get a Future back. A single worker
+    takes the oldest pending request, keeps collecting until `max_batch`
+    texts are pending or `max_wait_ms` has passed since that request arrived,
+    and runs them through `detector.predict_emotion_batch`, which groups them
+    into length buckets (at most `max_padding` pad tokens per row) with one
+    forward pass each. Every caller's future is then resolved with its own
+    (emotion, confidence, keywords).
+
+    Queue wait (arrival to batch start) and batch size are recorded as
+    histograms for tuning: a larger `max_wait_ms` buys bigger batches at the
+    cost of added latency when traffic is light.
+
+    If the detector has a prediction cache, hits are answered in `submit()`
+    and never wait for a batch.
+    """
+
+    def __init__(self, detector, max_batch: int = 32, max_wait_ms: float = 5.0, max_padding: int = 8,
+                 maxsize: int = 1024, poll_interval: float = 0.05):
+        self.detector = detector
+        self.cache = getattr(detector, 'cache', None)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_padding = max_padding
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics_lock = threading.Lock()
+
+        self.submitted = 0
+        self.cache_hits = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.queue_wait_ms = _Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self.batch_sizes = _Histogram(BATCH_SIZE_BUCKETS)
+        self.batch_latency_ms = RollingStats()
+
+    def submit(self, text: str) -> Future:
+        """
+        Enqueue one text without blocking.
+
+        Returns:
+            Future resolving to (emotion, confidence, keywords)
+        Raises:
+            queue.Full if the queue is at capacity
+        """
+        future = Future()
+        cached = self.cache.get(text) if self.cache is not None and text and isinstance(text, str) else None
+        if cached is not None:
+            future.set_result(cached)
+            with self._metrics_lock:
+                self.submitted += 1
+                self.cache_hits += 1
+            return future
+        try:
+            self._queue.put_nowait((time.monotonic(), text, future))
+        except queue.Full:
+            with self._metrics_lock:
+                self.rejected += 1
+            raise
+        with self._metrics_lock:
+            self.submitted += 1
+        return future
+
+    def predict_emotion(self, text: str, timeout: Optional[float] = None):
+        """Blocking drop-in for EmotionDetector.predict_emotion (runs inline if the worker is not started)."""
+        future = self.submit(text)
+        if self._thread is None:
+            self.flush()
+        return future.result(timeout=timeout)
+
+    def _collect(self, timeout: Optional[float]) -> List[tuple]:
+        try:
+            requests = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = requests[0][0] + self.max_wait
+        while len(requests) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                requests.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return requests
+
+    def _run_batch(self, requests: List[tuple]) -> int:
+        # Callers that cancelled while queued are dropped before inference
+        requests = [r for r in requests if r[2].set_running_or_notify_cancel()]
+        if not requests:
+            return 0
+
+        start = time.monotonic()
+        texts = [r[1] for r in requests]
+        try:
+            # Texts were already looked up on submit
+            options = {'check_cache': False} if self.cache is not None else {}
+            results = self.detector.predict_emotion_batch(texts, batch_size=self.max_batch,
+                                                          max_padding=self.max_padding, **options)
+            error = None
+        except Exception as e:
+            logger.error(f"Batched emotion detection failed for {len(texts)} texts: {e}")
+            results, error = None, e
+
+        for i, (_, _, future) in enumerate(requests):
+            if error is None:
+                future.set_result(results[i])
+            else:
+                future.set_exception(error)
+
+        done = time.monotonic()
+        with self._metrics_lock:
+            self.batches += 1
+            self.batch_sizes.add(len(requests))
+            self.batch_latency_ms.add((done - start) * 1000.0)
+            for enqueued, _, _ in requests:
+                self.queue_wait_ms.add((start - enqueued) * 1000.0)
+            if error is None:
+                self.completed += len(requests)
+            else:
+                self.failed += len(requests)
+        return len(requests)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._run_batch(self._collect(timeout=self.poll_interval))
+
+    def flush(self):
+        """Synchronously run everything currently queued on the calling thread."""
+        while not self._queue.empty():
+            self._run_batch(self._collect(timeout=None))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='emotion-batcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, drain: bool = True):
+        """Stop the worker, answering any still-queued requests first if `drain`."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if drain:
+            self.flush()
+
+    def metrics(self) -> Dict:
+        with self._metrics_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'submitted': self.submitted,
+                'cache_hits': self.cache_hits,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'batches': self.batches,
+                'batch_size': self.batch_sizes.summary(),
+                'queue_wait_ms': self.queue_wait_ms.summary(),
+                'batch_latency_ms': self.batch_latency_ms.summary()
+            }
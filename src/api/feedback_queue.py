@@ -0,0 +1,133 @@
+import time
+import queue
+import logging
+import threading
+import numpy as np
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+
+from src.utils.metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackQueue:
+    """
+    Bounded asynchronous ingestion of LinUCB feedback.
+
+    Request threads `submit()` events and return immediately. A single worker
+    drains up to `max_batch` pending events at a time, groups them per
+    (emotion, category) key and applies each group with one rank-k update via
+    `apply_batch(emotion, category, contexts, rewards)`.
+    """
+
+    def __init__(self, apply_batch: Callable, maxsize: int = 10000, max_batch: int = 256,
+                 poll_interval: float = 0.05):
+        self.apply_batch = apply_batch
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.applied = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.batch_sizes = RollingStats()
+        self.drain_latency_ms = RollingStats()
+
+    def submit(self, emotion: str, category: str, context: np.ndarray, reward: float) -> int:
+        """
+        Enqueue one event without blocking.
+
+        Returns:
+            Queue position (depth including this event)
+        Raises:
+            queue.Full if the queue is at capacity
+        """
+        try:
+            self._queue.put_nowait((time.monotonic(), emotion, category, np.ravel(context), reward))
+        except queue.Full:
+            with self._metrics_lock:
+                self.rejected += 1
+            raise
+        depth = self._queue.qsize()
+        with self._metrics_lock:
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, depth)
+        return depth
+
+    def _drain_once(self, timeout: Optional[float]) -> int:
+        try:
+            events = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return 0
+        while len(events) < self.max_batch:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        # Group per key, preserving arrival order inside each group
+        groups = defaultdict(list)
+        for event in events:
+            groups[(event[1], event[2])].append(event)
+
+        applied = failed = 0
+        for (emotion, category), group in groups.items():
+            try:
+                self.apply_batch(emotion, category, np.vstack([e[3] for e in group]), np.array([e[4] for e in group]))
+                applied += len(group)
+            except Exception as e:
+                failed += len(group)
+                logger.error(f"Batched feedback update failed for {emotion}_{category}: {e}")
+
+        done = time.monotonic()
+        with self._metrics_lock:
+            self.applied += applied
+            self.failed += failed
+            self.batch_sizes.add(len(events))
+            for event in events:
+                self.drain_latency_ms.add((done - event[0]) * 1000.0)
+        return len(events)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._drain_once(timeout=self.poll_interval)
+
+    def flush(self):
+        """Synchronously apply everything currently queued on the calling thread."""
+        while not self._queue.empty():
+            self._drain_once(timeout=None)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='feedback-ingest', daemon=True)
+            self._thread.start()
+
+    def stop(self, drain: bool = True):
+        """Stop the worker, applying any remaining events first if `drain`."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if drain:
+            self.flush()
+
+    def metrics(self) -> Dict:
+        with self._metrics_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_depth,
+                'capacity': self._queue.maxsize,
+                'enqueued': self.enqueued,
+                'applied': self.applied,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'batch_size': self.batch_sizes.summary(),
+                'drain_latency_ms': self.drain_latency_ms.summary()
+            }
@@ -1,20 +1,78 @@
 import logging
 import numpy as np
 from src.ml.heuristic_ranker import HeuristicRanker
-from src.rl.linucb_recommender import LinUCBRecommender, calculate_production_reward
+from src.rl.linucb_recommender import VIDEO_OFFSET, LinUCBRecommender, calculate_production_reward
+from src.rl.checkpoint import CheckpointManager
+from src.rl.shared_state import SharedCheckpointManager, SharedLinUCBRecommender
+from src.rl.user_models import HybridLinUCB, UserModelStore
+from src.api.feedback_queue import FeedbackQueue
+from src.api.emotion_batcher import EmotionMicroBatcher
 from src.api.user_context_manager import UserContextManager
 from src.ml.feature_normalizer import FeatureNormalizer
-from src.ml.emotion_detector import EmotionDetector
+from src.ml.emotion_detector import EmotionDetector, cache_namespace
+from src.ml.emotion_cache import EmotionCache
 from src.api.youtube_service import YouTubeService
 from src.api.mock_youtube_service import MockYouTubeService
 
 logger = logging.getLogger(__name__)
 
+SNAPSHOT_PATH = './models/linucb_state.snap'
+LEGACY_MODEL_PATH = './models/linucb_models.pkl'
+
+def _top_n_indices(scores: np.ndarray, top_n: int) -> np.ndarray:
+    """Indices of the top_n highest scores, best first (argpartition + sort of the head only)."""
+    n = len(scores)
+    top_n = max(min(top_n, n), 0)
+    if top_n == 0:
+        return np.empty(0, dtype=int)
+    if top_n < n:
+        head = np.sort(np.argpartition(-scores, top_n - 1)[:top_n])
+    else:
+        head = np.arange(n)
+    return head[np.argsort(-scores[head], kind='stable')]
+
 class HybridRecommendationSystem:
-    def __init__(self, use_mock_youtube=False):
+    def __init__(self, use_mock_youtube=False, checkpoint_dir=None, async_feedback=False,
+                 shared_memory_name=None, user_model_path=None, user_model_capacity=50_000,
+                 emotion_batching=False, emotion_batch_size=32, emotion_batch_wait_ms=5.0,
+                 emotion_cache_size=0, emotion_cache_ttl=24 * 3600.0, emotion_cache_path=None,
+                 emotion_backend='torch', emotion_classifier='distilbert', emotion_keyword_index=None,
+                 emotion_cascade=False, emotion_exit_threshold=0.9):
         """
         Initialize complete recommendation system with real or mock YouTube service.
         Automatically checks for YOUTUBE_API_KEY env var.
+        
+        Args:
+            checkpoint_dir: If set, LinUCB updates are write-ahead logged there and
+                            snapshotted in the background; state is recovered on startup.
+            async_feedback: If True, process_feedback enqueues LinUCB updates and returns
+                            immediately; a worker applies them in batches.
+            shared_memory_name: If set, LinUCB state lives in the named shared-memory
+                            segment so every server worker process scores and learns
+                            on the same models. With `checkpoint_dir`, every worker logs
+                            its own updates to the shared feedback log; one worker (the
+                            leader) recovers state and writes the snapshots.
+            user_model_path: If set, candidates are also scored by per-user models (hybrid
+                            LinUCB). At most `user_model_capacity` stay in memory; the
+                            rest are spilled to this sqlite file and reloaded on demand.
+            emotion_batching: If True, concurrent emotion detections are coalesced by a
+                            micro-batcher into one forward pass of up to `emotion_batch_size`
+                            texts, waiting at most `emotion_batch_wait_ms` for a batch to fill.
+            emotion_cache_size: If > 0, emotion predictions are cached by normalized text
+                            (at most this many entries, each valid for `emotion_cache_ttl`
+                            seconds); `emotion_cache_path` persists the cache in sqlite so
+                            it survives restarts.
+            emotion_backend: 'torch', or 'onnx' to serve the emotion classifier through
+                            onnxruntime with int8 weights (PyTorch remains the fallback), or
+                            'early_exit' to stop each text at the first intermediate layer
+                            whose exit head reaches `emotion_exit_threshold` confidence.
+            emotion_classifier: 'distilbert', or 'shared' to classify emotions with a trained
+                            head on KeyBERT's MiniLM embedding (one encoder per request).
+            emotion_keyword_index: If set, keywords are ranked against the precomputed
+                            vocabulary embeddings at this prefix instead of re-embedding
+                            candidate words; newly seen words are saved on shutdown.
+            emotion_cascade: If True, texts the validator's keyword rules settle (neutral
+                            phrases, unambiguous stress words) skip the emotion classifier.
         """
         import os
         api_key = os.environ.get('YOUTUBE_API_KEY')
@@ -28,20 +86,78 @@ class HybridRecommendationSystem:
             self.youtube = YouTubeService()
             logger.info("Using real YouTubeService")
         
-        self.emotion_detector = EmotionDetector()
+        self.emotion_cache = None
+        if emotion_cache_size > 0:
+            self.emotion_cache = EmotionCache(max_entries=emotion_cache_size, ttl=emotion_cache_ttl,
+                                              path=emotion_cache_path,
+                                              namespace=cache_namespace(backend=emotion_backend,
+                                                                        classifier=emotion_classifier,
+                                                                        exit_threshold=emotion_exit_threshold,
+                                                                        cascade=emotion_cascade))
+        self.emotion_detector = EmotionDetector(cache=self.emotion_cache, backend=emotion_backend,
+                                                classifier=emotion_classifier, keyword_index=emotion_keyword_index,
+                                                cascade=emotion_cascade, exit_threshold=emotion_exit_threshold)
+        self.emotion_batcher = None
+        if emotion_batching:
+            self.emotion_batcher = EmotionMicroBatcher(self.emotion_detector, max_batch=emotion_batch_size,
+                                                       max_wait_ms=emotion_batch_wait_ms)
+            self.emotion_batcher.start()
         
         # ML components
         self.feature_normalizer = FeatureNormalizer()
-        self.linucb = LinUCBRecommender(context_dim=19, alpha=1.0)
+        if shared_memory_name:
+            # Other workers wait to attach until this one has recovered the segment it creates
+            self.linucb = SharedLinUCBRecommender(shared_memory_name, context_dim=19, alpha=1.0, recovering=True)
+            logger.info(f"LinUCB state shared via /{shared_memory_name} "
+                        f"({'created' if self.linucb.created else 'attached'}, leader={self.linucb.leader})")
+        else:
+            self.linucb = LinUCBRecommender(context_dim=19, alpha=1.0)
         self.context_manager = UserContextManager()
+        self.user_models = None
+        self.hybrid = None
+        if user_model_path:
+            self.user_models = UserModelStore(capacity=user_model_capacity, path=user_model_path)
+            self.hybrid = HybridLinUCB(self.linucb, self.user_models)
+            logger.info(f"Per-user LinUCB models enabled ({user_model_capacity} resident, spilled to {user_model_path})")
         self.heuristic_ranker = HeuristicRanker()
         
-        # Load saved models
-        try:
-            self.linucb.load('./models/linucb_models.pkl')
-            logger.info("Loaded existing LinUCB models")
-        except FileNotFoundError:
-            logger.info("Starting with fresh LinUCB models")
+        # Durable learning: recover snapshot + log tail, then checkpoint in the background
+        self.checkpointer = None
+        shared = isinstance(self.linucb, SharedLinUCBRecommender)
+        if checkpoint_dir:
+            if shared:
+                # Every worker logs its own updates; only the leader writes snapshots
+                self.checkpointer = SharedCheckpointManager(self.linucb, checkpoint_dir)
+            else:
+                self.checkpointer = CheckpointManager(self.linucb, checkpoint_dir)
+            if shared and not self.linucb.created:
+                # Another worker recovered the live segment: join without reloading
+                self.checkpointer.attach()
+                replayed = 0
+            else:
+                replayed = self.checkpointer.recover()
+            self.checkpointer.start()
+            logger.info(f"LinUCB checkpointing enabled in {checkpoint_dir} ({replayed} updates replayed)")
+        else:
+            # Load saved models (binary snapshot preferred, legacy pickle as fallback)
+            try:
+                if os.path.exists(SNAPSHOT_PATH):
+                    self.linucb.load_snapshot(SNAPSHOT_PATH)
+                    logger.info("Loaded LinUCB snapshot")
+                else:
+                    self.linucb.load(LEGACY_MODEL_PATH)
+                    logger.info("Loaded existing LinUCB models")
+            except FileNotFoundError:
+                logger.info("Starting with fresh LinUCB models")
+        if shared:
+            self.linucb.finish_recovery()
+        
+        # Asynchronous ingestion: feedback is queued and applied in per-key rank-k batches
+        self.feedback_queue = None
+        if async_feedback:
+            apply_batch = self.checkpointer.apply_batch if self.checkpointer else self.linucb.update_batch
+            self.feedback_queue = FeedbackQueue(apply_batch)
+            self.feedback_queue.start()
 
     def get_recommendations(self, 
                            user_input: str = "",
@@ -76,7 +192,7 @@ class HybridRecommendationSystem:
              system_emotion = emotion
              logger.info(f"Using provided emotion: {system_emotion}")
         else:
-            system_emotion, confidence, keywords = self.emotion_detector.predict_emotion(user_input)
+            system_emotion, confidence, keywords = self.detect_emotion_and_context(user_input)
             
         logger.info(f"NLP: {system_emotion} | Phase: {phase} | Food Safety: {just_ate}")
         
@@ -92,32 +208,38 @@ class HybridRecommendationSystem:
 
         # 4. Scoring & Normalization
         user_ctx = self.context_manager.get_user_context(user_id)
-        scored_vids = []
         
         # Prepare candidates
         processed_candidates = self._prepare_candidates(candidates)
+        if not processed_candidates:
+            return {"emotion": system_emotion, "phase": phase, "recommendations": []}
         
-        for vid in processed_candidates:
-            # RL Context Vector (d=19, stable)
-            ctx_vec = self.linucb.build_context_vector(system_emotion, 'yoga', vid['features'], user_ctx)
-            
-            # Hybrid Calculation
-            rl_score, _ = self.linucb.get_ucb_score(system_emotion, 'yoga', ctx_vec)
-            h_score = self.heuristic_ranker.get_score(vid)
-            
-            # Dynamic weighting: max 0.7 RL influence
-            w = min(user_ctx.get('interaction_count', 0) / 20.0, 0.7)
-            final_raw_score = (w * rl_score) + ((1 - w) * h_score) + vid.get('demo_boost', 0.0)
-            
-            # Sigmoid normalization
-            match_percent = 1 / (1 + np.exp(-final_raw_score))
-            
+        # RL Context Matrix (n x 19, stable) scored in one vectorized pass
+        features = np.vstack([vid['features'] for vid in processed_candidates])
+        X = self.linucb.build_context_matrix(system_emotion, 'yoga', features, user_ctx)
+        if self.hybrid is not None:
+            _, _, rl_scores = self.hybrid.score(user_id, system_emotion, 'yoga', X)
+        else:
+            _, _, rl_scores = self.linucb.score_structured(system_emotion, 'yoga', X[:, VIDEO_OFFSET:])
+        h_scores = self.heuristic_ranker.score_matrix(features)
+        boosts = np.array([vid.get('demo_boost', 0.0) for vid in processed_candidates])
+        
+        # Dynamic weighting: max 0.7 RL influence
+        w = min(user_ctx.get('interaction_count', 0) / 20.0, 0.7)
+        final_raw_scores = (w * rl_scores) + ((1 - w) * h_scores) + boosts
+        
+        # Sigmoid normalization
+        match_percents = 1 / (1 + np.exp(-final_raw_scores))
+        
+        scored_vids = []
+        for i in _top_n_indices(final_raw_scores, top_n):
+            vid = processed_candidates[i]
             vid.update({
-                'match_score': round(float(match_percent * 100), 1),
-                'score': float(final_raw_score),
-                '_context': ctx_vec,
-                'heuristic_score': float(h_score),
-                'linucb_score': float(rl_score)
+                'match_score': round(float(match_percents[i] * 100), 1),
+                'score': float(final_raw_scores[i]),
+                '_context': X[i].reshape(-1, 1),
+                'heuristic_score': float(h_scores[i]),
+                'linucb_score': float(rl_scores[i])
             })
             scored_vids.append(vid)
 
@@ -127,7 +249,7 @@ class HybridRecommendationSystem:
             "phase": phase,
             "just_ate": just_ate,
             "keywords": keywords,
-            "recommendations": sorted(scored_vids, key=lambda x: x['score'], reverse=True)[:top_n],
+            "recommendations": scored_vids,
             "metadata": {
                 "w_rl": w,
                 "user_id": user_id,
@@ -219,37 +341,30 @@ class HybridRecommendationSystem:
     def _hybrid_score_and_select(self, candidates, emotion, category, user_ctx, top_n):
         """Score candidates using Heuristic and LinUCB"""
         # 1. Score Heuristically (Quality)
-        h_scores = self.heuristic_ranker.score(candidates)
+        h_scores = np.asarray(self.heuristic_ranker.score(candidates), dtype=float)
         
         # 2. Score RL (Personalization)
-        rl_scores = []
-        for cand in candidates:
-            ctx_vector = self.linucb.build_context_vector(emotion, category, cand['features'], user_ctx)
-            score, _ = self.linucb.get_ucb_score(emotion, category, ctx_vector)
-            rl_scores.append(score)
+        X = self.linucb.build_context_matrix(emotion, category, [cand['features'] for cand in candidates], user_ctx)
+        _, _, rl_scores = self.linucb.score_structured(emotion, category, X[:, VIDEO_OFFSET:])
             
         # 3. Hybrid Weighing
         w_rl = self._get_linucb_weight()
+        final_scores = w_rl * rl_scores + (1 - w_rl) * h_scores
         
-        final_scores = []
-        for i, (h, rl) in enumerate(zip(h_scores, rl_scores)):
-            raw_score = w_rl * rl + (1 - w_rl) * h
-            
-            # Implementation: Sigmoid function to normalize 0-100%
-            # Center it around typical score values if needed, otherwise standard sigmoid
-            sigmoid_score = 1 / (1 + np.exp(-raw_score))
-            match_pct = int(sigmoid_score * 100)
+        # Implementation: Sigmoid function to normalize 0-100%
+        # Center it around typical score values if needed, otherwise standard sigmoid
+        match_pcts = (1 / (1 + np.exp(-final_scores)) * 100).astype(int)
             
-            final_scores.append(raw_score)
-            candidates[i]['score'] = raw_score
-            candidates[i]['match_score'] = match_pct
-            candidates[i]['heuristic_score'] = h
-            candidates[i]['linucb_score'] = rl
-            candidates[i]['_context'] = user_ctx # Keep context for feedback
-            
-        # 4. Sort and Return
-        ranked_indices = np.argsort(final_scores)[::-1]
-        top_recs = [candidates[i] for i in ranked_indices[:top_n]]
+        # 4. Select Top-N and annotate only those
+        top_recs = []
+        for i in _top_n_indices(final_scores, top_n):
+            cand = candidates[i]
+            cand['score'] = float(final_scores[i])
+            cand['match_score'] = int(match_pcts[i])
+            cand['heuristic_score'] = float(h_scores[i])
+            cand['linucb_score'] = float(rl_scores[i])
+            cand['_context'] = user_ctx # Keep context for feedback
+            top_recs.append(cand)
         
         return top_recs
 
@@ -275,15 +390,41 @@ class HybridRecommendationSystem:
             else:
                 return {'status': 'ignored'}
             
+        ctx_vector = None
+        if video_features is not None and context is not None:
+            if isinstance(context, np.ndarray):
+                ctx_vector = context
+            else:
+                ctx_vector = self.linucb.build_context_vector(emotion, category, video_features, context)
+        
+        # Enqueue before touching any state: a full queue raises queue.Full (503, the
+        # client retries), and a retry must not count this feedback twice
+        position = shared_mean = None
+        if ctx_vector is not None and self.feedback_queue is not None:
+            if self.hybrid is not None:
+                # Residual against the shared model the user was scored with, not the queued update
+                shared_mean = self.hybrid.shared_mean(emotion, category, ctx_vector)
+            position = self.feedback_queue.submit(emotion, category, ctx_vector, reward)
+            
         self.context_manager.update_user_context(user_id, reward)
         
         # Update LinUCB if features available
-        if video_features is not None and context is not None:
-             if isinstance(context, np.ndarray):
-                 ctx_vector = context
+        if ctx_vector is not None:
+             if self.hybrid is not None:
+                 # Residual against the shared model the user was scored with
+                 self.hybrid.observe(user_id, emotion, category, ctx_vector, reward, shared_mean=shared_mean)
+             if self.feedback_queue is not None:
+                 return {
+                     'status': 'queued',
+                     'reward': reward,
+                     'queue_position': position,
+                     'total_interactions': self.linucb.total_interactions,
+                     'linucb_weight': self._get_linucb_weight()
+                 }
+             if self.checkpointer is not None:
+                 self.checkpointer.apply(emotion, category, ctx_vector, reward)
              else:
-                 ctx_vector = self.linucb.build_context_vector(emotion, category, video_features, context)
-             self.linucb.update(emotion, category, ctx_vector, reward)
+                 self.linucb.update(emotion, category, ctx_vector, reward)
         
         return {
             'status': 'success',
@@ -292,5 +433,21 @@ class HybridRecommendationSystem:
             'linucb_weight': self._get_linucb_weight()
         }
 
+    def shutdown(self):
+        """Drain queued feedback, flush the feedback log and write a final LinUCB snapshot."""
+        if self.emotion_batcher is not None:
+            self.emotion_batcher.stop(drain=True)
+        if self.emotion_cache is not None:
+            self.emotion_cache.close()
+        self.emotion_detector.flush_keyword_index()
+        if self.feedback_queue is not None:
+            self.feedback_queue.stop(drain=True)
+        if self.checkpointer is not None:
+            self.checkpointer.stop()
+        if self.user_models is not None:
+            self.user_models.close()
+
     def detect_emotion_and_context(self, text):
+        if self.emotion_batcher is not None:
+            return self.emotion_batcher.predict_emotion(text)
         return self.emotion_detector.predict_emotion(text)
@@ -0,0 +1,169 @@
+"""
+Early-exit inference for the DistilBERT emotion classifier.
+
+ExitHeads attaches a small classifier (the same pre_classifier -> ReLU ->
+classifier shape as DistilBERT's own head) to the [CLS] state after selected
+intermediate transformer layers. The heads are trained on a frozen fine-tuned
+model by `scripts/train_emotion_model.py --exit-heads`.
+
+EarlyExitBackend runs the layers one at a time. After each layer with a head,
+rows whose softmax confidence reaches `threshold` take that head's logits and
+leave the batch; the rest continue, and rows that never clear it get the full
+model's logits. With a threshold above 1 every row runs all layers and the
+output equals TorchBackend.
+"""
+import logging
+from threading import Lock
+from typing import Dict, Sequence
+import torch
+
+logger = logging.getLogger(__name__)
+
+EXIT_HEADS_PATH = './models/emotion_exit_heads.pt'
+EXIT_THRESHOLD = 0.9
+
+
+class ExitHeads(torch.nn.Module):
+    """
+    Args:
+        exit_layers: 1-based transformer layers whose output gets a head (the last layer uses the model's own)
+        dim: hidden size
+        num_labels: classifier outputs, in the model's id2label order
+        model_name: checkpoint the heads were trained on
+    """
+
+    def __init__(self, exit_layers: Sequence[int], dim: int, num_labels: int, model_name: str = None):
+        super().__init__()
+        self.exit_layers = sorted(int(layer) for layer in exit_layers)
+        self.dim = dim
+        self.num_labels = num_labels
+        self.model_name = model_name
+        self.heads = torch.nn.ModuleDict({
+            str(layer): torch.nn.Sequential(
+                torch.nn.Linear(dim, dim), torch.nn.ReLU(), torch.nn.Linear(dim, num_labels)
+            ) for layer in self.exit_layers
+        })
+
+    @classmethod
+    def for_model(cls, model, exit_layers: Sequence[int] = None, model_name: str = None) -> 'ExitHeads':
+        """Heads for every intermediate layer of `model` (by default), initialized from its final head."""
+        config = model.config
+        if exit_layers is None:
+            exit_layers = range(1, config.n_layers)
+        heads = cls(exit_layers, config.dim, config.num_labels, model_name)
+        for head in heads.heads.values():
+            head[0].load_state_dict(model.pre_classifier.state_dict())
+            head[2].load_state_dict(model.classifier.state_dict())
+        return heads
+
+    def forward(self, layer: int, cls_state: torch.Tensor) -> torch.Tensor:
+        return self.heads[str(layer)](cls_state)
+
+    def save(self, path: str):
+        torch.save({'exit_layers': self.exit_layers, 'dim': self.dim, 'num_labels': self.num_labels,
+                    'model_name': self.model_name, 'state_dict': self.state_dict()}, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'ExitHeads':
+        data = torch.load(path, map_location='cpu')
+        heads = cls(data['exit_layers'], data['dim'], data['num_labels'], data['model_name'])
+        heads.load_state_dict(data['state_dict'])
+        return heads.eval()
+
+
+class _LayerInputs(Exception):
+    """Raised by a pre-hook on the first transformer layer to hand back its inputs."""
+
+    def __init__(self, hidden, mask):
+        super().__init__()
+        self.hidden = hidden
+        self.mask = mask
+
+
+def _layer_output(output):
+    # transformers 4.x layers return a tuple, 5.x a tensor
+    return output[0] if isinstance(output, tuple) else output
+
+
+class EarlyExitBackend:
+    """Layer-by-layer DistilBERT forward that stops per row at the first confident exit head."""
+
+    name = 'early_exit'
+
+    def __init__(self, model, heads: ExitHeads, threshold: float = EXIT_THRESHOLD):
+        if heads.num_labels != model.config.num_labels or heads.dim != model.config.dim:
+            raise ValueError(f"Exit heads ({heads.dim}d, {heads.num_labels} labels) do not fit the model")
+        self.model = model
+        self.heads = heads.to(next(model.parameters()).device).eval()
+        self.threshold = threshold
+        self.layers = model.distilbert.transformer.layer
+        self._lock = Lock()
+        self.exits: Dict[int, int] = {layer: 0 for layer in heads.exit_layers + [len(self.layers)]}
+
+    def _embed(self, inputs):
+        """Embeddings and attention mask exactly as this transformers version passes them to layer 1."""
+        def capture(module, args, kwargs):
+            hidden = args[0] if args else kwargs.get('hidden_states', kwargs.get('x'))
+            mask = args[1] if len(args) > 1 else kwargs.get('attention_mask', kwargs.get('attn_mask'))
+            raise _LayerInputs(hidden, mask)
+
+        handle = self.layers[0].register_forward_pre_hook(capture, with_kwargs=True)
+        try:
+            self.model.distilbert(input_ids=inputs['input_ids'], attention_mask=inputs.get('attention_mask'))
+        except _LayerInputs as prepared:
+            return prepared.hidden, prepared.mask
+        finally:
+            handle.remove()
+        raise RuntimeError("DistilBERT forward never reached its first transformer layer")
+
+    def _classify(self, cls_state):
+        pooled = torch.nn.functional.relu(self.model.pre_classifier(cls_state))
+        return self.model.classifier(self.model.dropout(pooled))
+
+    def logits(self, inputs) -> torch.Tensor:
+        with torch.no_grad():
+            hidden, mask = self._embed(inputs)
+            rows = torch.arange(hidden.shape[0], device=hidden.device)
+            logits = torch.empty((len(rows), self.heads.num_labels), device=hidden.device)
+            exits = {}
+            for depth, layer in enumerate(self.layers, start=1):
+                hidden = _layer_output(layer(hidden, mask))
+                if depth == len(self.layers) or str(depth) not in self.heads.heads:
+                    continue
+                exit_logits = self.heads(depth, hidden[:, 0])
+                done = torch.softmax(exit_logits, dim=-1).max(dim=-1).values >= self.threshold
+                if not done.any():
+                    continue
+                logits[rows[done]] = exit_logits[done]
+                exits[depth] = int(done.sum())
+                keep = ~done
+                if not keep.any():
+                    break
+                rows, hidden = rows[keep], hidden[keep]
+                if isinstance(mask, torch.Tensor) and mask.shape[0] == len(keep):
+                    mask = mask[keep]
+            else:
+                logits[rows] = self._classify(hidden[:, 0])
+                exits[len(self.layers)] = len(rows)
+        with self._lock:
+            for depth, count in exits.items():
+                self.exits[depth] += count
+        return logits.cpu()
+
+    def stats(self) -> Dict:
+        """Rows answered per exit layer since startup, and the mean number of layers they ran."""
+        with self._lock:
+            total = sum(self.exits.values())
+            return {
+                'threshold': self.threshold,
+                'exits': dict(self.exits),
+                'avg_layers': sum(layer * count for layer, count in self.exits.items()) / total if total else 0.0,
+            }
+
+
+def load_early_exit_backend(model, path: str = EXIT_HEADS_PATH, threshold: float = EXIT_THRESHOLD,
+                            model_name: str = None) -> EarlyExitBackend:
+    heads = ExitHeads.load(path)
+    if model_name and heads.model_name and heads.model_name != model_name:
+        logger.warning(f"Exit heads at {path} were trained on {heads.model_name}, not {model_name}")
+    return EarlyExitBackend(model, heads, threshold)
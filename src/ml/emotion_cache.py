@@ -0,0 +1,201 @@
+"""
+Prediction cache for EmotionDetector, keyed on normalized text.
+
+Users repeat the same few moods with small variations ("I feel stressed",
+"i feel  stressed!"), and each one otherwise pays a full DistilBERT + KeyBERT
+pass. Texts are normalized (NFKC, case-folded, punctuation dropped, whitespace
+collapsed) and the (emotion, confidence, keywords) result is kept in an LRU
+bounded by both entry count and approximate bytes. Entries expire `ttl` seconds
+after they were computed.
+
+With a `path`, every entry is also written through to a sqlite table, so a
+restarted process starts warm (the newest rows are loaded up front) and entries
+evicted from memory are still served from disk until they expire. `namespace`
+separates results of different models sharing one file.
+"""
+import json
+import time
+import sqlite3
+import logging
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENTRY_OVERHEAD = 240  # Approximate bytes of the OrderedDict slot, tuple, float and list objects per entry
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for `text`: NFKC, case-folded, punctuation removed, whitespace collapsed (emoji are kept)."""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in text)
+    return ' '.join(text.split())
+
+
+def _entry_bytes(key: str, value: Tuple) -> int:
+    return ENTRY_OVERHEAD + len(key) + len(value[0]) + sum(len(k) for k in value[2])
+
+
+class EmotionCache:
+    """
+    LRU + TTL cache of EmotionDetector predictions.
+
+    Args:
+        max_entries: resident entries
+        max_bytes: approximate resident bytes (keys, labels and keywords plus a fixed per-entry overhead)
+        ttl: seconds an entry stays valid after it was computed
+        path: sqlite file for a persistent copy (None keeps the cache in memory only)
+        namespace: model identity stored with every row, so results of another model are never served
+        commit_every: writes between sqlite commits (flush() commits immediately)
+    """
+
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 8 * 1024 * 1024, ttl: float = 24 * 3600.0,
+                 path: Optional[str] = None, namespace: str = 'default', commit_every: int = 64,
+                 clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.namespace = namespace
+        self.commit_every = commit_every
+        self.clock = clock
+        self.entries: 'OrderedDict[str, Tuple[float, Tuple]]' = OrderedDict()  # key -> (created, value), LRU first
+        self.nbytes = 0
+        self._lock = Lock()
+        self._uncommitted = 0
+
+        self.hits = self.disk_hits = self.misses = 0
+        self.puts = self.evictions = self.expirations = 0
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS emotion_cache (namespace TEXT NOT NULL, key TEXT NOT NULL, '
+                            'emotion TEXT NOT NULL, confidence REAL NOT NULL, keywords TEXT NOT NULL, '
+                            'created REAL NOT NULL, PRIMARY KEY (namespace, key))')
+            self._warm()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _warm(self):
+        """Drop expired rows, then load the newest rows that fit into memory."""
+        cutoff = self.clock() - self.ttl
+        self.db.execute('DELETE FROM emotion_cache WHERE created < ?', (cutoff,))
+        self.db.commit()
+        rows = self.db.execute('SELECT key, emotion, confidence, keywords, created FROM emotion_cache '
+                               'WHERE namespace = ? ORDER BY created DESC, rowid DESC LIMIT ?',
+                               (self.namespace, self.max_entries)).fetchall()
+        for key, emotion, confidence, keywords, created in reversed(rows):
+            self._insert(key, created, (emotion, confidence, json.loads(keywords)))
+        if rows:
+            logger.info(f"Emotion cache warmed with {len(self.entries)} entries from disk")
+
+    def _insert(self, key: str, created: float, value: Tuple):
+        """Add or replace a resident entry and evict down to the bounds. Caller holds the lock."""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= _entry_bytes(key, old[1])
+        self.entries[key] = (created, value)
+        self.nbytes += _entry_bytes(key, value)
+        while self.entries and (len(self.entries) > self.max_entries or self.nbytes > self.max_bytes):
+            evicted, (_, evicted_value) = self.entries.popitem(last=False)
+            self.nbytes -= _entry_bytes(evicted, evicted_value)
+            self.evictions += 1
+
+    def _drop(self, key: str):
+        _, value = self.entries.pop(key)
+        self.nbytes -= _entry_bytes(key, value)
+        self.expirations += 1
+
+    def get(self, text: str) -> Optional[Tuple]:
+        """Cached (emotion, confidence, keywords) for `text`, or None."""
+        key = normalize_text(text)
+        now = self.clock()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1][0], entry[1][1], list(entry[1][2])
+
+            if self.db is not None:
+                row = self.db.execute('SELECT emotion, confidence, keywords, created FROM emotion_cache '
+                                      'WHERE namespace = ? AND key = ?', (self.namespace, key)).fetchone()
+                if row is not None and now - row[3] <= self.ttl:
+                    value = (row[0], row[1], json.loads(row[2]))
+                    self._insert(key, row[3], value)
+                    self.disk_hits += 1
+                    return value[0], value[1], list(value[2])
+            self.misses += 1
+            return None
+
+    def put(self, text: str, value: Tuple):
+        """Store a successful prediction for `text` (texts that normalize to nothing are not cached)."""
+        key = normalize_text(text)
+        if not key:
+            return
+        emotion, confidence, keywords = value
+        value = (emotion, float(confidence), list(keywords))
+        created = self.clock()
+        with self._lock:
+            self._insert(key, created, value)
+            self.puts += 1
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO emotion_cache '
+                                '(namespace, key, emotion, confidence, keywords, created) VALUES (?, ?, ?, ?, ?, ?)',
+                                (self.namespace, key, value[0], value[1], json.dumps(value[2]), created))
+                self._uncommitted += 1
+                if self._uncommitted >= self.commit_every:
+                    self.db.commit()
+                    self._uncommitted = 0
+
+    def clear(self):
+        """Forget every entry of this namespace, resident and on disk."""
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+            if self.db is not None:
+                self.db.execute('DELETE FROM emotion_cache WHERE namespace = ?', (self.namespace,))
+                self.db.commit()
+                self._uncommitted = 0
+
+    def flush(self):
+        """Commit pending writes and prune expired rows from disk."""
+        if self.db is None:
+            return
+        with self._lock:
+            self.db.execute('DELETE FROM emotion_cache WHERE created < ?', (self.clock() - self.ttl,))
+            self.db.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'persistent': self.db is not None,
+                'lookups': lookups,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'puts': self.puts,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
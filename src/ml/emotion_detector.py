@@ -4,7 +4,13 @@ from keybert import KeyBERT
 import logging
 from logging.handlers import RotatingFileHandler
 import os
+from threading import Lock
 from src.ml.emotion_validator import EmotionValidator
+from src.ml.emotion_cache import normalize_text
+from src.ml.inference_backend import BACKENDS, ONNX_DIR, TorchBackend, load_onnx_backend
+from src.ml.emotion_head import ENCODER_NAME, HEAD_PATH, EmotionHead
+from src.ml.keyword_index import KeywordIndex
+from src.ml.early_exit import EXIT_HEADS_PATH, EXIT_THRESHOLD, load_early_exit_backend
 
 # Configure Logging
 if not os.path.exists('logs'):
@@ -31,35 +37,153 @@ if not error_logger.handlers:
 
 logger = logging.getLogger(__name__)
 
+CLASSIFIERS = ('distilbert', 'shared')
+MODEL_NAME = 'bhadresh-savani/distilbert-base-uncased-emotion'
+
+def cache_namespace(model_name=MODEL_NAME, backend='torch', classifier='distilbert', head_path=HEAD_PATH,
+                    exit_threshold=EXIT_THRESHOLD, cascade=False):
+    """
+    EmotionCache namespace for a detector configuration: every setting that can
+    change a prediction (checkpoint, backend, early-exit threshold, rule cascade)
+    is part of it, so a restart with different settings never serves stale rows.
+    """
+    if classifier == 'shared':
+        parts = ['shared', head_path]
+    else:
+        parts = [model_name, backend]
+        if backend == 'early_exit':
+            parts.append(f'exit={exit_threshold:g}')
+    if cascade:
+        parts.append('cascade')
+    return '|'.join(parts)
+
 class EmotionDetector:
-    def __init__(self, model_name='bhadresh-savani/distilbert-base-uncased-emotion'):
+    def __init__(self, model_name=MODEL_NAME, cache=None,
+                 backend='torch', onnx_dir=ONNX_DIR, classifier='distilbert', head_path=HEAD_PATH,
+                 keyword_index=None, cascade=False, exit_threshold=EXIT_THRESHOLD,
+                 exit_heads_path=EXIT_HEADS_PATH):
         """
         Initialize the Emotion Detection Module.
         
         Args:
             model_name (str): The Hugging Face model checkpoint to load.
+            cache (EmotionCache): Optional prediction cache keyed on normalized text;
+                successful predictions of both paths are served from and stored in it.
+            backend (str): 'torch', or 'onnx' to run the classifier through onnxruntime with
+                dynamic int8 quantization (exported once into `onnx_dir`). PyTorch stays
+                loaded as the fallback if the export fails or a forward raises. 'early_exit'
+                runs the layers one at a time and stops a row at the first intermediate head
+                (scripts/train_emotion_model.py --exit-heads, saved at `exit_heads_path`)
+                whose softmax confidence reaches `exit_threshold`.
+            classifier (str): 'distilbert', or 'shared' to classify with a lightweight head
+                (scripts/train_emotion_head.py, saved at `head_path`) on the sentence
+                embedding KeyBERT already computes; DistilBERT is then never loaded and
+                each text runs one encoder forward for both emotion and keywords.
+            keyword_index (str): Optional KeywordIndex prefix (scripts/build_keyword_index.py).
+                Keywords are then ranked against memory-mapped vocabulary embeddings instead
+                of re-embedding every candidate word; unknown words are embedded once and
+                cached. A missing index starts empty and is written on flush_keyword_index().
+            cascade (bool): Rule-first mode. EmotionValidator.decide answers texts whose
+                emotion its rules settle (neutral phrases, unambiguous stress words) without
+                running the classifier; only the rest reach the model. Keywords are still
+                extracted for every text.
         """
-        logger.info(f"Loading emotion model: {model_name}...")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend {backend!r}; expected one of {BACKENDS}")
+        if classifier not in CLASSIFIERS:
+            raise ValueError(f"Unknown emotion classifier {classifier!r}; expected one of {CLASSIFIERS}")
+        if classifier == 'shared' and backend != 'torch':
+            raise ValueError("The shared-encoder classifier only runs on its own encoder; use backend='torch'")
+        self._init_state(cache, cascade)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device)
-        except Exception as e:
-            msg = f"Failed to load emotion model: {e}"
-            logger.error(msg)
-            error_logger.error(msg)
-            raise
+        self.head = None
+        keybert_encoder = ENCODER_NAME
+
+        if classifier == 'shared':
+            logger.info(f"Loading shared-encoder emotion head: {head_path}...")
+            try:
+                self.head = EmotionHead.load(head_path)
+            except Exception as e:
+                msg = f"Failed to load emotion head (train it with scripts/train_emotion_head.py): {e}"
+                logger.error(msg)
+                error_logger.error(msg)
+                raise
+            self.tokenizer = self.model = self.backend = None
+            keybert_encoder = self.head.encoder
+        else:
+            logger.info(f"Loading emotion model: {model_name}...")
+            try:
+                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+                self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device)
+            except Exception as e:
+                msg = f"Failed to load emotion model: {e}"
+                logger.error(msg)
+                error_logger.error(msg)
+                raise
+            self.backend = TorchBackend(self.model)
+
+        if backend == 'onnx':
+            if self.device.type != 'cpu':
+                logger.warning("ONNX backend targets CPU-only nodes; keeping PyTorch on GPU")
+            else:
+                try:
+                    self.backend = load_onnx_backend(self.model, model_name, onnx_dir)
+                    logger.info(f"Emotion classifier served by onnxruntime from {self.backend.path}")
+                except Exception as e:
+                    msg = f"ONNX backend unavailable, falling back to PyTorch: {e}"
+                    logger.warning(msg)
+                    error_logger.error(msg)
+        elif backend == 'early_exit':
+            try:
+                self.backend = load_early_exit_backend(self.model, exit_heads_path, exit_threshold, model_name)
+                logger.info(f"Emotion classifier exits early at confidence >= {exit_threshold}")
+            except Exception as e:
+                msg = f"Early-exit heads unavailable, running the full model: {e}"
+                logger.warning(msg)
+                error_logger.error(msg)
 
         logger.info("Loading KeyBERT model...")
         try:
-            self.keybert_model = KeyBERT('all-MiniLM-L6-v2')
+            self.keybert_model = KeyBERT(keybert_encoder)
+            if keyword_index:
+                self.keybert_model = KeywordIndex(self.keybert_model.model, keyword_index)
         except Exception as e:
             msg = f"Failed to load KeyBERT model: {e}"
             logger.error(msg)
             error_logger.error(msg)
             raise
 
+    @classmethod
+    def from_components(cls, tokenizer=None, model=None, keybert_model=None, head=None, backend=None,
+                        cache=None, cascade=False, device='cpu'):
+        """
+        Build a detector around already-loaded components; nothing is downloaded.
+        
+        Args:
+            tokenizer, model: DistilBERT-style tokenizer and sequence classifier
+                (omit both when `head` is given).
+            keybert_model: KeyBERT (or KeywordIndex) used for keyword extraction.
+            head (EmotionHead): Shared-encoder classifier on keybert_model's encoder.
+            backend: Inference backend for `model` (TorchBackend(model) by default).
+            cache, cascade: As in __init__.
+            device: Device the inputs are moved to.
+        """
+        detector = cls.__new__(cls)
+        detector._init_state(cache, cascade)
+        detector.device = torch.device(device)
+        detector.tokenizer = tokenizer
+        detector.model = model
+        detector.head = head
+        detector.backend = backend if backend is not None or model is None else TorchBackend(model)
+        detector.keybert_model = keybert_model
+        return detector
+
+    def _init_state(self, cache, cascade):
+        """Validator, label mapping, cache and cascade counters (everything but the models)."""
+        self.cache = cache
+        self.cascade = cascade
+        self._cascade_lock = Lock()
+        self.rule_decisions = self.model_decisions = 0
         self.validator = EmotionValidator()
 
         # Mapping from dataset labels to wellness application labels
@@ -71,6 +195,11 @@ class EmotionDetector:
             'fear': 'anxious',
             'surprise': 'motivated' # will be refined by keywords
         }
+
+    def flush_keyword_index(self):
+        """Persist words the keyword index embedded on the fly (no-op without an index)."""
+        if isinstance(self.keybert_model, KeywordIndex):
+            self.keybert_model.flush()
         
     def predict_emotion(self, text):
         """
@@ -86,63 +215,280 @@ class EmotionDetector:
             logger.warning("Invalid input text provided.")
             return 'calm', 0.0, []
 
+        if self.cache is not None:
+            cached = self.cache.get(text)
+            if cached is not None:
+                return cached
+
         try:
-            # 1. BERT Inference
-            inputs = self.tokenizer(text, return_tensors="pt", truncation=True, padding=True).to(self.device)
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-            
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            confidence = probs.max().item()
-            
-            predicted_id = probs.argmax().item()
-            predicted_label = self.model.config.id2label[predicted_id]
+            result = self._infer(text)
+        except Exception as e:
+            error_msg = f"Error in predict_emotion: {e}"
+            logger.error(error_msg)
+            error_logger.error(error_msg)
+            # Fallback (never cached)
+            return 'calm', 0.5, []
+
+        if self.cache is not None:
+            self.cache.put(text, result)
+        return result
+
+    def cascade_stats(self):
+        """Texts answered by the rule pass vs the classifier since startup (cascade mode)."""
+        with self._cascade_lock:
+            total = self.rule_decisions + self.model_decisions
+            return {
+                'rule_decisions': self.rule_decisions,
+                'model_decisions': self.model_decisions,
+                'rule_fraction': self.rule_decisions / total if total else 0.0,
+            }
+
+    def _count_decisions(self, rule, model):
+        with self._cascade_lock:
+            self.rule_decisions += rule
+            self.model_decisions += model
+
+    def _rule_result(self, text, decision, keywords):
+        """Result of a text settled by EmotionValidator.decide (no model output to validate)."""
+        emotion, confidence = decision
+        validation_logger.info(f"RULE | Validated: {emotion} ({confidence:.2f}) | Keywords: {keywords} | Input: {text[:50]}...")
+        return emotion, confidence, keywords
+
+    def _infer(self, text):
+        """Uncached single-text prediction; raises on model or KeyBERT failure."""
+        if self.cascade:
+            decision = self.validator.decide(text)
+            self._count_decisions(decision is not None, decision is None)
+            if decision is not None:
+                keywords_tuples = self.keybert_model.extract_keywords(
+                    text, keyphrase_ngram_range=(1, 1), stop_words='english', top_n=3
+                )
+                return self._rule_result(text, decision, [k[0] for k in keywords_tuples])
+
+        if self.head is not None:
+            return self._infer_shared([text])[0]
+
+        # 1. BERT Inference
+        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, padding=True).to(self.device)
+        
+        probs = torch.nn.functional.softmax(self._logits(inputs), dim=-1)
+        confidence = probs.max().item()
+        
+        predicted_id = probs.argmax().item()
+        predicted_label = self.model.config.id2label[predicted_id]
+        
+        # 2. KeyBERT Extraction
+        # Extract top 3 keywords
+        keywords_tuples = self.keybert_model.extract_keywords(
+            text, 
+            keyphrase_ngram_range=(1, 1), 
+            stop_words='english', 
+            top_n=3
+        )
+        keywords = [k[0] for k in keywords_tuples]
+
+        return self._finalize(text, predicted_label, confidence, keywords)
+
+    def predict_emotion_batch(self, texts, batch_size=32, max_padding=0, check_cache=True):
+        """
+        Batched predict_emotion for scoring and offline evaluation jobs.
+        
+        Texts are tokenized once without padding, sorted by token length and cut
+        into buckets of at most `batch_size` rows whose lengths differ by at most
+        `max_padding` tokens; each bucket is padded to its own longest row and runs
+        a single no-grad forward. Keywords come from one batched KeyBERT call, and
+        mapping and validation are shared with predict_emotion. With the default
+        max_padding=0 no row ever sees pad tokens, so every result matches the
+        single-text path; rows the batched KeyBERT call cannot serve (e.g. texts of
+        only stop words, which make the single path fall back) go through
+        predict_emotion itself.
+        
+        With a cache, hits are answered without inference and texts that
+        normalize to the same key are inferred once.
+        
+        Args:
+            texts (list[str]): User input texts.
+            batch_size (int): Max rows per forward pass.
+            max_padding (int): Max pad tokens per row within a bucket (trades exactness for fewer buckets).
+            check_cache (bool): Look texts up in the cache first (False if the caller already has).
             
-            # 2. KeyBERT Extraction
-            # Extract top 3 keywords
-            keywords_tuples = self.keybert_model.extract_keywords(
-                text, 
-                keyphrase_ngram_range=(1, 1), 
-                stop_words='english', 
+        Returns:
+            list[tuple]: (emotion_label, confidence_score, keywords_list) per text, in input order
+        """
+        results = [('calm', 0.0, [])] * len(texts)
+        valid = [i for i, text in enumerate(texts) if text and isinstance(text, str)]
+        if len(valid) < len(texts):
+            logger.warning(f"{len(texts) - len(valid)} invalid input texts in batch.")
+
+        # Rows to infer, keyed so that rows sharing a cache key run once
+        pending = {}
+        for i in valid:
+            if self.cache is not None and check_cache:
+                cached = self.cache.get(texts[i])
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            pending.setdefault(normalize_text(texts[i]) if self.cache is not None else i, []).append(i)
+        if not pending:
+            return results
+        docs = [texts[rows[0]] for rows in pending.values()]
+
+        try:
+            inferred = self._infer_batch(docs, batch_size, max_padding)
+        except Exception as e:
+            error_msg = f"Error in predict_emotion_batch, falling back to single-text inference: {e}"
+            logger.error(error_msg)
+            error_logger.error(error_msg)
+            inferred = [None] * len(docs)
+
+        for doc, result, rows in zip(docs, inferred, pending.values()):
+            if result is None:
+                result = self.predict_emotion(doc)
+            elif self.cache is not None:
+                self.cache.put(doc, result)
+            for i in rows:
+                results[i] = result
+        return results
+
+    def _infer_batch(self, docs, batch_size, max_padding):
+        """Uncached batched prediction; None marks rows that must take the single-text path."""
+        if not self.cascade:
+            return self._classify_batch(docs, batch_size, max_padding)
+
+        decisions = [self.validator.decide(doc) for doc in docs]
+        decided = [j for j, decision in enumerate(decisions) if decision is not None]
+        ambiguous = [j for j, decision in enumerate(decisions) if decision is None]
+        inferred = [None] * len(docs)
+        if decided:
+            keywords_batch = self.keybert_model.extract_keywords(
+                [docs[j] for j in decided],
+                keyphrase_ngram_range=(1, 1),
+                stop_words='english',
                 top_n=3
             )
-            keywords = [k[0] for k in keywords_tuples]
+            if len(decided) == 1:
+                keywords_batch = [keywords_batch]  # KeyBERT unwraps single-document results
+            for j, keywords in zip(decided, keywords_batch):
+                keywords = [k[0] for k in keywords]
+                inferred[j] = self._rule_result(docs[j], decisions[j], keywords) if keywords else None
+        if ambiguous:
+            for j, result in zip(ambiguous, self._classify_batch([docs[j] for j in ambiguous], batch_size, max_padding)):
+                inferred[j] = result
+        # Rows left as None are counted when predict_emotion retries them
+        self._count_decisions(sum(inferred[j] is not None for j in decided),
+                              sum(inferred[j] is not None for j in ambiguous))
+        return inferred
+
+    def _classify_batch(self, docs, batch_size, max_padding):
+        """Batched classifier + KeyBERT pass for _infer_batch."""
+        if self.head is not None:
+            return self._infer_shared(docs)
+
+        # 1. BERT Inference, one forward per length bucket
+        encodings = self.tokenizer(docs, truncation=True)
+        lengths = [len(ids) for ids in encodings['input_ids']]
+        order = sorted(range(len(docs)), key=lengths.__getitem__)
+        buckets = []
+        for j in order:
+            bucket = buckets[-1] if buckets else None
+            if bucket is None or len(bucket) >= batch_size or lengths[j] - lengths[bucket[0]] > max_padding:
+                buckets.append([j])
+            else:
+                bucket.append(j)
+
+        labels = [None] * len(docs)
+        confidences = [0.0] * len(docs)
+        for bucket in buckets:
+            inputs = self.tokenizer.pad(
+                {name: [encodings[name][j] for j in bucket] for name in encodings.keys()},
+                padding=True, return_tensors="pt"
+            ).to(self.device)
+            probs = torch.nn.functional.softmax(self._logits(inputs), dim=-1)
+            best, ids = probs.max(dim=-1)
+            for j, confidence, predicted_id in zip(bucket, best.tolist(), ids.tolist()):
+                confidences[j] = confidence
+                labels[j] = self.model.config.id2label[predicted_id]
+
+        # 2. KeyBERT Extraction, one call for the whole batch
+        keywords_batch = self.keybert_model.extract_keywords(
+            docs,
+            keyphrase_ngram_range=(1, 1),
+            stop_words='english',
+            top_n=3
+        )
+        if len(docs) == 1:
+            keywords_batch = [keywords_batch]  # KeyBERT unwraps single-document results
+
+        inferred = []
+        for j, doc in enumerate(docs):
+            keywords = [k[0] for k in keywords_batch[j]]
+            inferred.append(self._finalize(doc, labels[j], confidences[j], keywords) if keywords else None)
+        return inferred
+
+    def _infer_shared(self, docs):
+        """Shared-encoder prediction: one sentence embedding per text feeds both the emotion head and KeyBERT."""
+        embeddings = self.keybert_model.model.embed(docs)
+        probs = self.head.predict_proba(embeddings)
+        keywords_batch = self.keybert_model.extract_keywords(
+            docs,
+            keyphrase_ngram_range=(1, 1),
+            stop_words='english',
+            top_n=3,
+            doc_embeddings=embeddings
+        )
+        if len(docs) == 1:
+            keywords_batch = [keywords_batch]  # KeyBERT unwraps single-document results
+        elif not keywords_batch:
+            keywords_batch = [[]] * len(docs)  # No candidate words in any document
+
+        results = []
+        for doc, row, keywords in zip(docs, probs, keywords_batch):
+            predicted_id = int(row.argmax())
+            results.append(self._finalize(doc, self.head.labels[predicted_id], float(row[predicted_id]),
+                                          [k[0] for k in keywords]))
+        return results
 
-            # 3. Initial Mapping & Bridge logic
-            system_emotion = self.map_to_system_emotion(predicted_label, text)
-            raw_emotion = system_emotion
+    def _logits(self, inputs):
+        """Classifier logits from the configured backend, falling back to the PyTorch model."""
+        if self.backend is not None and self.backend.name != 'torch':
+            try:
+                return self.backend.logits(inputs)
+            except Exception as e:
+                msg = f"{self.backend.name} backend failed, running PyTorch instead: {e}"
+                logger.error(msg)
+                error_logger.error(msg)
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+    def _finalize(self, text, predicted_label, confidence, keywords):
+        """Map a raw model label to a system emotion, then validate and log it (shared by both paths)."""
+        # 3. Initial Mapping & Bridge logic
+        system_emotion = self.map_to_system_emotion(predicted_label, text)
+        raw_emotion = system_emotion
+        
+        # Special Handling for 'surprise' -> distinguish between happy and stressed
+        if predicted_label == 'surprise':
+            positive_kws = {'win', 'gift', 'award', 'happy', 'excited', 'wonderful', 'great'}
+            negative_kws = {'shock', 'bad', 'exam', 'deadline', 'emergency', 'panic', 'stress'}
             
-            # Special Handling for 'surprise' -> distinguish between happy and stressed
-            if predicted_label == 'surprise':
-                positive_kws = {'win', 'gift', 'award', 'happy', 'excited', 'wonderful', 'great'}
-                negative_kws = {'shock', 'bad', 'exam', 'deadline', 'emergency', 'panic', 'stress'}
-                
-                if any(kw in text.lower() for kw in negative_kws):
-                     raw_emotion = 'stressed'
-                elif any(kw in text.lower() for kw in positive_kws):
-                     raw_emotion = 'happy'
-                else:
-                     raw_emotion = 'motivated' # Keep existing mapping
-
-            # 4. Validation Layer
-            validated_emotion, validated_confidence = self.validator.validate(
-                text, raw_emotion, confidence, keywords
-            )
+            if any(kw in text.lower() for kw in negative_kws):
+                 raw_emotion = 'stressed'
+            elif any(kw in text.lower() for kw in positive_kws):
+                 raw_emotion = 'happy'
+            else:
+                 raw_emotion = 'motivated' # Keep existing mapping
 
-            # 5. Logging
-            override_flag = "OVERRIDE" if raw_emotion != validated_emotion else "PASS"
-            log_msg = f"{override_flag} | Raw: {raw_emotion} ({confidence:.2f}) -> Validated: {validated_emotion} ({validated_confidence:.2f}) | Keywords: {keywords} | Input: {text[:50]}..."
-            validation_logger.info(log_msg)
+        # 4. Validation Layer
+        validated_emotion, validated_confidence = self.validator.validate(
+            text, raw_emotion, confidence, keywords
+        )
 
-            return validated_emotion, validated_confidence, keywords
+        # 5. Logging
+        override_flag = "OVERRIDE" if raw_emotion != validated_emotion else "PASS"
+        log_msg = f"{override_flag} | Raw: {raw_emotion} ({confidence:.2f}) -> Validated: {validated_emotion} ({validated_confidence:.2f}) | Keywords: {keywords} | Input: {text[:50]}..."
+        validation_logger.info(log_msg)
 
-        except Exception as e:
-            error_msg = f"Error in predict_emotion: {e}"
-            logger.error(error_msg)
-            error_logger.error(error_msg)
-            # Fallback
-            return 'calm', 0.5, []
+        return validated_emotion, validated_confidence, keywords
 
     def map_to_system_emotion(self, bert_label, text):
         """Bridge NLP labels to system categories with contextual refinement."""
@@ -0,0 +1,71 @@
+"""
+Lightweight emotion classifier over sentence embeddings.
+
+In the shared-encoder mode of EmotionDetector, each document is embedded once
+by KeyBERT's sentence encoder (all-MiniLM-L6-v2). The same embedding is scored
+by this head and passed to KeyBERT for keyword extraction, so a request runs
+one document forward instead of two and DistilBERT is never loaded.
+
+The head is a multinomial logistic regression, softmax(E W^T + b), stored with
+its label names and encoder name in a small .npz file. It is trained by
+scripts/train_emotion_head.py on the same dataset as the DistilBERT classifier.
+"""
+import numpy as np
+from typing import List, Sequence
+
+HEAD_PATH = './models/emotion_head_minilm.npz'
+ENCODER_NAME = 'all-MiniLM-L6-v2'
+
+
+class EmotionHead:
+    """
+    Args:
+        weights: (n_labels, dim) class weights
+        bias: (n_labels,) class offsets
+        labels: dataset label names, indexed like the rows of `weights`
+        encoder: sentence encoder the head was trained on
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: Sequence[str], encoder: str = ENCODER_NAME):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.labels: List[str] = list(labels)
+        self.encoder = encoder
+        if not self.weights.shape[0] == len(self.bias) == len(self.labels):
+            raise ValueError(f"Head shape mismatch: weights {self.weights.shape}, bias {self.bias.shape}")
+
+    @property
+    def dim(self) -> int:
+        return self.weights.shape[1]
+
+    def logits(self, embeddings: np.ndarray) -> np.ndarray:
+        """(n, dim) embeddings -> (n, n_labels) logits."""
+        return np.atleast_2d(embeddings).astype(np.float32, copy=False) @ self.weights.T + self.bias
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        logits = self.logits(embeddings)
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, targets: np.ndarray, labels: Sequence[str], encoder: str = ENCODER_NAME,
+            C: float = 1.0, max_iter: int = 1000) -> 'EmotionHead':
+        """Fit a multinomial logistic regression on (n, dim) embeddings and integer targets (3+ classes)."""
+        from sklearn.linear_model import LogisticRegression
+
+        model = LogisticRegression(C=C, max_iter=max_iter)
+        model.fit(embeddings, targets)
+        weights = np.zeros((len(labels), embeddings.shape[1]))
+        bias = np.full(len(labels), -1e4)  # Classes absent from the training data are never predicted
+        weights[model.classes_] = model.coef_
+        bias[model.classes_] = model.intercept_
+        return cls(weights, bias, labels, encoder)
+
+    def save(self, path: str):
+        np.savez(path, weights=self.weights, bias=self.bias, labels=np.array(self.labels), encoder=self.encoder)
+
+    @classmethod
+    def load(cls, path: str) -> 'EmotionHead':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['weights'], data['bias'], [str(label) for label in data['labels']], str(data['encoder']))
@@ -112,6 +112,32 @@ class EmotionValidator:
         # No override needed
         return predicted_emotion, confidence
     
+    def decide(self, text: str):
+        """
+        Lexical pass run before the model in cascade mode.
+
+        Returns (emotion, confidence) when a rule settles the emotion on its own,
+        or None when the text is ambiguous and needs the classifier:
+        - neutral language without stress words is 'calm' whatever the model says
+          (Rules 2 and 3 both yield calm);
+        - stress words with no neutral, anxiety, anger, sadness, happy or sarcasm
+          cue are 'stressed' (Rule 1). The full pipeline disagrees only when the
+          model predicts fear or stays below 0.6 confidence.
+        """
+        if not text:
+            return None
+        text_lower = text.lower()
+        stress = self._has_match('stress', text_lower)
+        neutral = self._has_match('neutral', text_lower)
+
+        if neutral and not stress:
+            return 'calm', 0.80
+        if stress and not neutral and not any(
+                self._has_match(category, text_lower)
+                for category in ('anxiety', 'anger', 'sadness', 'happy', 'sarcasm')):
+            return 'stressed', 0.75
+        return None
+
     def _has_match(self, category: str, text: str) -> bool:
         """Check if any keywords present in text using compiled regex"""
         return bool(self.patterns[category].search(text))
@@ -45,6 +45,15 @@ class HeuristicRanker:
             
         return scores
 
+    def score_matrix(self, features: np.ndarray) -> np.ndarray:
+        """
+        Vectorized equivalent of score() over an (n, >=2) feature matrix.
+        """
+        features = np.asarray(features, dtype=float)
+        norm_views = np.minimum(features[:, 0] / 15.0, 1.0)
+        engagement = np.clip(features[:, 1], 0.0, 1.0)
+        return 0.5 * norm_views + 0.5 * engagement
+
     def get_score(self, vid: dict) -> float:
         """Calculate score for a single candidate."""
         feats = vid.get('features', [])
@@ -0,0 +1,118 @@
+"""
+Pluggable inference backends for the EmotionDetector classifier.
+
+Backends take the tokenizer's PyTorch inputs and return logits as a CPU
+torch tensor, so softmax, label mapping and validation stay shared:
+
+    TorchBackend      the Hugging Face model itself (the default and the fallback)
+    OnnxBackend       the same model exported to ONNX, optionally with dynamic int8
+                      weight quantization, served by onnxruntime on the CPU
+    EarlyExitBackend  layer-by-layer forward with confident exits (src/ml/early_exit.py)
+
+`load_onnx_backend` exports and quantizes a loaded model once and reuses the
+files under `directory` afterwards (delete them to re-export after changing
+the checkpoint). onnxruntime and onnx are optional dependencies; callers fall
+back to TorchBackend when they are missing or the export fails.
+"""
+import os
+import re
+import inspect
+import logging
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnx', 'early_exit')
+ONNX_DIR = './models/onnx'
+INPUT_NAMES = ('input_ids', 'attention_mask')
+
+
+class TorchBackend:
+    name = 'torch'
+
+    def __init__(self, model):
+        self.model = model
+
+    def logits(self, inputs) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+
+class OnnxBackend:
+    """onnxruntime session over an exported classifier (CPU execution provider)."""
+
+    name = 'onnx'
+
+    def __init__(self, path: str, intra_op_threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, inputs) -> torch.Tensor:
+        feed = {name: inputs[name].cpu().numpy().astype(np.int64) for name in self.input_names}
+        return torch.from_numpy(self.session.run(['logits'], feed)[0])
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Positional (input_ids, attention_mask) -> logits wrapper for tracing."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export_onnx(model, path: str, opset: int = 17):
+    """Export a (CPU) sequence classifier to ONNX with dynamic batch and sequence axes."""
+    wrapper = _LogitsOnly(model).eval()  # A fresh wrapper is in training mode: dropout would be exported
+    dummy = torch.ones((2, 8), dtype=torch.long)
+    options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter yields a single-file graph that quantize_dynamic can process
+        options['dynamo'] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper, (dummy, dummy), path,
+            input_names=list(INPUT_NAMES), output_names=['logits'],
+            dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                          'attention_mask': {0: 'batch', 1: 'sequence'},
+                          'logits': {0: 'batch'}},
+            opset_version=opset, **options
+        )
+
+
+def quantize_int8(src: str, dst: str):
+    """Dynamic int8 quantization of the MatMul/Gemm weights (activations stay float)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+
+
+def load_onnx_backend(model, model_name: str, directory: str = ONNX_DIR, quantize: bool = True,
+                      intra_op_threads: int = None) -> OnnxBackend:
+    """OnnxBackend for `model`, exporting (and quantizing) it into `directory` on first use."""
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, re.sub(r'[^A-Za-z0-9._-]+', '_', model_name.strip('/')))
+    fp32_path = stem + '.onnx'
+    path = stem + '.int8.onnx' if quantize else fp32_path
+
+    # Written under a temporary name and renamed, so an interrupted export is never loaded
+    if not os.path.exists(path):
+        if not os.path.exists(fp32_path):
+            logger.info(f"Exporting {model_name} to ONNX at {fp32_path}...")
+            export_onnx(model, fp32_path + '.tmp')
+            os.replace(fp32_path + '.tmp', fp32_path)
+        if quantize:
+            logger.info(f"Quantizing {fp32_path} to int8...")
+            quantize_int8(fp32_path, path + '.tmp')
+            os.replace(path + '.tmp', path)
+    return OnnxBackend(path, intra_op_threads=intra_op_threads)
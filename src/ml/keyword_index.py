@@ -0,0 +1,216 @@
+"""
+Vocabulary embedding index: KeyBERT-compatible keyword extraction without
+re-embedding candidate words on every call.
+
+KeyBERT splits each document into candidate unigrams (CountVectorizer with
+English stop words), embeds every candidate through the sentence encoder and
+ranks candidates by cosine similarity to the document embedding. For short
+mood texts the candidate forward dominates the cost, yet the candidates come
+from a small, stable vocabulary.
+
+KeywordIndex keeps L2-normalized embeddings of a prebuilt vocabulary in a
+memory-mapped float32 .npy matrix (scripts/build_keyword_index.py) with the
+words in a sidecar .vocab.txt file. Extraction is one document embedding plus a
+vectorized cosine top-k over the cached rows. Out-of-vocabulary candidates are
+embedded on the fly in one batched call, kept in memory, and merged into the
+files on flush().
+
+Both files are written under temporary names and renamed matrix first, vocabulary
+second. A reader that finds a matrix whose row count disagrees with the
+vocabulary while a pending `.vocab.tmp` matches it completes the interrupted
+rename, so a crash between the two renames never leaves a mismatched index.
+
+It exposes `model` (the encoder backend) and `extract_keywords` with KeyBERT's
+signature and return conventions, so it replaces `EmotionDetector.keybert_model`.
+"""
+import os
+import logging
+import numpy as np
+from threading import Lock
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = './models/keyword_index'
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class KeywordIndex:
+    """
+    Args:
+        model: sentence encoder backend with `embed(list[str]) -> (n, dim) array` (e.g. KeyBERT(...).model)
+        path: index prefix; `<path>.npy` and `<path>.vocab.txt` are memory-mapped if present
+        max_oov: out-of-vocabulary words cached in memory (further ones are embedded but not kept)
+    """
+
+    def __init__(self, model, path: Optional[str] = None, max_oov: int = 100_000):
+        self.model = model
+        self.path = path
+        self.max_oov = max_oov
+        self.words: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.matrix = None  # (n, dim) float32, memory-mapped
+        self.oov: Dict[str, np.ndarray] = {}
+        self._lock = Lock()
+        self._analyzers = {}
+        self.lookups = self.oov_hits = self.oov_embedded = 0
+        if path and os.path.exists(path + '.npy'):
+            self._open()
+
+    def __len__(self):
+        return len(self.words) + len(self.oov)
+
+    @staticmethod
+    def _read_vocab(path: str) -> List[str]:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        return text.split('\n') if text else []  # '' is the empty index, not one empty word
+
+    def _open(self):
+        self.matrix = np.load(self.path + '.npy', mmap_mode='r')
+        self.words = self._read_vocab(self.path + '.vocab.txt')
+        pending = self.path + '.vocab.tmp'
+        if len(self.words) != len(self.matrix) and os.path.exists(pending):
+            words = self._read_vocab(pending)
+            if len(words) == len(self.matrix):
+                # A commit stopped between its two renames: the matrix is already the new one
+                try:
+                    os.replace(pending, self.path + '.vocab.txt')
+                except FileNotFoundError:
+                    pass  # Another process finished it first
+                self.words = words
+        if len(self.words) != len(self.matrix):
+            raise ValueError(f"Keyword index {self.path} has {len(self.words)} words but {len(self.matrix)} rows")
+        self.index = {word: i for i, word in enumerate(self.words)}
+        logger.info(f"Keyword index mapped with {len(self.words)} words from {self.path}.npy")
+
+    @classmethod
+    def build(cls, model, words: Sequence[str], path: str, batch_size: int = 512) -> 'KeywordIndex':
+        """Embed `words` (deduplicated, order kept) in batches and write a new index at `path`."""
+        words = list(dict.fromkeys(w for w in words if w and '\n' not in w))
+        # An empty vocabulary gives a (0, 0) matrix; flush() sizes it from the first OOV words
+        first = _normalize(model.embed(words[:batch_size])) if words else np.zeros((0, 0), dtype=np.float32)
+        tmp = path + '.tmp.npy'
+        matrix = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(len(words), first.shape[1]))
+        matrix[:len(first)] = first
+        for start in range(batch_size, len(words), batch_size):
+            matrix[start:start + batch_size] = _normalize(model.embed(words[start:start + batch_size]))
+        matrix.flush()
+        del matrix
+        cls._commit(path, words)
+        return cls(model, path)
+
+    @staticmethod
+    def _commit(path: str, words: List[str]):
+        """Install `<path>.tmp.npy` and `words` as the index: matrix rename first (see _open)."""
+        with open(path + '.vocab.tmp', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(words))
+        os.replace(path + '.tmp.npy', path + '.npy')
+        os.replace(path + '.vocab.tmp', path + '.vocab.txt')
+
+    def _analyzer(self, stop_words):
+        """Candidate tokenizer identical to KeyBERT's default CountVectorizer."""
+        key = stop_words if isinstance(stop_words, (str, type(None))) else tuple(stop_words)
+        analyzer = self._analyzers.get(key)
+        if analyzer is None:
+            from sklearn.feature_extraction.text import CountVectorizer
+            analyzer = CountVectorizer(ngram_range=(1, 1), stop_words=stop_words).build_analyzer()
+            self._analyzers[key] = analyzer
+        return analyzer
+
+    def vectors(self, words: Sequence[str]) -> np.ndarray:
+        """(len(words), dim) normalized embeddings, embedding any missing words in one encoder call."""
+        with self._lock:
+            missing = [w for w in dict.fromkeys(words) if w not in self.index and w not in self.oov]
+        fresh = dict(zip(missing, _normalize(self.model.embed(missing)))) if missing else {}
+
+        with self._lock:
+            self.lookups += len(words)
+            self.oov_embedded += len(missing)
+            for word, vector in fresh.items():
+                if len(self.oov) < self.max_oov:
+                    self.oov[word] = vector
+            rows = []
+            for word in words:
+                i = self.index.get(word)
+                if i is not None:
+                    rows.append(self.matrix[i])
+                else:
+                    vector = self.oov.get(word)
+                    if vector is None:
+                        vector = fresh[word]
+                    elif word not in fresh:
+                        self.oov_hits += 1
+                    rows.append(vector)
+        return np.vstack(rows)
+
+    def extract_keywords(self, docs, keyphrase_ngram_range=(1, 1), stop_words='english', top_n: int = 5,
+                         doc_embeddings: np.ndarray = None):
+        """
+        KeyBERT.extract_keywords for unigrams: top_n (word, cosine similarity) per document,
+        best first. A single string returns one list; a list returns one list per document
+        (or [] when no document has a candidate word, as KeyBERT does).
+        """
+        if tuple(keyphrase_ngram_range) != (1, 1):
+            raise ValueError("KeywordIndex only indexes unigrams")
+        single = isinstance(docs, str)
+        if single:
+            if not docs:
+                return []
+            docs = [docs]
+
+        analyzer = self._analyzer(stop_words)
+        candidates = [list(dict.fromkeys(analyzer(doc))) for doc in docs]
+        vocabulary = list(dict.fromkeys(word for words in candidates for word in words))
+        if not vocabulary:
+            return []
+        column = {word: j for j, word in enumerate(vocabulary)}
+
+        if doc_embeddings is None:
+            doc_embeddings = self.model.embed(docs)
+        similarity = _normalize(doc_embeddings) @ self.vectors(vocabulary).T  # (n_docs, n_words)
+
+        results = []
+        for i, words in enumerate(candidates):
+            if not words:
+                results.append([])
+                continue
+            scores = similarity[i, [column[w] for w in words]]
+            order = np.argsort(-scores, kind='stable')[:top_n]
+            results.append([(words[j], round(float(scores[j]), 4)) for j in order])
+        return results[0] if single else results
+
+    def flush(self):
+        """Merge cached out-of-vocabulary words into the index files (no-op without a path or new words)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self.oov:
+                return
+            words = self.words + list(self.oov)
+            new = np.vstack(list(self.oov.values()))
+            dim = new.shape[1]
+            tmp = self.path + '.tmp.npy'
+            matrix = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(len(words), dim))
+            if self.words:
+                matrix[:len(self.words)] = self.matrix
+            matrix[len(self.words):] = new
+            matrix.flush()
+            del matrix
+            self._commit(self.path, words)
+            self.oov = {}
+            self._open()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'indexed_words': len(self.words),
+                'cached_oov_words': len(self.oov),
+                'lookups': self.lookups,
+                'oov_hits': self.oov_hits,
+                'oov_embedded': self.oov_embedded,
+            }
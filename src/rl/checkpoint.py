@@ -0,0 +1,273 @@
+import os
+import glob
+import time
+import struct
+import zlib
+import logging
+import threading
+import numpy as np
+from typing import Iterator, Optional, Tuple
+
+from src.rl import snapshot
+
+logger = logging.getLogger(__name__)
+
+# Record framing: payload_len, crc32(seq + payload), seq
+RECORD_HEADER = struct.Struct('<IIQ')
+# Payload prefix: len(emotion), len(category), reward; followed by the two keys and the float64 context
+PAYLOAD_PREFIX = struct.Struct('<HHd')
+SEQ = struct.Struct('<Q')
+
+
+class FeedbackLog:
+    """
+    Append-only write-ahead log of LinUCB updates: (emotion, category, context, reward).
+
+    The log is split into segment files named `<path>.<first_seq>`; a new segment
+    starts at every checkpoint so segments fully covered by a snapshot can be
+    deleted. Appends are buffered and fsync'd in batches of `fsync_every` records
+    (or by `sync()` from the checkpoint thread), so at most one batch is lost on a
+    crash. A torn record at the tail of the last segment ends replay; opening the
+    log truncates it, so new records are never appended behind a tear.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 32):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._file = None
+        self._pending = 0
+        self._repair_tail()
+        self.last_seq = max((seq for seq, _, _, _, _ in self.replay()), default=0)
+        self._open_segment(self.last_seq + 1)
+
+    def segments(self):
+        """Segment paths in sequence order."""
+        paths = glob.glob(glob.escape(self.path) + '.*')
+        return sorted((p for p in paths if p.rsplit('.', 1)[-1].isdigit()), key=lambda p: int(p.rsplit('.', 1)[-1]))
+
+    @staticmethod
+    def _records(path: str, data: bytes) -> Iterator[Tuple[int, int, bytes]]:
+        """Yield (end offset, seq, payload) of every intact record of one segment, stopping at a torn one."""
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, crc, seq = RECORD_HEADER.unpack_from(data, offset)
+            payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(SEQ.pack(seq) + payload) != crc:
+                logger.warning(f"Torn WAL record at {path}:{offset}; ignoring the rest of the segment")
+                return
+            offset += RECORD_HEADER.size + length
+            yield offset, seq, payload
+
+    def _repair_tail(self):
+        """Truncate the last segment to its last intact record (a crash can leave a torn write there)."""
+        segments = self.segments()
+        if not segments:
+            return
+        path = segments[-1]
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = 0
+        for end, _, _ in self._records(path, data):
+            pass
+        if end < len(data):
+            logger.warning(f"Truncating {len(data) - end} bytes after the last intact record of {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+                os.fsync(f.fileno())
+
+    def _open_segment(self, first_seq: int):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._segment_path = f"{self.path}.{first_seq:012d}"
+        self._file = open(self._segment_path, 'ab')
+
+    def append(self, emotion: str, category: str, context: np.ndarray, reward: float) -> int:
+        """Append one update and return its sequence number."""
+        e, c = emotion.encode('utf-8'), category.encode('utf-8')
+        payload = (PAYLOAD_PREFIX.pack(len(e), len(c), float(reward)) + e + c
+                   + np.ascontiguousarray(context, dtype='<f8').tobytes())
+        seq = self.last_seq + 1
+        crc = zlib.crc32(SEQ.pack(seq) + payload)
+        self._file.write(RECORD_HEADER.pack(len(payload), crc, seq) + payload)
+        self.last_seq = seq
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.sync()
+        return seq
+
+    def sync(self):
+        """Flush buffered records and fsync the active segment."""
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def rotate(self):
+        """Close the active segment and start a new one at the next sequence number."""
+        self.sync()
+        self._file.close()
+        if os.path.getsize(self._segment_path) == 0:
+            os.unlink(self._segment_path)
+        self._open_segment(self.last_seq + 1)
+
+    def advance_to(self, seq: int):
+        """Continue numbering after `seq` (e.g. a snapshot that outlived its pruned segments)."""
+        if seq > self.last_seq:
+            self.last_seq = seq
+            self.rotate()
+
+    def prune(self, upto_seq: int):
+        """Delete closed segments whose records are all <= upto_seq."""
+        segments = self.segments()
+        for path, next_path in zip(segments, segments[1:]):
+            if path != self._segment_path and int(next_path.rsplit('.', 1)[-1]) <= upto_seq + 1:
+                os.unlink(path)
+
+    def replay(self, after_seq: int = 0) -> Iterator[Tuple[int, str, str, np.ndarray, float]]:
+        """Yield (seq, emotion, category, context, reward) for every intact record after `after_seq`."""
+        for path in self.segments():
+            with open(path, 'rb') as f:
+                data = f.read()
+            for _, seq, payload in self._records(path, data):
+                if seq <= after_seq:
+                    continue
+                e_len, c_len, reward = PAYLOAD_PREFIX.unpack_from(payload)
+                pos = PAYLOAD_PREFIX.size
+                emotion = payload[pos:pos + e_len].decode('utf-8')
+                category = payload[pos + e_len:pos + e_len + c_len].decode('utf-8')
+                context = np.frombuffer(payload, dtype='<f8', offset=pos + e_len + c_len).reshape(-1, 1)
+                yield seq, emotion, category, context, reward
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class CheckpointManager:
+    """
+    Durable LinUCB learning: every update goes through the feedback log before it is
+    applied, and a background thread writes full snapshots every `snapshot_every`
+    updates or `snapshot_interval` seconds. Scorers are never blocked on disk I/O;
+    the registry is copied under its slot locks and written outside them.
+    """
+
+    def __init__(self, recommender, directory: str = './models',
+                 snapshot_every: int = 500, snapshot_interval: float = 300.0,
+                 fsync_every: int = 32, fsync_interval: float = 1.0):
+        self.recommender = recommender
+        self.snapshot_path = os.path.join(directory, 'linucb_state.snap')
+        self.legacy_path = os.path.join(directory, 'linucb_models.pkl')
+        self.wal = self._open_log(os.path.join(directory, 'feedback.wal'), fsync_every)
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.fsync_interval = fsync_interval
+
+        self._lock = self._make_lock()  # Orders log appends with model updates
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot_seq = 0
+        self._snapshot_total = None  # total_interactions at the last snapshot
+        self._last_snapshot_time = time.monotonic()
+
+    def _open_log(self, path: str, fsync_every: int) -> FeedbackLog:
+        return FeedbackLog(path, fsync_every=fsync_every)
+
+    def _make_lock(self):
+        return threading.Lock()
+
+    def recover(self) -> int:
+        """Load the latest snapshot (or legacy pickle) and replay the log tail. Returns records replayed."""
+        if os.path.exists(self.snapshot_path):
+            header = self.recommender.load_snapshot(self.snapshot_path)
+            self._snapshot_seq = header['wal_seq']
+            self._snapshot_total = header['total_interactions']
+            self.wal.advance_to(self._snapshot_seq)
+        elif os.path.exists(self.legacy_path):
+            self.recommender.load(self.legacy_path)
+
+        replayed = 0
+        for _, emotion, category, context, reward in self.wal.replay(after_seq=self._snapshot_seq):
+            # Already applied (and exported) before the restart; not a new delta for peers
+            self.recommender.update(emotion, category, context, reward, record_delta=False)
+            replayed += 1
+        if replayed:
+            logger.info(f"Replayed {replayed} feedback records after snapshot seq {self._snapshot_seq}")
+        return replayed
+
+    def attach(self):
+        """
+        Take over checkpointing for a recommender that already holds live state
+        (e.g. a shared-memory registry another worker recovered). Nothing is loaded
+        or replayed; numbering continues after the newest snapshot and log record.
+        """
+        if os.path.exists(self.snapshot_path):
+            self._snapshot_seq = snapshot.read_header(self.snapshot_path)['wal_seq']
+            self.wal.advance_to(self._snapshot_seq)
+
+    def apply(self, emotion: str, category: str, context: np.ndarray, reward: float) -> int:
+        """Log then apply one update. Returns its sequence number."""
+        with self._lock:
+            seq = self.wal.append(emotion, category, context, reward)
+            self.recommender.update(emotion, category, context, reward)
+        if seq - self._snapshot_seq >= self.snapshot_every:
+            self._wake.set()
+        return seq
+
+    def apply_batch(self, emotion: str, category: str, contexts: np.ndarray, rewards: np.ndarray) -> int:
+        """Log k updates for one key, then apply them as one rank-k step. Returns the last sequence number."""
+        with self._lock:
+            for context, reward in zip(contexts, rewards):
+                seq = self.wal.append(emotion, category, context, reward)
+            self.recommender.update_batch(emotion, category, contexts, rewards)
+        if seq - self._snapshot_seq >= self.snapshot_every:
+            self._wake.set()
+        return seq
+
+    def checkpoint(self):
+        """Write a full snapshot and drop log segments it covers."""
+        with self._lock:
+            seq = self.wal.last_seq
+            total = self.recommender.total_interactions
+            # The registry can also change without going through this log (e.g. merged peer deltas)
+            unchanged = seq == self._snapshot_seq and total == self._snapshot_total
+            if unchanged and os.path.exists(self.snapshot_path):
+                return
+            registry = self.recommender.registry.compact_copy()
+            alpha = self.recommender.alpha
+            self.wal.rotate()
+        snapshot.write_snapshot(self.snapshot_path, registry, alpha, total, wal_seq=seq)
+        self._snapshot_seq = seq
+        self._snapshot_total = total
+        self._last_snapshot_time = time.monotonic()
+        self.wal.prune(seq)
+        logger.info(f"LinUCB checkpoint written at seq {seq} ({len(registry)} models)")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.fsync_interval)
+            self._wake.clear()
+            try:
+                with self._lock:
+                    self.wal.sync()
+                due = time.monotonic() - self._last_snapshot_time >= self.snapshot_interval
+                if due or self.wal.last_seq - self._snapshot_seq >= self.snapshot_every:
+                    self.checkpoint()
+            except Exception as e:
+                logger.error(f"Checkpoint failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='linucb-checkpoint', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and write a final snapshot."""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.checkpoint()
+        self.wal.close()
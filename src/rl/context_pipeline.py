@@ -0,0 +1,114 @@
+"""
+Fixed-dimension context pipeline for extended LinUCB features.
+
+Extended features (title embeddings, richer user features, ...) are mapped to
+`out_dim` columns appended after the 19-dim base context, so the one-hot and
+dense layout LinUCBRecommender.build_context_matrix produces is unchanged:
+
+    x = [ base (19) | P^T f (out_dim) ]
+
+Two seeded projections P (in_dim, out_dim) are available:
+
+    hash        signed feature hashing (Weinberger et al., 2009): input j lands in
+                bucket h(j) with sign s(j); one non-zero per input, inner products
+                preserved in expectation
+    projection  sparse random projection (Achlioptas 2003 / Li et al. 2006): entries
+                +-sqrt(1 / (density * out_dim)) with probability density / 2 each,
+                density = 1 / sqrt(in_dim) by default
+
+Both are deterministic in `seed`, so every worker and node that shares the
+config produces identical contexts for identical features.
+"""
+import numpy as np
+from typing import Dict, Optional
+
+from src.rl.linucb_recommender import CONTEXT_DIM
+
+
+class SignedFeatureHasher:
+    """Signed feature hashing of `in_dim` dense features into `out_dim` buckets."""
+
+    def __init__(self, in_dim: int, out_dim: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.in_dim = in_dim
+        self.out_dim = out_dim
+        self.buckets = rng.integers(out_dim, size=in_dim)
+        self.signs = rng.choice([-1.0, 1.0], size=in_dim)
+        self.matrix = np.zeros((in_dim, out_dim))
+        self.matrix[np.arange(in_dim), self.buckets] = self.signs
+
+    def transform(self, F: np.ndarray) -> np.ndarray:
+        """(n, in_dim) -> (n, out_dim)"""
+        return np.atleast_2d(np.asarray(F, dtype=float)) @ self.matrix
+
+
+class SparseRandomProjection:
+    """Seeded sparse random projection of `in_dim` features to `out_dim` (approximately norm preserving)."""
+
+    def __init__(self, in_dim: int, out_dim: int, density: Optional[float] = None, seed: int = 0):
+        if density is None:
+            density = 1.0 / np.sqrt(in_dim)
+        if not 0.0 < density <= 1.0:
+            raise ValueError(f"density must be in (0, 1], got {density}")
+        rng = np.random.default_rng(seed)
+        self.in_dim = in_dim
+        self.out_dim = out_dim
+        self.density = density
+        scale = np.sqrt(1.0 / (density * out_dim))
+        nonzero = rng.random((in_dim, out_dim)) < density
+        self.matrix = np.where(nonzero, rng.choice([-scale, scale], size=(in_dim, out_dim)), 0.0)
+
+    def transform(self, F: np.ndarray) -> np.ndarray:
+        """(n, in_dim) -> (n, out_dim)"""
+        return np.atleast_2d(np.asarray(F, dtype=float)) @ self.matrix
+
+
+PROJECTIONS = {
+    'hash': SignedFeatureHasher,
+    'projection': SparseRandomProjection,
+}
+
+
+class ContextPipeline:
+    """
+    Base context plus projected extended features.
+
+    Args:
+        in_dim: number of extended features per candidate
+        out_dim: projected width appended to the base context
+        method: 'hash' or 'projection'
+    """
+
+    def __init__(self, in_dim: int, out_dim: int = 32, method: str = 'hash', seed: int = 0, **kwargs):
+        if method not in PROJECTIONS:
+            raise ValueError(f"Unknown projection method {method!r}")
+        self.method = method
+        self.seed = seed
+        self.projection = PROJECTIONS[method](in_dim, out_dim, seed=seed, **kwargs)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'ContextPipeline':
+        """Build from e.g. {'in_dim': 400, 'out_dim': 32, 'method': 'projection', 'seed': 7}."""
+        return cls(**config)
+
+    @property
+    def in_dim(self) -> int:
+        return self.projection.in_dim
+
+    @property
+    def context_dim(self) -> int:
+        """Width of the contexts this pipeline produces (pass as LinUCBRecommender context_dim)."""
+        return CONTEXT_DIM + self.projection.out_dim
+
+    def transform(self, X: np.ndarray, extended: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            X: (n, 19) base contexts from LinUCBRecommender.build_context_matrix
+            extended: (n, in_dim) extended features, or (in_dim,) shared by every row
+
+        Returns:
+            (n, context_dim) contexts
+        """
+        X = np.atleast_2d(X)
+        extended = np.broadcast_to(np.asarray(extended, dtype=float), (len(X), self.in_dim))
+        return np.hstack([X, self.projection.transform(extended)])
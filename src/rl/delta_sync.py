@@ -0,0 +1,145 @@
+"""
+Delta exchange for LinUCB nodes that learn independently and sync periodically.
+
+Each node accumulates, per model key, the sufficient statistics of its own
+updates since the last export:
+
+    D_A = sum_i lambda^(k-1-i) x_i x_i^T      D_b = sum_i lambda^(k-1-i) r_i x_i
+
+together with k, the number of those updates. Starting from a common base A_0,
+a node's model is lambda^k A_0 + D_A. Merging a peer delta (k_m, D_m) into a
+model that has folded K updates since the base uses
+
+    A <- lambda^(k_m) A + lambda^K D_m
+
+which yields lambda^(sum k) A_0 + sum_j lambda^(sum k - k_j) D_j on every node
+regardless of merge order, so nodes that exchange all deltas agree exactly.
+With lambda_forget = 1 this is the plain sum, identical to a single node that
+saw all traffic.
+
+Blob layout (little-endian), zlib-compressed after the header:
+    header   magic, version, context_dim, n_models, lambda_forget, crc32(body)
+    body     per model: key length (H), key bytes, k (Q), upper triangle of D_A, D_b
+"""
+import struct
+import zlib
+import numpy as np
+from threading import Lock
+from typing import Dict, NamedTuple
+
+MAGIC = b'LINUCBDL'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIIdI')  # magic, version, context_dim, n_models, lambda_forget, body crc32
+ENTRY = struct.Struct('<HQ')  # key length, update count
+
+
+class DeltaError(ValueError):
+    """Raised when a delta blob is malformed or incompatible with the recommender."""
+
+
+class ModelDelta(NamedTuple):
+    count: int
+    A: np.ndarray  # (d, d)
+    b: np.ndarray  # (d,)
+
+
+class DeltaTracker:
+    """Per-key accumulators of a node's own updates since its last export."""
+
+    def __init__(self, context_dim: int):
+        self.context_dim = context_dim
+        self._lock = Lock()
+        self._A: Dict[str, np.ndarray] = {}
+        self._b: Dict[str, np.ndarray] = {}
+        self._count: Dict[str, int] = {}
+        self._folded: Dict[str, int] = {}  # Updates folded into the model since the last sync base
+
+    def record(self, key: str, X: np.ndarray, rewards: np.ndarray, lambda_forget: float):
+        """Accumulate k = len(rewards) updates (rows of X, oldest first) for `key`."""
+        k = len(rewards)
+        weights = lambda_forget ** np.arange(k - 1, -1, -1)
+        decay = lambda_forget ** k
+        d = self.context_dim
+        with self._lock:
+            A = self._A.get(key)
+            if A is None:
+                A = self._A[key] = np.zeros((d, d))
+                self._b[key] = np.zeros(d)
+                self._count[key] = 0
+            A *= decay
+            A += (X.T * weights) @ X
+            self._b[key] *= decay
+            self._b[key] += (weights * rewards) @ X
+            self._count[key] += k
+            self._folded[key] = self._folded.get(key, 0) + k
+
+    def folded(self, key: str) -> int:
+        with self._lock:
+            return self._folded.get(key, 0)
+
+    def add_folded(self, key: str, k: int):
+        with self._lock:
+            self._folded[key] = self._folded.get(key, 0) + k
+
+    def drain(self) -> Dict[str, ModelDelta]:
+        """Take every non-empty accumulator and start a new sync epoch."""
+        with self._lock:
+            deltas = {key: ModelDelta(self._count[key], self._A[key], self._b[key])
+                      for key in self._A if self._count[key]}
+            # The exported updates are the only ones folded since the new base
+            self._folded = {key: delta.count for key, delta in deltas.items()}
+            self._A, self._b, self._count = {}, {}, {}
+        return deltas
+
+
+def encode_delta(deltas: Dict[str, ModelDelta], context_dim: int, lambda_forget: float) -> bytes:
+    """Serialize deltas; D_A is symmetric so only its upper triangle is stored."""
+    iu = np.triu_indices(context_dim)
+    parts = []
+    for key, delta in deltas.items():
+        encoded = key.encode('utf-8')
+        parts.append(ENTRY.pack(len(encoded), int(delta.count)) + encoded)
+        parts.append(np.ascontiguousarray(delta.A[iu], dtype='<f8').tobytes())
+        parts.append(np.ascontiguousarray(delta.b, dtype='<f8').tobytes())
+    body = zlib.compress(b''.join(parts))
+    return HEADER.pack(MAGIC, VERSION, context_dim, len(deltas), float(lambda_forget), zlib.crc32(body)) + body
+
+
+def decode_delta(blob: bytes) -> Dict:
+    """
+    Parse a delta blob.
+
+    Returns:
+        {'context_dim', 'lambda_forget', 'models': {key: ModelDelta}}
+    """
+    if len(blob) < HEADER.size:
+        raise DeltaError("Truncated delta header")
+    magic, version, d, n_models, lambda_forget, crc = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise DeltaError("Not a LinUCB delta")
+    if version != VERSION:
+        raise DeltaError(f"Unsupported delta version {version}")
+    body = blob[HEADER.size:]
+    if zlib.crc32(body) != crc:
+        raise DeltaError("Delta checksum mismatch")
+    body = zlib.decompress(body)
+
+    iu = np.triu_indices(d)
+    n_tri = len(iu[0])
+    models = {}
+    offset = 0
+    for _ in range(n_models):
+        key_len, count = ENTRY.unpack_from(body, offset)
+        offset += ENTRY.size
+        key = body[offset:offset + key_len].decode('utf-8')
+        offset += key_len
+        values = np.frombuffer(body, dtype='<f8', count=n_tri + d, offset=offset)
+        offset += values.nbytes
+        A = np.zeros((d, d))
+        A[iu] = values[:n_tri]
+        A = A + np.triu(A, 1).T
+        models[key] = ModelDelta(count, A, values[n_tri:].copy())
+    if offset != len(body):
+        raise DeltaError("Trailing bytes in delta body")
+    return {'context_dim': d, 'lambda_forget': lambda_forget, 'models': models}
@@ -2,13 +2,32 @@ import numpy as np
 import pickle
 import os
 import logging
-from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Tuple
 from threading import Lock
 
+from src.rl.model_registry import LinUCBModel, ModelRegistry
+from src.rl.low_rank import LowRankModelRegistry
+from src.rl import low_rank, snapshot
+from src.rl.delta_sync import DeltaError, DeltaTracker, decode_delta, encode_delta
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Context layout: emotion one-hot (7) | category one-hot (4) | video features (5) | user context (3)
+EMOTIONS = ('stressed', 'sad', 'happy', 'anxious', 'tired', 'motivated', 'calm')
+CATEGORIES = ('exercise', 'yoga', 'meditation', 'reading')
+EMOTION_INDEX = {e: i for i, e in enumerate(EMOTIONS)}
+CATEGORY_INDEX = {c: i for i, c in enumerate(CATEGORIES)}
+CATEGORY_OFFSET = len(EMOTIONS)
+VIDEO_OFFSET = CATEGORY_OFFSET + len(CATEGORIES)
+USER_OFFSET = VIDEO_OFFSET + 5
+CONTEXT_DIM = USER_OFFSET + 3
+
+# Parameter storage precisions and their default A_inv drift tolerance: float32 cannot
+# hold A @ A_inv - I much below ~1e-4 for well-conditioned models
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+DRIFT_TOL = {'float64': 1e-6, 'float32': 1e-3}
+
 
 # --- PRODUCTION UTILITY: REWARD SHAPING ---
 def calculate_production_reward(watch_time: float, total_duration: float, feedback_type: str = None) -> float:
@@ -36,157 +55,485 @@ def calculate_production_reward(watch_time: float, total_duration: float, feedba
         
     return max(min(reward, 1.0), -1.5)
 
-@dataclass
-class LinUCBModel:
-    A: np.ndarray  # Design matrix
-    b: np.ndarray  # Reward vector
-    theta: np.ndarray  # Weights
-    interaction_count: int = 0
-    lock: Lock = field(default_factory=Lock, repr=False)  # Thread-safe updates
+def calculate_production_rewards(watch_time, total_duration, feedback_type=None) -> np.ndarray:
+    """
+    Vectorized calculate_production_reward over aligned arrays (same values, element-wise).
+    
+    Args:
+        watch_time: (n,) seconds watched
+        total_duration: (n,) video durations in seconds
+        feedback_type: Optional (n,) array of 'thumbs_up' / 'thumbs_down' / anything else
+    """
+    watch_time = np.asarray(watch_time, dtype=float)
+    watch_percent = np.minimum(watch_time / np.maximum(np.asarray(total_duration, dtype=float), 1), 1.0)
+    reward = watch_percent - 0.4
+    
+    if feedback_type is not None:
+        feedback_type = np.asarray(feedback_type, dtype=object)
+        reward = np.where(feedback_type == "thumbs_up", reward + 0.4, reward)
+        reward = np.where(feedback_type == "thumbs_down", -1.5, reward)
+        
+    return np.clip(reward, -1.5, 1.0)
 
-    def __getstate__(self):
-        state = self.__dict__.copy()
-        if 'lock' in state:
-            del state['lock']
-        return state
+class _LegacyLinUCBModel:
+    """Unpickling target for models saved before the registry (dataclass with A, b, theta)."""
 
     def __setstate__(self, state):
         self.__dict__.update(state)
-        self.lock = Lock()
+
+
+class _ModelUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if name == 'LinUCBModel':
+            return _LegacyLinUCBModel
+        return super().find_class(module, name)
 
 class LinUCBRecommender:
-    def __init__(self, context_dim: int = 19, alpha: float = 1.0, lambda_forget: float = 0.99):
+    def __init__(self, context_dim: int = 19, alpha: float = 1.0, lambda_forget: float = 0.99,
+                 refactor_interval: int = 100, drift_tol: float = None, registry: ModelRegistry = None,
+                 covariance: str = 'full', rank: int = 16, precision: str = 'float64', min_eigenvalue: float = 0.05,
+                 track_deltas: bool = False):
+        """
+        Args:
+            covariance: 'full' (dense A / A_inv per model) or 'lowrank' (diag + rank-`rank`
+                        factor, O(d * rank) memory; for high-dimensional contexts)
+            precision: parameter storage, 'float64' or 'float32' (half the memory and
+                       snapshot size; updates still accumulate in float64)
+            drift_tol: max |A @ A_inv - I| before re-inverting (default per precision)
+            track_deltas: record own updates for export_delta()/merge_delta() (multi-node
+                          sync only; adds an O(d^2) accumulation per update)
+        """
+        if covariance not in ('full', 'lowrank'):
+            raise ValueError(f"Unknown covariance {covariance!r}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}")
+        dtype = np.dtype(PRECISIONS[precision])
+        if registry is None:
+            if covariance == 'lowrank':
+                registry = LowRankModelRegistry(context_dim, rank=rank, dtype=dtype)
+            else:
+                registry = ModelRegistry(context_dim, dtype=dtype)
+        elif registry.dtype != dtype:
+            raise ValueError(f"Registry stores {registry.dtype}, not {precision}")
         self.context_dim = context_dim
+        self.precision = precision
+        self.dtype = dtype
         self.alpha = alpha
         self.lambda_forget = lambda_forget  # Temporal discounting factor
-        self.models: Dict[str, LinUCBModel] = {}
+        self.refactor_interval = refactor_interval  # Updates between A_inv drift checks
+        self.drift_tol = DRIFT_TOL[precision] if drift_tol is None else drift_tol  # Max |A @ A_inv - I| before re-inverting
+        self.min_eigenvalue = min_eigenvalue  # Reduced precision only, see _refactor_reduced
+        self.precision_alerts: Dict[str, float] = {}  # key -> drift float32 storage could not get under drift_tol
+        self.registry = registry
         self.total_interactions = 0
+        self._stats_lock = Lock()  # Guards total_interactions and alpha across keys
+        self.deltas = DeltaTracker(context_dim) if track_deltas else None  # Own updates since the last export_delta()
+        self._structured = {}  # slot -> (snapshot, fixed one-hot terms) for score_structured
         
+    @property
+    def low_rank(self) -> bool:
+        return self.registry.rank > 0
+
     def _get_key(self, emotion: str, category: str) -> str:
         return f"{emotion}_{category}"
         
-    def _init_model(self) -> LinUCBModel:
-        return LinUCBModel(
-            A=np.identity(self.context_dim),
-            b=np.zeros((self.context_dim, 1)),
-            theta=np.zeros((self.context_dim, 1)),
-            interaction_count=0,
-            lock=Lock()
-        )
+    @property
+    def models(self) -> Dict[str, LinUCBModel]:
+        """Per-key views onto the registry slots."""
+        return {key: LinUCBModel(self.registry, i) for key, i in list(self.registry.index.items())}
         
     def get_or_create_model(self, emotion, category) -> LinUCBModel:
-        key = self._get_key(emotion, category)
-        if key not in self.models:
-            self.models[key] = self._init_model()
-        return self.models[key]
+        return LinUCBModel(self.registry, self.registry.slot(self._get_key(emotion, category)))
 
-    def build_context_vector(self, emotion, category, video_features, user_context_dict):
-        """Construct the 19-dim context vector."""
-        # Emotion (7)
-        emotions = ['stressed', 'sad', 'happy', 'anxious', 'tired', 'motivated', 'calm']
-        emotion_vec = np.zeros(7)
-        if emotion in emotions:
-            emotion_vec[emotions.index(emotion)] = 1.0
-        else:
-            emotion_vec[6] = 1.0 # Default calm
+    @staticmethod
+    def _one_hot_indices(emotion, category) -> Tuple[int, int]:
+        """Context positions of the emotion and category one-hots (unknown labels default to calm / yoga)."""
+        return (EMOTION_INDEX.get(emotion, EMOTION_INDEX['calm']),
+                CATEGORY_OFFSET + CATEGORY_INDEX.get(category, CATEGORY_INDEX['yoga']))
 
-        # Category (4)
-        categories = ['exercise', 'yoga', 'meditation', 'reading']
-        cat_vec = np.zeros(4)
-        if category in categories:
-            cat_vec[categories.index(category)] = 1.0
-        else:
-            cat_vec[1] = 1.0 # Default yoga
-            
-        # Video Features (5) - Expected to be normalized
-        vid_vec = np.array(video_features[:5])
+    def build_context_matrix(self, emotion, category, video_features, user_context_dict) -> np.ndarray:
+        """
+        Construct the (n, 19) context matrix for a whole candidate set in one buffer.
+        
+        Args:
+            video_features: (n, >=5) array or sequence of per-video feature vectors (normalized)
+            user_context_dict: stats from UserContextManager, shared by every row
+        """
+        n = len(video_features)
+        X = np.zeros((n, CONTEXT_DIM))
+        
+        # Emotion (7) / Category (4) one-hots
+        X[:, list(self._one_hot_indices(emotion, category))] = 1.0
         
-        # User Context (3)
-        user_vec = np.array([
-            user_context_dict.get('avg_feedback', 0.0),
-            min(user_context_dict.get('interaction_count', 0) / 100.0, 1.0), # Normalize cap
-            user_context_dict.get('success_rate', 0.0)
-        ])
+        # Video Features (5) - Expected to be normalized
+        if isinstance(video_features, np.ndarray) and video_features.ndim == 2:
+            X[:, VIDEO_OFFSET:USER_OFFSET] = video_features[:, :5]
+        else:
+            for i, feats in enumerate(video_features):
+                X[i, VIDEO_OFFSET:USER_OFFSET] = feats[:5]
         
-        context = np.concatenate([emotion_vec, cat_vec, vid_vec, user_vec])
-        return context.reshape(-1, 1)
+        # User Context (3), broadcast across rows
+        X[:, USER_OFFSET] = user_context_dict.get('avg_feedback', 0.0)
+        X[:, USER_OFFSET + 1] = min(user_context_dict.get('interaction_count', 0) / 100.0, 1.0) # Normalize cap
+        X[:, USER_OFFSET + 2] = user_context_dict.get('success_rate', 0.0)
+        return X
+
+    def build_context_vector(self, emotion, category, video_features, user_context_dict):
+        """Construct the 19-dim context vector."""
+        return self.build_context_matrix(emotion, category, (video_features,), user_context_dict).reshape(-1, 1)
 
     def select_video(self, candidates, emotion, category, user_context) -> Tuple[Dict, List[float]]:
-        model = self.get_or_create_model(emotion, category)
-        A_inv = np.linalg.inv(model.A)
+        if not candidates:
+            return None, []
         
-        ucb_scores = []
-        best_score = -float('inf')
-        selected_vid = None
+        X = self.build_context_matrix(emotion, category, [vid['features'] for vid in candidates], user_context)
+        _, _, ucb_scores = self.score_structured(emotion, category, X[:, VIDEO_OFFSET:])
         
-        for vid in candidates:
-            # Context
-            ctx = self.build_context_vector(emotion, category, vid['features'], user_context)
-            
-            # UCB
-            mean = (model.theta.T @ ctx).item()
-            confidence = self.alpha * np.sqrt((ctx.T @ A_inv @ ctx).item())
-            score = mean + confidence
-            ucb_scores.append(score)
-            
+        for i, vid in enumerate(candidates):
             # Store context temporarily for update convenience if this vid is chosen
             # Note: In real app, we usually recompute or cache by request_id
-            vid['_temp_context'] = ctx
-            
-            if score > best_score:
-                best_score = score
-                selected_vid = vid
-                
-        return selected_vid, ucb_scores
+            vid['_temp_context'] = X[i].reshape(-1, 1)
+        
+        return candidates[int(np.argmax(ucb_scores))], ucb_scores.tolist()
 
     def get_ucb_score(self, emotion, category, context_vector) -> Tuple[float, float]:
-        """Calculate UCB score with numerical stability fixes and thread safety."""
+        """Calculate UCB score from the published snapshot (lock-free, no decomposition)."""
         model = self.get_or_create_model(emotion, category)
+        snap = self.registry.snapshot(model.slot)
         
-        try:
-            with model.lock:  # Thread-safe read
-                # NUMERICAL STABILITY: Use pinv for robust inversion
-                A_inv = np.linalg.pinv(model.A)
-                
-                mean = (model.theta.T @ context_vector).item()
-                
-                # Exploration bonus with variance check
-                var = context_vector.T @ A_inv @ context_vector
-                uncertainty = self.alpha * np.sqrt(np.maximum(0, var.item()))
-                
-            return mean + uncertainty, uncertainty
-        except np.linalg.LinAlgError:
-            logger.error("Matrix inversion failed in get_ucb_score. Returning zero.")
-            return 0.0, self.alpha  # Safe fallback
+        x = np.reshape(context_vector, -1)
+        if self.low_rank:
+            mean, var = (float(v[0]) for v in low_rank.scores(snap, x[None, :]))
+        else:
+            mean = float(snap.theta @ x)
+            var = float(x @ snap.A_inv @ x)
+        
+        # Exploration bonus with variance check
+        uncertainty = self.alpha * np.sqrt(max(0.0, var))
+            
+        return mean + uncertainty, uncertainty
+
+    def score_batch(self, emotion, category, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized UCB scoring of a candidate context matrix.
+        
+        Reads one immutable (A_inv, theta) snapshot, so concurrent updates never
+        block scoring and every row is scored against the same model version.
+        
+        Args:
+            X: (n, context_dim) matrix, one context vector per row
+        
+        Returns:
+            (means, uncertainties, ucb_scores), each of shape (n,)
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        model = self.get_or_create_model(emotion, category)
+        snap = self.registry.snapshot(model.slot)
+        alpha = self.alpha
+        
+        if self.low_rank:
+            means, var = low_rank.scores(snap, X)
+        else:
+            means = X @ snap.theta
+            var = np.einsum('ij,ij->i', X @ snap.A_inv, X)
+        uncertainties = alpha * np.sqrt(np.maximum(var, 0.0))
+        return means, uncertainties, means + uncertainties
+
+    def score_structured(self, emotion, category, Z: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        score_batch for contexts built by build_context_matrix, exploiting their one-hot block.
+        
+        Every candidate of a request shares the same emotion/category one-hots f, so with
+        x = f + z (z non-zero only on the 8 dense dims D):
+            mean = theta[f] + theta_D . z
+            var  = f' A_inv f + 2 (A_inv[f, D]) . z + z' A_inv[D, D] z
+        The fixed terms depend only on the model version, so they are cached per
+        published snapshot, and each candidate costs an 8x8 instead of a 19x19
+        quadratic form.
+        
+        Args:
+            Z: (n, 8) dense block (video features + user context), i.e. X[:, VIDEO_OFFSET:]
+        
+        Returns:
+            (means, uncertainties, ucb_scores), each of shape (n,)
+        """
+        if self.context_dim != CONTEXT_DIM:
+            raise ValueError(f"Structured scoring needs the {CONTEXT_DIM}-dim context layout")
+        Z = np.atleast_2d(np.asarray(Z, dtype=float))
+        if self.low_rank:
+            X = np.zeros((len(Z), CONTEXT_DIM))
+            X[:, list(self._one_hot_indices(emotion, category))] = 1.0
+            X[:, VIDEO_OFFSET:] = Z
+            return self.score_batch(emotion, category, X)
+        slot = self.registry.slot(self._get_key(emotion, category))
+        snap = self.registry.snapshot(slot)
+        alpha = self.alpha
+        
+        # Fixed block, derived once per published snapshot (snapshots are immutable)
+        cached = self._structured.get(slot)
+        if cached is None or cached[0] is not snap:
+            e, c = self._one_hot_indices(emotion, category)
+            A_inv, theta = snap.A_inv, snap.theta
+            # One (8, 10) operand: [A_inv[D, D] | 2 A_inv[D, f] | theta_D]
+            W = np.column_stack([
+                A_inv[VIDEO_OFFSET:, VIDEO_OFFSET:],
+                2.0 * (A_inv[VIDEO_OFFSET:, e] + A_inv[VIDEO_OFFSET:, c]),
+                theta[VIDEO_OFFSET:],
+            ])
+            cached = (snap, W, theta[e] + theta[c], A_inv[e, e] + 2.0 * A_inv[e, c] + A_inv[c, c])
+            self._structured[slot] = cached
+        _, W, mean0, var0 = cached
+        
+        # Per-candidate dense part: a single (n, 8) x (8, 10) product
+        G = Z @ W
+        dense = Z.shape[1]
+        means = G[:, dense + 1] + mean0
+        var = np.einsum('ij,ij->i', G[:, :dense], Z) + G[:, dense] + var0
+        uncertainties = alpha * np.sqrt(np.maximum(var, 0.0))
+        return means, uncertainties, means + uncertainties
+
+    def score_categories(self, emotion, categories: Sequence[str], X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score candidates against several category models in one stacked pass.
+        
+        Args:
+            X: (m, n, context_dim) context matrices, one per category (each row carries
+               that category's one-hot), or a single (n, context_dim) matrix shared by all
+        
+        Returns:
+            (means, uncertainties, ucb_scores), each of shape (m, n)
+        """
+        snaps = [self.registry.snapshot(self.registry.slot(self._get_key(emotion, c))) for c in categories]
+        X = np.broadcast_to(np.asarray(X, dtype=float), (len(snaps),) + np.shape(X)[-2:])
+        if self.low_rank:
+            results = [self.score_batch(emotion, c, X[j]) for j, c in enumerate(categories)]
+            return tuple(np.stack(parts) for parts in zip(*results))
+        theta = np.stack([snap.theta for snap in snaps])
+        A_inv = np.stack([snap.A_inv for snap in snaps])
+        alpha = self.alpha
+        
+        means = np.einsum('mnd,md->mn', X, theta)
+        var = np.einsum('mnd,mde,mne->mn', X, A_inv, X, optimize=True)
+        uncertainties = alpha * np.sqrt(np.maximum(var, 0.0))
+        return means, uncertainties, means + uncertainties
 
-    def update(self, emotion, category, context, reward):
-        """Thread-safe update with temporal discounting (human-like forgetting)."""
+    def _reset_model(self, model: LinUCBModel):
+        self.registry.reset_covariance(model.slot)
+
+    def _refactor(self, model: LinUCBModel):
+        """Exact re-inversion of A when the incrementally maintained A_inv has drifted."""
+        if self.dtype != np.float64:
+            return self._refactor_reduced(model)
+        drift = np.max(np.abs(model.A @ model.A_inv - np.identity(self.context_dim)))
+        model.updates_since_refactor = 0
+        if drift <= self.drift_tol:
+            return
+        
+        logger.info(f"A_inv drift {drift:.2e} exceeds {self.drift_tol:.0e}. Re-factorizing.")
+        A_inv = np.linalg.solve(model.A, np.identity(self.context_dim))
+        model.A_inv = 0.5 * (A_inv + A_inv.T)
+        model.theta = model.A_inv @ model.b
+
+    def _refactor_reduced(self, model: LinUCBModel):
+        """
+        Accuracy guard for reduced-precision storage, run at every drift check.
+        
+        Within one key the emotion and category one-hots are constant, so forgetting
+        decays the ridge prior along directions no context ever excites and A_inv
+        grows without bound there; its entries then cancel in x' A_inv x, which
+        float64 survives and float32 does not. A_inv is recomputed exactly from the
+        eigendecomposition of A with eigenvalues floored at `min_eigenvalue` (contexts
+        are orthogonal to the floored directions, so scores are unchanged). The floor
+        only applies to the inverse used for scoring: A itself keeps the exact
+        statistics, so the next check starts from them again. Keys whose stored
+        inverse still misses `drift_tol` are logged in `precision_alerts`.
+        """
+        model.updates_since_refactor = 0
+        evals, V = np.linalg.eigh(model.A)
+        evals = np.maximum(evals, self.min_eigenvalue)
+        model.A_inv = (V / evals) @ V.T
+        model.theta = model.A_inv @ model.b
+        
+        floored = (V * evals) @ V.T
+        stored = np.max(np.abs(floored @ model.A_inv - np.identity(self.context_dim)))
+        if stored > self.drift_tol:
+            key = self.registry.keys[model.slot]
+            if key not in self.precision_alerts:
+                logger.warning(f"{key}: {self.precision} A_inv drift {stored:.2e} exceeds {self.drift_tol:.0e}; "
+                               f"consider float64 storage")
+            self.precision_alerts[key] = float(stored)
+
+    def update(self, emotion, category, context, reward, record_delta: bool = True):
+        """
+        Thread-safe update with temporal discounting (human-like forgetting).
+        record_delta=False keeps the update out of export_delta() (e.g. log replay).
+        """
+        if self.low_rank:
+            return self.update_batch(emotion, category, np.reshape(context, (1, -1)), [reward])
         model = self.get_or_create_model(emotion, category)
+        lam = self.lambda_forget
         
         with model.lock:  # Thread-safe write
             # Apply Temporal Discounting (Human-like 'forgetting')
-            model.A = (self.lambda_forget * model.A) + (context @ context.T)
-            model.b = (self.lambda_forget * model.b) + (reward * context)
+            model.A = (lam * model.A) + (context @ context.T)
+            model.b = (lam * model.b) + (reward * context)
             
-            # NUMERICAL STABILITY: Use solve instead of direct inverse
+            # Sherman-Morrison on (lam * A_old)^-1 = A_inv / lam keeps the inverse current in O(d^2)
+            P = model.A_inv / lam
+            Px = P @ context
+            denom = 1.0 + (context.T @ Px).item()
+            model.A_inv = P - (Px @ Px.T) / denom
+            model.theta = model.A_inv @ model.b
+            model.updates_since_refactor += 1
+            
+            # NUMERICAL STABILITY: Periodic drift check against an exact solve
             try:
-                model.theta = np.linalg.solve(model.A, model.b)
+                if not np.all(np.isfinite(model.A_inv)) or denom <= 0:
+                    model.A_inv = np.linalg.pinv(model.A)
+                    model.theta = model.A_inv @ model.b
+                    model.updates_since_refactor = self.refactor_interval
+                if model.updates_since_refactor >= self.refactor_interval:
+                    self._refactor(model)
             except np.linalg.LinAlgError:
                 logger.error("Matrix solve failed. Resetting A to identity.")
-                model.A = np.identity(self.context_dim)
-                model.theta = np.zeros((self.context_dim, 1))
+                self._reset_model(model)
             
             model.interaction_count += 1
-            self.total_interactions += 1
+            self.registry.publish(model.slot)
+            if self.deltas is not None and record_delta:
+                self.deltas.record(self._get_key(emotion, category), context.T, np.array([reward], dtype=float), lam)
+        
+        self._record_interactions(1)
+
+    def update_batch(self, emotion, category, contexts: np.ndarray, rewards: np.ndarray, record_delta: bool = True):
+        """
+        Apply k updates for one key as a single rank-k step.
+        
+        Equivalent to calling update() for each row in order: the forgetting
+        weights lambda^(k-1-i) are folded into one accumulation, and the inverse
+        is refreshed with a Woodbury step (k < d) or one exact solve (k >= d).
+        
+        Args:
+            contexts: (k, context_dim) matrix, one context per row, oldest first
+            rewards: (k,) rewards aligned with `contexts`
+            record_delta: False keeps the updates out of export_delta()
+        """
+        X = np.atleast_2d(np.asarray(contexts, dtype=float))
+        r = np.asarray(rewards, dtype=float).reshape(-1)
+        k = len(r)
+        if k == 0:
+            return
+        model = self.get_or_create_model(emotion, category)
+        if self.low_rank:
+            with model.lock:
+                low_rank.update(self.registry, model.slot, X, r, self.lambda_forget)
+                model.interaction_count += k
+                self.registry.publish(model.slot)
+            self._record_interactions(k)
+            return
+        decay = self.lambda_forget ** k
+        weights = self.lambda_forget ** np.arange(k - 1, -1, -1)
+        
+        with model.lock:  # Thread-safe write
+            model.A = decay * model.A + (X.T * weights) @ X
+            model.b = decay * model.b + ((weights * r) @ X)[:, None]
             
-            # Decay alpha
-            if self.total_interactions > 100:
-                self.alpha = max(0.1, self.alpha * 0.999)
+            try:
+                if k < self.context_dim:
+                    # Woodbury: (decay*A + X^T W X)^-1 with W = diag(weights)
+                    P = model.A_inv / decay
+                    PX = P @ X.T
+                    C = np.diag(1.0 / weights) + X @ PX
+                    model.A_inv = P - PX @ np.linalg.solve(C, PX.T)
+                    model.updates_since_refactor += k
+                else:
+                    model.A_inv = np.linalg.solve(model.A, np.identity(self.context_dim))
+                    model.updates_since_refactor = 0
+                model.theta = model.A_inv @ model.b
+                
+                if not np.all(np.isfinite(model.A_inv)):
+                    model.A_inv = np.linalg.pinv(model.A)
+                    model.theta = model.A_inv @ model.b
+                    model.updates_since_refactor = self.refactor_interval
+                if model.updates_since_refactor >= self.refactor_interval:
+                    self._refactor(model)
+            except np.linalg.LinAlgError:
+                logger.error("Matrix solve failed. Resetting A to identity.")
+                self._reset_model(model)
+            
+            model.interaction_count += k
+            self.registry.publish(model.slot)
+            if self.deltas is not None and record_delta:
+                self.deltas.record(self._get_key(emotion, category), X, r, self.lambda_forget)
+        
+        self._record_interactions(k)
+
+    def _record_interactions(self, k: int):
+        """Count k applied updates and decay alpha once per update past the first 100."""
+        with self._stats_lock:
+            previous = self.total_interactions
+            self.total_interactions += k
+            n_decay = self.total_interactions - max(previous, 100)
+            if n_decay > 0:
+                self.alpha = max(0.1, self.alpha * 0.999 ** n_decay)
+
+    def _check_delta_sync(self):
+        if self.low_rank:
+            raise DeltaError("Delta sync requires full covariance models")
+        if self.deltas is None:
+            raise DeltaError("Delta sync requires LinUCBRecommender(track_deltas=True)")
+
+    def export_delta(self) -> bytes:
+        """
+        Serialize this node's own updates since the previous export and start a new
+        sync epoch. Peers apply the blob with merge_delta(); see src.rl.delta_sync.
+        """
+        self._check_delta_sync()
+        return encode_delta(self.deltas.drain(), self.context_dim, self.lambda_forget)
+
+    def merge_delta(self, blob: bytes) -> int:
+        """
+        Fold a peer's exported delta into the local models. Returns the number of updates merged.
+
+        Each model is decayed by lambda^(peer updates) and the peer statistics by
+        lambda^(updates already folded since the sync base), so every node that
+        merges the same set of deltas ends with identical A and b.
+        """
+        self._check_delta_sync()
+        delta = decode_delta(blob)
+        if delta['context_dim'] != self.context_dim:
+            raise DeltaError(f"Delta context_dim {delta['context_dim']} does not match recommender ({self.context_dim})")
+        if not np.isclose(delta['lambda_forget'], self.lambda_forget):
+            raise DeltaError(f"Delta lambda_forget {delta['lambda_forget']} does not match recommender ({self.lambda_forget})")
+        
+        lam = self.lambda_forget
+        merged = 0
+        for key, peer in delta['models'].items():
+            model = LinUCBModel(self.registry, self.registry.slot(key))
+            with model.lock:
+                folded = self.deltas.folded(key)
+                model.A = lam ** peer.count * model.A + lam ** folded * peer.A
+                model.b = lam ** peer.count * model.b + lam ** folded * peer.b[:, None]
+                try:
+                    A_inv = np.linalg.solve(model.A, np.identity(self.context_dim))
+                    model.A_inv = 0.5 * (A_inv + A_inv.T)
+                except np.linalg.LinAlgError:
+                    model.A_inv = np.linalg.pinv(model.A)
+                model.theta = model.A_inv @ model.b
+                model.updates_since_refactor = 0
+                model.interaction_count += peer.count
+                self.registry.publish(model.slot)
+                self.deltas.add_folded(key, peer.count)
+            merged += peer.count
+        
+        if merged:
+            self._record_interactions(merged)
+        return merged
 
     def save(self, path='./models/linucb_models.pkl'):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         data = {
-            'models': self.models,
+            'registry': self.registry,
             'total_interactions': self.total_interactions,
             'alpha': self.alpha
         }
@@ -194,25 +541,68 @@ class LinUCBRecommender:
             pickle.dump(data, f)
             
     def load(self, path='./models/linucb_models.pkl'):
-        if os.path.exists(path):
+        if snapshot.is_snapshot(path):
+            self.load_snapshot(path)
+        elif os.path.exists(path):
             with open(path, 'rb') as f:
-                data = pickle.load(f)
-            self.models = data['models']
+                data = _ModelUnpickler(f).load()
+            if 'registry' in data:
+                self.registry = data['registry'].astype(self.dtype)
+            else:
+                self.registry = self._registry_from_legacy(data['models'])
             self.total_interactions = data['total_interactions']
             self.alpha = data['alpha']
 
+    def save_snapshot(self, path='./models/linucb_state.snap', wal_seq: int = 0):
+        """Atomically write the registry in the versioned binary snapshot format."""
+        snapshot.write_snapshot(path, self.registry, self.alpha, self.total_interactions, wal_seq=wal_seq)
+
+    def load_snapshot(self, path='./models/linucb_state.snap', verify: bool = False) -> Dict:
+        """
+        Memory-map a binary snapshot; model pages are read lazily on first use. Returns its header.
+        
+        Snapshots stored in another precision are converted (and copied) into this one.
+        """
+        registry, header = snapshot.read_snapshot(path, verify=verify)
+        if header['context_dim'] != self.context_dim:
+            raise snapshot.SnapshotError(
+                f"{path}: context_dim {header['context_dim']} does not match recommender ({self.context_dim})"
+            )
+        self.registry = registry.astype(self.dtype)
+        self.total_interactions = header['total_interactions']
+        self.alpha = header['alpha']
+        return header
+
+    def _registry_from_legacy(self, models: Dict) -> ModelRegistry:
+        """Stack a legacy {key: LinUCBModel} dict into a registry."""
+        keys = list(models)
+        registry = ModelRegistry(self.context_dim, capacity=max(len(keys), 1), dtype=self.dtype)
+        if keys:
+            A = np.stack([models[k].A for k in keys])
+            registry.load_arrays(keys, {
+                'A': A,
+                'A_inv': np.linalg.pinv(A),
+                'b': np.stack([np.reshape(models[k].b, -1) for k in keys]),
+                'theta': np.stack([np.reshape(models[k].theta, -1) for k in keys]),
+                'counts': np.array([models[k].interaction_count for k in keys]),
+            })
+        return registry
+
     def get_statistics(self) -> Dict:
         """Return internal statistics for monitoring."""
-        models_info = {}
-        for key, model in self.models.items():
-            models_info[key] = {
-                'interactions': model.interaction_count,
-                'weight_norm': np.linalg.norm(model.theta)
-            }
+        n = len(self.registry)
+        norms = np.linalg.norm(self.registry.theta[:n], axis=1)
+        models_info = {
+            key: {'interactions': int(count), 'weight_norm': float(norm)}
+            for key, count, norm in zip(self.registry.keys, self.registry.counts[:n], norms)
+        }
             
         return {
             'total_interactions': self.total_interactions,
-            'models_trained': len(self.models),
+            'models_trained': n,
             'current_alpha': self.alpha,
+            'precision': self.precision,
+            'parameter_bytes': self.registry.parameter_bytes,
+            'precision_alerts': dict(self.precision_alerts),
             'model_details': models_info
         }
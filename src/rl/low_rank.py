@@ -0,0 +1,163 @@
+"""
+Diagonal-plus-low-rank covariance for high-dimensional LinUCB contexts.
+
+The design matrix is kept as A ~= diag(D) + U U^T with U of shape (d, r), so a
+model costs O(d r) memory instead of O(d^2), and an update costs O(d r^2):
+
+    A <- lambda^k A + sum_i w_i x_i x_i^T
+      => D <- lambda^k D,  U' = [sqrt(lambda^k) U | sqrt(w_i) x_i]     (d, r + k)
+
+U' is compressed back to rank r through the eigen-decomposition of its small
+(r + k) x (r + k) Gram matrix (Frequent Directions style). The energy of the
+dropped directions is folded into D along the diagonal, so diag(A) is tracked
+exactly and only off-diagonal detail of the weakest directions is lost.
+
+Scoring and theta use the Woodbury identity with C = I_r + U^T D^-1 U:
+
+    x^T A^-1 x = x^T D^-1 x - (U^T D^-1 x)^T C^-1 (U^T D^-1 x)
+"""
+import numpy as np
+from typing import NamedTuple
+
+from src.rl.model_registry import ModelRegistry
+
+
+class LowRankSnapshot(NamedTuple):
+    """Immutable read-side view of one low-rank model."""
+    D_inv: np.ndarray  # (d,)
+    U: np.ndarray  # (d, r)
+    C_inv: np.ndarray  # (r, r)
+    theta: np.ndarray  # (d,)
+
+
+class LowRankModelRegistry(ModelRegistry):
+    """
+    ModelRegistry storing diag(D) + U U^T per slot instead of dense A / A_inv.
+
+        D       (K, d)     diagonal part of A
+        U       (K, d, r)  low-rank factor
+        C_inv   (K, r, r)  cached (I + U^T D^-1 U)^-1
+        b, theta, counts, since_refactor as in ModelRegistry
+
+    Float tensors are stored in `dtype`; update() and refresh() compute in float64.
+    """
+
+    def __init__(self, context_dim: int, rank: int = 16, capacity: int = 32, buffer=None, growable: bool = None,
+                 dtype=np.float64, keys=None):
+        if not 0 < rank <= context_dim:
+            raise ValueError(f"rank must be in 1..{context_dim}, got {rank}")
+        self.rank = rank
+        super().__init__(context_dim, capacity=capacity, buffer=buffer, growable=growable, dtype=dtype, keys=keys)
+
+    @staticmethod
+    def fields(context_dim: int, rank: int = 16, dtype=np.float64):
+        d, r = context_dim, rank
+        return (
+            ('D', (d,), dtype),
+            ('U', (d, r), dtype),
+            ('C_inv', (r, r), dtype),
+            ('b', (d,), dtype),
+            ('theta', (d,), dtype),
+            ('counts', (), np.int64),
+            ('since_refactor', (), np.int64),
+        )
+
+    @classmethod
+    def layout(cls, context_dim: int, capacity: int, rank: int = 16, dtype=np.float64):
+        return cls._pack(cls.fields(context_dim, rank, dtype), capacity)
+
+    @classmethod
+    def nbytes(cls, context_dim: int, capacity: int, rank: int = 16, dtype=np.float64) -> int:
+        return cls._packed_nbytes(cls.layout(context_dim, capacity, rank, dtype))
+
+    def _fields(self):
+        return self.fields(self.context_dim, self.rank, self.dtype)
+
+    def _empty(self, capacity: int, dtype=None) -> 'LowRankModelRegistry':
+        return LowRankModelRegistry(self.context_dim, rank=self.rank, capacity=capacity, dtype=dtype or self.dtype)
+
+    def reset(self, i: int):
+        """Ridge prior: D = 1, U = 0 (A = I), b = 0."""
+        self.D[i] = 1.0
+        self.U[i] = 0.0
+        self.C_inv[i] = np.identity(self.rank)
+        self.b[i] = 0.0
+        self.theta[i] = 0.0
+        self.counts[i] = 0
+        self.since_refactor[i] = 0
+
+    def reset_covariance(self, i: int):
+        """D = 1, U = 0 (A = I) and theta = 0, keeping b and the interaction count."""
+        self.D[i] = 1.0
+        self.U[i] = 0.0
+        self.C_inv[i] = np.identity(self.rank)
+        self.theta[i] = 0.0
+        self.since_refactor[i] = 0
+
+    def dense(self, i: int):
+        """(A, A_inv) of slot i as dense float64 matrices, A_inv via Woodbury. O(d^2): for inspection only."""
+        D = self.D[i].astype(np.float64)
+        U = self.U[i].astype(np.float64)
+        DU = U / D[:, None]
+        A = np.diag(D) + U @ U.T
+        A_inv = np.diag(1.0 / D) - DU @ self.C_inv[i].astype(np.float64) @ DU.T
+        return A, A_inv
+
+    def publish(self, i: int) -> LowRankSnapshot:
+        parts = [1.0 / self.D[i], self.U[i].copy(), self.C_inv[i].copy(), self.theta[i].copy()]
+        for part in parts:
+            part.setflags(write=False)
+        snap = LowRankSnapshot(*parts)
+        self.published[i] = snap
+        return snap
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['rank'] = self.rank
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state['context_dim'], rank=state['rank'], capacity=max(len(state['keys']), 1),
+                      dtype=state.get('dtype', np.float64))
+        self.load_arrays(state['keys'], state['arrays'])
+
+
+def update(registry: LowRankModelRegistry, i: int, X: np.ndarray, rewards: np.ndarray, lambda_forget: float):
+    """Fold k rows of X (oldest first) into slot i and refresh C_inv and theta. Caller holds the slot lock."""
+    k = len(rewards)
+    r = registry.rank
+    decay = lambda_forget ** k
+    weights = lambda_forget ** np.arange(k - 1, -1, -1)
+
+    D = registry.D[i].astype(np.float64) * decay
+    U_ext = np.hstack([np.sqrt(decay) * registry.U[i].astype(np.float64), X.T * np.sqrt(weights)])  # (d, r + k)
+
+    # Compress to rank r via the small Gram matrix: U_ext = Q S V^T, Q S = U_ext V
+    evals, V = np.linalg.eigh(U_ext.T @ U_ext)  # Ascending
+    QS = U_ext @ V
+    dropped = QS[:, :-r]
+    registry.U[i] = QS[:, -r:]
+    registry.D[i] = D + np.einsum('ij,ij->i', dropped, dropped)  # Keep diag(A) exact
+    registry.b[i] = decay * registry.b[i].astype(np.float64) + (weights * rewards) @ X
+    refresh(registry, i)
+
+
+def refresh(registry: LowRankModelRegistry, i: int):
+    """Recompute C_inv and theta = A^-1 b for slot i (O(d r^2))."""
+    D_inv = 1.0 / registry.D[i].astype(np.float64)
+    U = registry.U[i].astype(np.float64)
+    DU = U * D_inv[:, None]
+    C = np.identity(registry.rank) + U.T @ DU
+    C_inv = np.linalg.inv(C)
+    C_inv = 0.5 * (C_inv + C_inv.T)
+    registry.C_inv[i] = C_inv
+    b = registry.b[i].astype(np.float64)
+    registry.theta[i] = D_inv * b - DU @ (C_inv @ (DU.T @ b))
+
+
+def scores(snap: LowRankSnapshot, X: np.ndarray):
+    """(means, variances) of the rows of X under one low-rank snapshot (O(n d r))."""
+    XD = X * snap.D_inv
+    T = XD @ snap.U
+    var = np.einsum('ij,ij->i', XD, X) - np.einsum('ij,ij->i', T @ snap.C_inv, T)
+    return X @ snap.theta, var
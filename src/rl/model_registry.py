@@ -0,0 +1,320 @@
+import numpy as np
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class ModelSnapshot(NamedTuple):
+    """Immutable read-side view of one model, replaced wholesale on every update."""
+    A_inv: np.ndarray
+    theta: np.ndarray
+
+
+class ModelRegistry:
+    """
+    Contiguous storage for every (emotion, category) LinUCB model.
+
+    All per-model parameters live in stacked tensors indexed by slot:
+        A       (K, d, d)  design matrices
+        A_inv   (K, d, d)  cached inverses
+        b       (K, d)     reward vectors
+        theta   (K, d)     weights
+        counts  (K,)       interaction counts
+        since_refactor (K,) rank-1 updates since the last exact inverse
+
+    The float tensors are stored in `dtype` (float64, or float32 to halve memory
+    and snapshot size); LinUCBModel views upcast them to float64 for updates.
+
+    Every tensor is a C-contiguous view into one flat byte buffer laid out by
+    `layout()`, so the whole registry can be placed in a memory map or a
+    shared-memory block and read back without copying.
+
+    Readers never take the slot locks: writers hold `locks[i]` while mutating
+    slot i and then `publish(i)` a fresh read-only ModelSnapshot, which scorers
+    pick up through a single reference read of `published[i]`.
+    """
+
+    ALIGN = 64  # Cache-line alignment for every field block
+    rank = 0  # Full covariance; see LowRankModelRegistry
+
+    def __init__(self, context_dim: int, capacity: int = 32, buffer=None, growable: bool = None,
+                 dtype=np.float64, keys: Optional[List[str]] = None):
+        self.context_dim = context_dim
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError(f"Unsupported storage dtype {self.dtype}")
+        self.capacity = capacity
+        self.keys: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.locks: List[Lock] = []  # Writer-side, one per slot
+        self.published: List[Optional[ModelSnapshot]] = []  # Reader-side, swapped atomically
+        self._alloc_lock = Lock()  # Guards slot allocation and growth
+        self._bind(buffer if buffer is not None else bytearray(self._nbytes(capacity)))
+        # External buffers (mmap, shared memory) are fixed-size unless the caller allows
+        # growth to detach into a private copy
+        self._growable = buffer is None if growable is None else growable
+        if keys:
+            # Slots already populated in `buffer` (e.g. a mapped snapshot); published lazily on first read
+            self.keys = list(keys)
+            self.index = {key: i for i, key in enumerate(self.keys)}
+            self.locks = [Lock() for _ in self.keys]
+            self.published = [None] * len(self.keys)
+
+    @staticmethod
+    def fields(context_dim: int, dtype=np.float64) -> Tuple[Tuple[str, tuple, type], ...]:
+        d = context_dim
+        return (
+            ('A', (d, d), dtype),
+            ('A_inv', (d, d), dtype),
+            ('b', (d,), dtype),
+            ('theta', (d,), dtype),
+            ('counts', (), np.int64),
+            ('since_refactor', (), np.int64),
+        )
+
+    @classmethod
+    def _pack(cls, fields, capacity: int) -> Dict[str, Tuple[int, tuple, type]]:
+        offsets = {}
+        offset = 0
+        for name, shape, dtype in fields:
+            full_shape = (capacity,) + shape
+            offsets[name] = (offset, full_shape, dtype)
+            size = int(np.prod(full_shape)) * np.dtype(dtype).itemsize
+            offset += -(-size // cls.ALIGN) * cls.ALIGN
+        return offsets
+
+    @classmethod
+    def _packed_nbytes(cls, layout) -> int:
+        offset, shape, dtype = layout[list(layout)[-1]]
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return offset + -(-size // cls.ALIGN) * cls.ALIGN
+
+    @classmethod
+    def layout(cls, context_dim: int, capacity: int, dtype=np.float64) -> Dict[str, Tuple[int, tuple, type]]:
+        """Byte offset, full shape and dtype of every field in the flat buffer."""
+        return cls._pack(cls.fields(context_dim, dtype), capacity)
+
+    @classmethod
+    def nbytes(cls, context_dim: int, capacity: int, dtype=np.float64) -> int:
+        return cls._packed_nbytes(cls.layout(context_dim, capacity, dtype))
+
+    # Instance-level geometry: subclasses with extra shape parameters override _fields()
+    def _fields(self):
+        return self.fields(self.context_dim, self.dtype)
+
+    def _layout(self, capacity: int):
+        return self._pack(self._fields(), capacity)
+
+    def _nbytes(self, capacity: int) -> int:
+        return self._packed_nbytes(self._layout(capacity))
+
+    @property
+    def parameter_bytes(self) -> int:
+        """Bytes of the flat parameter buffer at the current capacity."""
+        return self._nbytes(self.capacity)
+
+    def _empty(self, capacity: int, dtype=None) -> 'ModelRegistry':
+        """New private registry with the same geometry (and storage dtype unless given)."""
+        return ModelRegistry(self.context_dim, capacity=capacity, dtype=dtype or self.dtype)
+
+    def _bind(self, buffer):
+        """Point every field at its region of `buffer`."""
+        self._buffer = buffer
+        for name, (offset, shape, dtype) in self._layout(self.capacity).items():
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def slot(self, key: str) -> int:
+        """Slot index for `key`, allocating and initializing it on first use."""
+        i = self.index.get(key)
+        if i is not None:
+            return i
+        with self._alloc_lock:
+            i = self.index.get(key)
+            if i is None:
+                i = len(self.keys)
+                if i >= self.capacity:
+                    self._grow()
+                self.reset(i)
+                self.locks.append(Lock())
+                self.published.append(None)
+                self.publish(i)
+                self.keys.append(key)
+                self.index[key] = i  # Published last: readers only see fully initialized slots
+        return i
+
+    def publish(self, i: int) -> ModelSnapshot:
+        """Copy slot i's read-side parameters into a new immutable snapshot and swap it in."""
+        A_inv = self.A_inv[i].copy()
+        theta = self.theta[i].copy()
+        A_inv.setflags(write=False)
+        theta.setflags(write=False)
+        snap = ModelSnapshot(A_inv, theta)
+        self.published[i] = snap
+        return snap
+
+    def snapshot(self, i: int) -> ModelSnapshot:
+        """Current read-side snapshot of slot i (lock-free unless it has never been published)."""
+        snap = self.published[i]
+        if snap is None:
+            with self.locks[i]:
+                snap = self.published[i] or self.publish(i)
+        return snap
+
+    def reset(self, i: int):
+        """Re-initialize slot `i` to the ridge prior (A = I, b = 0)."""
+        d = self.context_dim
+        self.A[i] = np.identity(d)
+        self.A_inv[i] = np.identity(d)
+        self.b[i] = 0.0
+        self.theta[i] = 0.0
+        self.counts[i] = 0
+        self.since_refactor[i] = 0
+
+    def reset_covariance(self, i: int):
+        """Recover slot `i` from a failed solve: A = A_inv = I and theta = 0, keeping b and the interaction count."""
+        d = self.context_dim
+        self.A[i] = np.identity(d)
+        self.A_inv[i] = np.identity(d)
+        self.theta[i] = 0.0
+        self.since_refactor[i] = 0
+
+    def _grow(self):
+        if not self._growable:
+            raise MemoryError(f"Registry buffer is full ({self.capacity} models) and cannot be resized")
+        # Hold every slot lock so no in-flight update writes into the old buffer
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            old = {name: getattr(self, name) for name, _, _ in self._fields()}
+            n = len(self.keys)
+            self.capacity *= 2
+            self._bind(bytearray(self._nbytes(self.capacity)))
+            for name, arr in old.items():
+                getattr(self, name)[:n] = arr[:n]
+        finally:
+            for lock in self.locks:
+                lock.release()
+
+    def compact_copy(self, dtype=None) -> 'ModelRegistry':
+        """Consistent copy with capacity == len(self) (optionally re-typed), taken under every slot lock."""
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            n = len(self.keys)
+            copy = self._empty(max(n, 1), dtype=dtype)
+            copy.load_arrays(self.keys, {name: getattr(self, name)[:n] for name, _, _ in self._fields()})
+        finally:
+            for lock in self.locks:
+                lock.release()
+        return copy
+
+    def astype(self, dtype) -> 'ModelRegistry':
+        """Compact copy stored in `dtype` (self if it already matches)."""
+        return self if np.dtype(dtype) == self.dtype else self.compact_copy(dtype)
+
+    def __getstate__(self):
+        n = len(self.keys)
+        return {
+            'context_dim': self.context_dim,
+            'dtype': self.dtype.str,
+            'keys': list(self.keys),
+            'arrays': {name: getattr(self, name)[:n].copy() for name, _, _ in self._fields()},
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['context_dim'], capacity=max(len(state['keys']), 1), dtype=state.get('dtype', np.float64))
+        self.load_arrays(state['keys'], state['arrays'])
+
+    def load_arrays(self, keys: List[str], arrays: Dict[str, np.ndarray]):
+        """Bulk-assign stacked arrays for `keys` (slots are assigned in order)."""
+        for key in keys:
+            self.slot(key)
+        n = len(keys)
+        for name, arr in arrays.items():
+            getattr(self, name)[:n] = arr
+        for i in range(n):
+            self.publish(i)  # Replace the prior snapshots published during allocation
+
+
+class LinUCBModel:
+    """
+    Per-key view onto one slot of a ModelRegistry.
+
+    Getters return float64 (views for float64 storage, upcast copies otherwise), so
+    update arithmetic always accumulates in float64; setters round to the storage dtype.
+    On a low-rank registry A and A_inv are dense reconstructions of diag(D) + U U^T
+    and cannot be assigned.
+    """
+
+    __slots__ = ('registry', 'slot')
+
+    def __init__(self, registry: ModelRegistry, slot: int):
+        self.registry = registry
+        self.slot = slot
+
+    @property
+    def A(self) -> np.ndarray:
+        if self.registry.rank:
+            return self.registry.dense(self.slot)[0]
+        return self.registry.A[self.slot].astype(np.float64, copy=False)
+
+    @A.setter
+    def A(self, value):
+        self._check_dense('A')
+        self.registry.A[self.slot] = value
+
+    @property
+    def A_inv(self) -> np.ndarray:
+        if self.registry.rank:
+            return self.registry.dense(self.slot)[1]
+        return self.registry.A_inv[self.slot].astype(np.float64, copy=False)
+
+    @A_inv.setter
+    def A_inv(self, value):
+        self._check_dense('A_inv')
+        self.registry.A_inv[self.slot] = value
+
+    def _check_dense(self, name: str):
+        if self.registry.rank:
+            raise TypeError(f"Low-rank models store diag(D) + U U^T; {name} is a read-only reconstruction")
+
+    @property
+    def b(self) -> np.ndarray:
+        return self.registry.b[self.slot].astype(np.float64, copy=False)[:, None]
+
+    @b.setter
+    def b(self, value):
+        self.registry.b[self.slot] = np.reshape(value, -1)
+
+    @property
+    def theta(self) -> np.ndarray:
+        return self.registry.theta[self.slot].astype(np.float64, copy=False)[:, None]
+
+    @theta.setter
+    def theta(self, value):
+        self.registry.theta[self.slot] = np.reshape(value, -1)
+
+    @property
+    def interaction_count(self) -> int:
+        return int(self.registry.counts[self.slot])
+
+    @interaction_count.setter
+    def interaction_count(self, value):
+        self.registry.counts[self.slot] = value
+
+    @property
+    def updates_since_refactor(self) -> int:
+        return int(self.registry.since_refactor[self.slot])
+
+    @updates_since_refactor.setter
+    def updates_since_refactor(self, value):
+        self.registry.since_refactor[self.slot] = value
+
+    @property
+    def lock(self) -> Lock:
+        return self.registry.locks[self.slot]
+
+    def __repr__(self):
+        return f"LinUCBModel(key={self.registry.keys[self.slot]!r}, interaction_count={self.interaction_count})"
@@ -0,0 +1,599 @@
+"""
+Shared-memory LinUCB state for multi-process deployments (e.g. uvicorn --workers N).
+
+All workers attach to one `multiprocessing.shared_memory` block that holds the
+ModelRegistry tensors, the key table and the global counters, so every process
+scores against the same live parameters and sees feedback from any worker as
+soon as the writer finishes.
+
+Concurrency protocol:
+    - Writers (any process) serialize on an exclusive flock() of a lock file,
+      plus a thread lock inside the process.
+    - Each slot has a sequence counter. A writer makes it odd before mutating the
+      slot and even again afterwards (seqlock). Readers copy A_inv/theta without
+      locking and retry if the counter was odd or changed during the copy.
+    - New keys are appended to the key table under the writer lock; `n_keys` is
+      bumped last, so readers only discover fully initialized slots.
+
+Durability: every worker logs its own updates to one shared feedback log
+(SharedCheckpointManager). Sequence numbers come from a counter in the segment
+and each append happens in the same writer-lock hold as the update it records,
+so the log order matches the order updates hit the registry. Snapshots, log
+rotation and pruning belong to the leader, i.e. the holder of a flock() on
+`<name>.leader`. The creator of a segment takes it before other workers can
+attach; when it exits, the next worker to call try_lead() inherits it. A creator
+constructed with `recovering=True` also keeps the writer lock until
+`finish_recovery()`, so no worker can attach and log an update before the
+snapshot is loaded and the log replayed.
+
+The segment outlives individual workers; call `SharedModelRegistry.unlink()`
+(or `SharedLinUCBRecommender.unlink()`) to remove it.
+"""
+import os
+import time
+import fcntl
+import struct
+import logging
+import tempfile
+import threading
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Optional
+
+from src.rl import snapshot as snapshot_io
+from src.rl.checkpoint import CheckpointManager, FeedbackLog
+from src.rl.model_registry import ModelRegistry, ModelSnapshot
+from src.rl.linucb_recommender import LinUCBRecommender
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'LINUCBSH'
+VERSION = 2
+KEY_BYTES = 64  # Max UTF-8 length of an "emotion_category" key
+
+# magic, version, ready, context_dim, capacity
+CONTROL = struct.Struct('<8sIIII')
+
+
+def _align(n: int) -> int:
+    return -(-n // ModelRegistry.ALIGN) * ModelRegistry.ALIGN
+
+
+def _segment_layout(context_dim: int, capacity: int) -> Dict[str, int]:
+    """Byte offsets of the control block, counters, seqlocks, key table and registry buffer."""
+    counters = _align(CONTROL.size)
+    # n_keys, total_interactions (int64), alpha (float64), wal_seq, wal_segment (int64)
+    seqs = counters + ModelRegistry.ALIGN
+    keys = seqs + _align(8 * capacity)
+    registry = keys + _align(KEY_BYTES * capacity)
+    return {
+        'counters': counters,
+        'seqs': seqs,
+        'keys': keys,
+        'registry': registry,
+        'size': registry + ModelRegistry.nbytes(context_dim, capacity),
+    }
+
+
+class _WriterLock:
+    """
+    Cross-process exclusive writer lock: thread lock + flock() on a lock file.
+
+    Reentrant within a thread, so a log append and the update it records can share
+    one hold while the update still takes its slot's write section.
+    """
+
+    def __init__(self, path: str):
+        self._thread_lock = threading.RLock()
+        self._depth = 0  # Only touched by the thread holding _thread_lock
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _SlotWriteSection:
+    """`with registry.locks[i]:` in shared mode: writer lock + seqlock write section for slot i."""
+
+    def __init__(self, registry: 'SharedModelRegistry', i: int):
+        self.registry = registry
+        self.i = i
+
+    def __enter__(self):
+        self.registry.writer_lock.__enter__()
+        self.registry.seqs[self.i] += 1  # Odd: readers retry
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.seqs[self.i] += 1  # Even: slot consistent again
+        self.registry.writer_lock.__exit__(*exc)
+
+    # threading.Lock-compatible API for callers that acquire explicitly
+    def acquire(self):
+        self.__enter__()
+        return True
+
+    def release(self):
+        self.__exit__(None, None, None)
+
+
+class _SlotLocks:
+    """List-like view returning a write section per slot."""
+
+    def __init__(self, registry: 'SharedModelRegistry'):
+        self.registry = registry
+
+    def __getitem__(self, i: int) -> _SlotWriteSection:
+        return _SlotWriteSection(self.registry, i)
+
+    def __len__(self):
+        return len(self.registry.keys)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class SharedModelRegistry(ModelRegistry):
+    """ModelRegistry whose tensors, key table and counters live in named shared memory."""
+
+    def __init__(self, name: str, context_dim: int, capacity: int = 64, alpha: float = 1.0,
+                 lock_dir: Optional[str] = None, attach_timeout: float = 10.0, recovering: bool = False):
+        self.name = name
+        self.lock_dir = lock_dir or tempfile.gettempdir()
+        self._leader_fd = None
+        self._recovering = False
+        layout = _segment_layout(context_dim, capacity)
+        self.writer_lock = _WriterLock(os.path.join(self.lock_dir, f'{name}.lock'))
+
+        with self.writer_lock:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=layout['size'])
+                self.created = True
+            except FileExistsError:
+                self.shm = shared_memory.SharedMemory(name=name)
+                self.created = False
+            if self.created and recovering:
+                # Attaching workers block on the writer lock until finish_recovery()
+                self.writer_lock.__enter__()
+                self._recovering = True
+        # The segment must outlive whichever worker created it; lifetime is managed via unlink()
+        try:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+        buf = self.shm.buf
+        if self.created:
+            buf[:CONTROL.size] = CONTROL.pack(MAGIC, VERSION, 0, context_dim, capacity)
+        else:
+            deadline = time.monotonic() + attach_timeout
+            while CONTROL.unpack_from(buf)[2] != 1:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Shared LinUCB segment {name!r} was never initialized")
+                time.sleep(0.001)
+            magic, version, _, seg_dim, seg_capacity = CONTROL.unpack_from(buf)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Shared memory {name!r} is not a LinUCB segment")
+            if seg_dim != context_dim:
+                raise ValueError(f"Shared segment has context_dim {seg_dim}, expected {context_dim}")
+            capacity = seg_capacity
+            layout = _segment_layout(context_dim, capacity)
+
+        counters = layout['counters']
+        self._n_keys = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=counters)
+        self._total = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=counters + 8)
+        self._alpha = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=counters + 16)
+        self._wal_seq = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=counters + 24)
+        self._wal_segment = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=counters + 32)
+        self.seqs = np.ndarray((capacity,), dtype=np.int64, buffer=buf, offset=layout['seqs'])
+        self._key_table = np.ndarray((capacity, KEY_BYTES), dtype=np.uint8, buffer=buf, offset=layout['keys'])
+
+        registry_buf = buf[layout['registry']:layout['size']]
+        super().__init__(context_dim, capacity=capacity, buffer=registry_buf, growable=False)
+        self.locks = _SlotLocks(self)
+        self._cache = {}  # slot -> (seq, ModelSnapshot)
+
+        if self.created:
+            self._n_keys[0] = 0
+            self._total[0] = 0
+            self._alpha[0] = alpha
+            self._wal_seq[0] = 0
+            self._wal_segment[0] = 0  # 0: no worker has opened the feedback log yet
+            self.seqs[:] = 0
+            # The creator claims leadership before anyone can attach, so the process that
+            # recovers state into a new segment is the one that owns its checkpoints
+            self.try_lead()
+            struct.pack_into('<I', buf, 12, 1)  # ready
+        self._sync_keys()
+
+    # --- key table ---
+    def __len__(self):
+        self._sync_keys()
+        return len(self.keys)
+
+    def _sync_keys(self):
+        """Adopt keys other processes have added since the last sync."""
+        n = int(self._n_keys[0])
+        for i in range(len(self.keys), n):
+            key = bytes(self._key_table[i]).rstrip(b'\0').decode('utf-8')
+            self.keys.append(key)
+            self.published.append(None)
+            self.index[key] = i
+
+    def slot(self, key: str) -> int:
+        i = self.index.get(key)
+        if i is not None:
+            return i
+        # Writer lock first: log appends already hold it when the update allocates a slot
+        with self.writer_lock:
+            with self._alloc_lock:
+                i = self._allocate_locked(key)
+                self._sync_keys()
+        return i
+
+    def _allocate_locked(self, key: str) -> int:
+        """Find or append `key` in the shared key table; caller holds the writer lock."""
+        self._sync_keys()
+        if key in self.index:
+            return self.index[key]
+        encoded = key.encode('utf-8')
+        if len(encoded) > KEY_BYTES:
+            raise ValueError(f"Key {key!r} exceeds {KEY_BYTES} bytes")
+        i = int(self._n_keys[0])
+        if i >= self.capacity:
+            raise MemoryError(f"Shared registry {self.name!r} is full ({self.capacity} models)")
+        self.seqs[i] += 1
+        self.reset(i)
+        self._key_table[i] = 0
+        self._key_table[i, :len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        self.seqs[i] += 1
+        self._n_keys[0] = i + 1  # Published last
+        return i
+
+    # --- seqlock read path ---
+    def publish(self, i: int) -> Optional[ModelSnapshot]:
+        # Visibility comes from the seqlock; just drop this process's cached copy
+        self._cache.pop(i, None)
+        return None
+
+    def snapshot(self, i: int, max_wait: float = 1.0) -> ModelSnapshot:
+        deadline = None
+        while True:
+            s1 = int(self.seqs[i])
+            cached = self._cache.get(i)
+            if cached is not None and cached[0] == s1:
+                return cached[1]
+            if not s1 & 1:
+                A_inv = self.A_inv[i].copy()
+                theta = self.theta[i].copy()
+                if int(self.seqs[i]) == s1:
+                    A_inv.setflags(write=False)
+                    theta.setflags(write=False)
+                    snap = ModelSnapshot(A_inv, theta)
+                    self._cache[i] = (s1, snap)
+                    return snap
+            deadline = deadline or time.monotonic() + max_wait
+            if time.monotonic() > deadline:
+                if cached is not None:
+                    logger.error(f"Slot {i} write section stuck at seq {s1}; serving stale snapshot")
+                    return cached[1]
+                raise TimeoutError(f"Slot {i} of shared registry {self.name!r} is stuck mid-write")
+            time.sleep(0)
+
+    # --- shared counters ---
+    @property
+    def total_interactions(self) -> int:
+        return int(self._total[0])
+
+    @property
+    def alpha(self) -> float:
+        return float(self._alpha[0])
+
+    def set_counters(self, total_interactions: int = None, alpha: float = None):
+        with self.writer_lock:
+            if total_interactions is not None:
+                self._total[0] = total_interactions
+            if alpha is not None:
+                self._alpha[0] = alpha
+
+    def record_interactions(self, k: int):
+        """Count k updates and decay alpha once per update past the first 100 (cross-process atomic)."""
+        with self.writer_lock:
+            previous = int(self._total[0])
+            self._total[0] = previous + k
+            n_decay = previous + k - max(previous, 100)
+            if n_decay > 0:
+                self._alpha[0] = max(0.1, float(self._alpha[0]) * 0.999 ** n_decay)
+
+    # Feedback log position; read and written under the writer lock by SharedFeedbackLog
+    @property
+    def wal_seq(self) -> int:
+        return int(self._wal_seq[0])
+
+    @wal_seq.setter
+    def wal_seq(self, value: int):
+        self._wal_seq[0] = value
+
+    @property
+    def wal_segment(self) -> int:
+        return int(self._wal_segment[0])
+
+    @wal_segment.setter
+    def wal_segment(self, value: int):
+        self._wal_segment[0] = value
+
+    def compact_copy(self, dtype=None) -> ModelRegistry:
+        with self.writer_lock:
+            self._sync_keys()
+            n = len(self.keys)
+            copy = ModelRegistry(self.context_dim, capacity=max(n, 1), dtype=dtype or self.dtype)
+            copy.load_arrays(self.keys, {name: getattr(self, name)[:n] for name, _, _ in self.fields(self.context_dim)})
+        return copy
+
+    def seed(self, other: ModelRegistry, total_interactions: int, alpha: float) -> bool:
+        """
+        Copy `other` and the counters into the segment if it is still empty.
+
+        The emptiness check and the copy happen under one writer-lock hold, so when
+        several workers start from the same snapshot exactly one of them seeds it.
+        Returns True if this call seeded the segment.
+        """
+        with self.writer_lock:
+            if int(self._n_keys[0]) or int(self._total[0]):
+                return False
+            for j, key in enumerate(other.keys):
+                i = self._allocate_locked(key)
+                self.seqs[i] += 1
+                for name, _, _ in self.fields(self.context_dim):
+                    getattr(self, name)[i] = getattr(other, name)[j]
+                self.seqs[i] += 1
+            self._total[0] = total_interactions
+            self._alpha[0] = alpha
+        self._cache.clear()
+        return True
+
+    @property
+    def leader(self) -> bool:
+        return self._leader_fd is not None
+
+    def try_lead(self) -> bool:
+        """
+        Try to become the single process that owns durability (feedback log + snapshots).
+
+        Leadership is a non-blocking flock() held until close() or process exit, so
+        it passes to the next worker that asks once the leader goes away.
+        """
+        if self._leader_fd is None:
+            fd = os.open(os.path.join(self.lock_dir, f'{self.name}.leader'), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._leader_fd = fd
+        return True
+
+    def finish_recovery(self):
+        """Release the writer lock held since creation with `recovering=True` (same thread)."""
+        if self._recovering:
+            self._recovering = False
+            self.writer_lock.__exit__(None, None, None)
+
+    def __getstate__(self):
+        raise TypeError("SharedModelRegistry is attached by name; pickle compact_copy() instead")
+
+    def close(self):
+        """Detach this process from the segment."""
+        self.finish_recovery()
+        for name, _, _ in self.fields(self.context_dim):
+            setattr(self, name, None)
+        self._n_keys = self._total = self._alpha = self.seqs = self._key_table = None
+        self._wal_seq = self._wal_segment = None
+        self._buffer = None
+        self._cache.clear()
+        self.shm.close()
+        self.writer_lock.close()
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def unlink(self):
+        """Remove the named segment (existing attachments stay valid until closed)."""
+        try:
+            shared_memory.SharedMemory(name=self.name).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedLinUCBRecommender(LinUCBRecommender):
+    """
+    LinUCBRecommender backed by a SharedModelRegistry.
+
+    Every process constructed with the same `name` shares models, total_interactions
+    and alpha. Loads (load_snapshot/load) only seed the segment while it is still
+    empty, so every worker can run the same startup code. With `recovering=True`
+    the creator holds off other workers until `finish_recovery()`.
+    """
+
+    def __init__(self, name: str, context_dim: int = 19, alpha: float = 1.0, capacity: int = 64,
+                 lock_dir: Optional[str] = None, recovering: bool = False, **kwargs):
+        registry = SharedModelRegistry(name, context_dim, capacity=capacity, alpha=alpha, lock_dir=lock_dir,
+                                       recovering=recovering)
+        super().__init__(context_dim=context_dim, alpha=alpha, registry=registry, **kwargs)
+        self._attached = True
+
+    # Counters live in shared memory. The base constructor's assignments are ignored (the
+    # segment was seeded when it was created); later assignments write through.
+    @property
+    def alpha(self) -> float:
+        return self.registry.alpha
+
+    @alpha.setter
+    def alpha(self, value):
+        if self.__dict__.get('_attached'):
+            self.registry.set_counters(alpha=value)
+
+    @property
+    def total_interactions(self) -> int:
+        return self.registry.total_interactions
+
+    @total_interactions.setter
+    def total_interactions(self, value):
+        if self.__dict__.get('_attached'):
+            self.registry.set_counters(total_interactions=value)
+
+    @property
+    def created(self) -> bool:
+        return self.registry.created
+
+    @property
+    def models(self):
+        self.registry._sync_keys()
+        return super().models
+
+    def _record_interactions(self, k: int):
+        self.registry.record_interactions(k)
+
+    def load_snapshot(self, path='./models/linucb_state.snap', verify: bool = False) -> Dict:
+        """Seed shared memory from a snapshot; a no-op if the segment already holds state."""
+        local = LinUCBRecommender(context_dim=self.context_dim)
+        header = local.load_snapshot(path, verify=verify)
+        self.registry.seed(local.registry, header['total_interactions'], header['alpha'])
+        return header
+
+    def load(self, path='./models/linucb_models.pkl'):
+        if not os.path.exists(path):
+            return
+        local = LinUCBRecommender(context_dim=self.context_dim)
+        local.load(path)
+        self.registry.seed(local.registry, local.total_interactions, local.alpha)
+
+    def try_lead(self) -> bool:
+        return self.registry.try_lead()
+
+    def finish_recovery(self):
+        self.registry.finish_recovery()
+
+    @property
+    def leader(self) -> bool:
+        return self.registry.leader
+
+    def close(self):
+        self.registry.close()
+
+    def unlink(self):
+        self.registry.unlink()
+
+
+class SharedFeedbackLog(FeedbackLog):
+    """
+    FeedbackLog appended to by every worker attached to a SharedModelRegistry.
+
+    `last_seq` and the first sequence number of the active segment live in the
+    segment's counters. Callers append under `registry.writer_lock`; each record is
+    flushed before the lock is released so the next writer (possibly another
+    process) appends after it. Before writing, a worker reopens the active segment
+    if the leader rotated it.
+    """
+
+    def __init__(self, path: str, registry: SharedModelRegistry, fsync_every: int = 32, floor_seq: int = 0):
+        self.path = path
+        self.registry = registry
+        self.fsync_every = fsync_every
+        self._file = None
+        self._pending = 0
+        with registry.writer_lock:
+            if not registry.wal_segment:
+                # First worker on this segment: continue after the log on disk and the last snapshot
+                self._repair_tail()
+                on_disk = max((seq for seq, _, _, _, _ in self.replay()), default=0)
+                registry.wal_seq = max(on_disk, floor_seq, registry.wal_seq)
+                registry.wal_segment = registry.wal_seq + 1
+            self._open_segment(registry.wal_segment)
+
+    @property
+    def last_seq(self) -> int:
+        return self.registry.wal_seq
+
+    @last_seq.setter
+    def last_seq(self, value: int):
+        self.registry.wal_seq = value
+
+    def _open_segment(self, first_seq: int):
+        super()._open_segment(first_seq)
+        self._segment_first = first_seq
+
+    def _follow_segment(self):
+        if self._segment_first != self.registry.wal_segment:
+            self.sync()
+            self._file.close()
+            self._open_segment(self.registry.wal_segment)
+
+    def append(self, emotion: str, category: str, context: np.ndarray, reward: float) -> int:
+        with self.registry.writer_lock:
+            self._follow_segment()
+            seq = super().append(emotion, category, context, reward)
+            self._file.flush()
+        return seq
+
+    def rotate(self):
+        with self.registry.writer_lock:
+            self._follow_segment()
+            self.sync()
+            self._file.close()
+            if os.path.getsize(self._segment_path) == 0:
+                os.unlink(self._segment_path)
+            self.registry.wal_segment = self.last_seq + 1
+            self._open_segment(self.registry.wal_segment)
+
+    def advance_to(self, seq: int):
+        with self.registry.writer_lock:
+            super().advance_to(seq)
+
+
+class SharedCheckpointManager(CheckpointManager):
+    """
+    CheckpointManager for one worker of a SharedLinUCBRecommender deployment.
+
+    Every worker logs its own updates to the shared feedback log, holding the
+    cross-process writer lock from the append through the model update. Only the
+    leader writes snapshots and prunes the log; other workers just fsync their
+    appends, and take over snapshots with try_lead() once the leader goes away.
+    """
+
+    def _open_log(self, path: str, fsync_every: int) -> SharedFeedbackLog:
+        floor_seq = 0
+        if os.path.exists(self.snapshot_path):
+            floor_seq = snapshot_io.read_header(self.snapshot_path)['wal_seq']
+        return SharedFeedbackLog(path, self.recommender.registry, fsync_every=fsync_every, floor_seq=floor_seq)
+
+    def _make_lock(self):
+        return self.recommender.registry.writer_lock
+
+    def recover(self) -> int:
+        # Workers that attach meanwhile wait for the replay instead of logging into it
+        with self._lock:
+            return super().recover()
+
+    def checkpoint(self):
+        if not self.recommender.leader:
+            if not self.recommender.try_lead():
+                with self._lock:
+                    self.wal.sync()
+                return
+            self.attach()
+            logger.info("Took over LinUCB snapshots from the previous leader")
+        super().checkpoint()
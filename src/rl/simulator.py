@@ -0,0 +1,222 @@
+"""
+Seeded synthetic traffic for LinUCB scaling benchmarks (headless, no models).
+
+Users carry latent preferences over the 19-dim context built by
+LinUCBRecommender.build_context_matrix: a shared preference vector plus a
+low-rank per-user offset (n_users x rank float32, so a million users cost a few
+MB). Each request draws a user, an emotion and a category, samples a candidate
+set from a synthetic catalog, scores it with the policy and simulates watch time
+and thumbs feedback, rewarded through calculate_production_reward.
+
+Regret is pseudo-regret against the best candidate's expected reward under the
+noiseless watch fraction. Scoring and update latencies are recorded per call.
+"""
+import sys
+import time
+import resource
+import tracemalloc
+import numpy as np
+from typing import Dict, Optional
+
+from src.rl.linucb_recommender import (
+    CATEGORIES, CONTEXT_DIM, EMOTIONS, VIDEO_OFFSET,
+    LinUCBRecommender, calculate_production_reward, calculate_production_rewards
+)
+from src.rl.user_models import HybridLinUCB
+from src.utils.metrics import LatencyRecorder, StreamingMean
+from src.api.user_context_manager import UserContextManager
+
+
+class BanditSimulator:
+    """
+    Args:
+        n_users: population size (users are drawn uniformly per request)
+        n_videos: catalog size; each video has 5 normalized features and a duration
+        candidates: candidate-set size per request
+        rank: rank of the per-user preference offsets
+        noise: std of the observed watch fraction around its expectation
+        policy: 'linucb' or 'random' (baseline)
+        user_models: optional UserModelStore; LinUCB then scores and learns as a hybrid
+                     of the shared models and per-user models
+        shadow: optional second recommender (e.g. another precision) scored and updated
+                on the same traffic; its ranking agreement with the serving policy is reported
+    """
+
+    def __init__(self, n_users: int = 100_000, n_videos: int = 5000, candidates: int = 12, rank: int = 4,
+                 noise: float = 0.1, seed: int = 0, policy: str = 'linucb', recommender: LinUCBRecommender = None,
+                 user_models=None, shadow: LinUCBRecommender = None):
+        if policy not in ('linucb', 'random'):
+            raise ValueError(f"Unknown policy {policy!r}")
+        self.rng = np.random.default_rng(seed)
+        self.n_users = n_users
+        self.candidates = candidates
+        self.noise = noise
+        self.policy = policy
+
+        # Latent preferences: theta_u = shared + U[u] @ P
+        self.shared_pref = self.rng.normal(scale=1.0, size=CONTEXT_DIM)
+        self.user_factors = self.rng.normal(size=(n_users, rank)).astype(np.float32)
+        self.projection = self.rng.normal(scale=0.7, size=(rank, CONTEXT_DIM))
+        self.user_emotion = self.rng.integers(len(EMOTIONS), size=n_users, dtype=np.int8)  # Dominant mood
+
+        self.video_features = self.rng.uniform(0.0, 1.0, size=(n_videos, 5))
+        self.video_duration = self.rng.uniform(60.0, 1200.0, size=n_videos)
+
+        self.linucb = recommender or LinUCBRecommender(context_dim=CONTEXT_DIM)
+        self.hybrid = None
+        if user_models is not None:
+            self.hybrid = HybridLinUCB(self.linucb, user_models)
+        self.shadow = shadow
+        self.agreement = {'top1': StreamingMean(), 'rank_correlation': StreamingMean(), 'max_abs_diff': 0.0}
+        self.context_manager = UserContextManager()
+        self.score_latency = LatencyRecorder(seed=seed)
+        self.update_latency = LatencyRecorder(seed=seed + 1)
+
+    def _watch_fraction(self, user: int, X: np.ndarray) -> np.ndarray:
+        theta = self.shared_pref + self.user_factors[user] @ self.projection
+        return 1.0 / (1.0 + np.exp(-(X @ theta - 1.5)))
+
+    @staticmethod
+    def _feedback_probs(fraction):
+        """P(thumbs_up), P(thumbs_down) given the watch fraction."""
+        return 0.5 * fraction ** 2, 0.3 * (1.0 - fraction) ** 2
+
+    def expected_rewards(self, fraction: np.ndarray) -> np.ndarray:
+        """Expected calculate_production_reward over the thumbs outcomes at the noiseless watch fraction."""
+        p_up, p_down = self._feedback_probs(fraction)
+        r_up = calculate_production_rewards(fraction, 1.0, np.full(len(fraction), 'thumbs_up', dtype=object))
+        r_none = calculate_production_rewards(fraction, 1.0)
+        return p_up * r_up + p_down * -1.5 + (1.0 - p_up - p_down) * r_none
+
+    def step(self) -> Dict:
+        """Serve and learn from one simulated request."""
+        rng = self.rng
+        user = int(rng.integers(self.n_users))
+        emotion = EMOTIONS[self.user_emotion[user] if rng.random() < 0.7 else rng.integers(len(EMOTIONS))]
+        category = CATEGORIES[rng.integers(len(CATEGORIES))]
+        videos = rng.choice(len(self.video_features), size=self.candidates, replace=False)
+
+        user_id = str(user)
+        X = self.linucb.build_context_matrix(emotion, category, self.video_features[videos],
+                                             self.context_manager.get_user_context(user_id))
+        if self.policy == 'linucb':
+            start = time.perf_counter()
+            if self.hybrid is not None:
+                _, _, ucb = self.hybrid.score(user_id, emotion, category, X)
+            else:
+                _, _, ucb = self.linucb.score_structured(emotion, category, X[:, VIDEO_OFFSET:])
+            self.score_latency.add(time.perf_counter() - start)
+            choice = int(np.argmax(ucb))
+            if self.shadow is not None:
+                self._compare(ucb, self.shadow.score_structured(emotion, category, X[:, VIDEO_OFFSET:])[2])
+        else:
+            choice = int(rng.integers(self.candidates))
+
+        fraction = self._watch_fraction(user, X)
+        expected = self.expected_rewards(fraction)
+
+        # Observed feedback
+        observed = float(np.clip(fraction[choice] + rng.normal(scale=self.noise), 0.0, 1.0))
+        duration = self.video_duration[videos[choice]]
+        p_up, p_down = self._feedback_probs(fraction[choice])
+        u = rng.random()
+        feedback = 'thumbs_up' if u < p_up else 'thumbs_down' if u < p_up + p_down else None
+        reward = calculate_production_reward(observed * duration, duration, feedback)
+
+        if self.policy == 'linucb':
+            start = time.perf_counter()
+            if self.hybrid is not None:
+                self.hybrid.observe(user_id, emotion, category, X[choice], reward)
+            self.linucb.update(emotion, category, X[choice].reshape(-1, 1), reward)
+            if self.shadow is not None:
+                self.shadow.update(emotion, category, X[choice].reshape(-1, 1), reward)
+            self.update_latency.add(time.perf_counter() - start)
+        self.context_manager.update_user_context(user_id, reward)
+
+        return {'reward': reward, 'regret': float(expected.max() - expected[choice])}
+
+    def _compare(self, ucb: np.ndarray, shadow_ucb: np.ndarray):
+        """Top-1 agreement, Spearman rank correlation and max score difference of one candidate set."""
+        self.agreement['top1'].add(float(np.argmax(ucb) == np.argmax(shadow_ucb)))
+        ranks, shadow_ranks = np.argsort(np.argsort(ucb)), np.argsort(np.argsort(shadow_ucb))
+        n = len(ucb)
+        if n > 1:
+            self.agreement['rank_correlation'].add(1.0 - 6.0 * np.sum((ranks - shadow_ranks) ** 2) / (n * (n * n - 1)))
+        self.agreement['max_abs_diff'] = max(self.agreement['max_abs_diff'], float(np.max(np.abs(ucb - shadow_ucb))))
+
+    def shadow_report(self) -> Optional[Dict]:
+        if self.shadow is None:
+            return None
+        serving, shadow = self.linucb.registry, self.shadow.registry
+        serving_bytes, shadow_bytes = serving.parameter_bytes, shadow.parameter_bytes
+        return {
+            'serving_precision': str(serving.dtype),
+            'shadow_precision': str(shadow.dtype),
+            'top1_agreement': self.agreement['top1'].mean,
+            'rank_correlation': self.agreement['rank_correlation'].mean,
+            'max_abs_score_diff': self.agreement['max_abs_diff'],
+            'serving_registry_bytes': serving_bytes,
+            'shadow_registry_bytes': shadow_bytes,
+            'memory_ratio': shadow_bytes / serving_bytes,
+            'shadow_precision_alerts': len(self.shadow.precision_alerts),
+        }
+
+    def run(self, n_requests: int, curve_points: int = 200, trace_memory: bool = False) -> Dict:
+        """
+        Simulate `n_requests` requests.
+
+        Args:
+            curve_points: samples kept for the cumulative regret/reward curves
+            trace_memory: also report the tracemalloc peak (slows the run down)
+        """
+        every = max(1, n_requests // curve_points)
+        regret = reward = 0.0
+        curve = []
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for t in range(1, n_requests + 1):
+            result = self.step()
+            regret += result['regret']
+            reward += result['reward']
+            if t % every == 0 or t == n_requests:
+                curve.append({'t': t, 'cumulative_regret': regret, 'cumulative_reward': reward})
+        elapsed = time.perf_counter() - start
+        traced_peak = None
+        if trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        return {
+            'policy': self.policy,
+            'requests': n_requests,
+            'seconds': elapsed,
+            'requests_per_sec': n_requests / elapsed if elapsed > 0 else 0.0,
+            'cumulative_regret': regret,
+            'mean_regret': regret / n_requests if n_requests else 0.0,
+            'mean_reward': reward / n_requests if n_requests else 0.0,
+            'curve': curve,
+            'latency': {'score': self.score_latency.summary(), 'update': self.update_latency.summary()},
+            'memory': self.memory_report(traced_peak),
+            'shadow': self.shadow_report(),
+        }
+
+    def memory_report(self, traced_peak: Optional[int] = None) -> Dict:
+        registry = self.linucb.registry
+        store = self.context_manager.user_store
+        # Per-user cost of the context store, estimated from one entry
+        sample = next(iter(store.items()), None)
+        per_user = sys.getsizeof(sample[0]) + sys.getsizeof(sample[1]) + 3 * 32 if sample else 0
+        report = {
+            'linucb_models': len(registry),
+            'linucb_registry_bytes': registry.parameter_bytes,
+            'active_users': len(store),
+            'user_store_bytes_est': per_user * len(store),
+            'simulator_latent_bytes': self.user_factors.nbytes + self.user_emotion.nbytes,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        }
+        if self.hybrid is not None:
+            report['user_models'] = self.hybrid.users.stats()
+        if traced_peak is not None:
+            report['traced_peak_bytes'] = traced_peak
+        return report
@@ -0,0 +1,169 @@
+"""
+Versioned binary snapshot format for LinUCB model state.
+
+Layout (little-endian):
+    header   versioned fixed struct (HEADERS) + crc32 of header and key table
+    keys     UTF-8 model keys separated by newlines
+    padding  up to a 64-byte boundary
+    data     raw registry buffer for `n_models` slots (see ModelRegistry.layout, or
+             LowRankModelRegistry.layout when the header's rank is non-zero), with
+             float parameters in the width recorded by the header
+
+The data block is mapped with np.memmap in copy-on-write mode, so loading costs
+the same no matter how many models the snapshot holds; pages are only read when
+a model is scored. Writes go to a temp file that is fsync'd and renamed over the
+target, so readers never observe a partial snapshot.
+"""
+import os
+import struct
+import tempfile
+import zlib
+import numpy as np
+from typing import Dict, Tuple
+
+from src.rl.model_registry import ModelRegistry
+from src.rl.low_rank import LowRankModelRegistry
+
+MAGIC = b'LINUCBSN'
+VERSION = 4
+
+# v1: magic, version, context_dim, n_models, alpha, total_interactions, keys_nbytes, data_nbytes, data_crc32
+# v2: + wal_seq (last feedback-log sequence number folded into this snapshot)
+# v3: + rank (0 = full covariance, r = diagonal plus rank-r factor)
+# v4: + float_bytes (8 = float64, 4 = float32 parameter storage)
+HEADERS = {
+    1: struct.Struct('<8sIIIdQIQI'),
+    2: struct.Struct('<8sIIIdQIQIQ'),
+    3: struct.Struct('<8sIIIdQIQIQI'),
+    4: struct.Struct('<8sIIIdQIQIQII'),
+}
+FLOAT_DTYPES = {8: np.dtype(np.float64), 4: np.dtype(np.float32)}
+HEADER = HEADERS[VERSION]
+HEADER_CRC = struct.Struct('<I')
+PREFIX = struct.Struct('<8sI')  # magic, version: common to every header version
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is malformed, truncated or from an unknown version."""
+
+
+def _data_offset(keys_nbytes: int, header: struct.Struct = HEADER) -> int:
+    end = header.size + HEADER_CRC.size + keys_nbytes
+    return -(-end // ModelRegistry.ALIGN) * ModelRegistry.ALIGN
+
+
+def is_snapshot(path: str) -> bool:
+    """True if `path` starts with the snapshot magic bytes."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_snapshot(path: str, registry: ModelRegistry, alpha: float, total_interactions: int, wal_seq: int = 0):
+    """Atomically write `registry` to `path` (temp file + fsync + rename)."""
+    compact = registry.compact_copy()
+    n = len(compact)
+    keys = '\n'.join(compact.keys).encode('utf-8')
+    data = memoryview(compact._buffer)[:compact.parameter_bytes] if n else b''
+
+    header = HEADER.pack(MAGIC, VERSION, compact.context_dim, n, float(alpha), int(total_interactions),
+                         len(keys), len(data), zlib.crc32(data), int(wal_seq), compact.rank, compact.dtype.itemsize)
+    header_crc = HEADER_CRC.pack(zlib.crc32(header + keys))
+    padding = b'\0' * (_data_offset(len(keys)) - HEADER.size - HEADER_CRC.size - len(keys))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(header_crc)
+            f.write(keys)
+            f.write(padding)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_header(path: str) -> Dict:
+    """Parse and validate the header and key table without touching the data block."""
+    with open(path, 'rb') as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) < PREFIX.size:
+            raise SnapshotError(f"{path}: truncated header")
+        magic, version = PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path}: not a LinUCB snapshot")
+        if version not in HEADERS:
+            raise SnapshotError(f"{path}: unsupported snapshot version {version}")
+        header = HEADERS[version]
+        raw = prefix + f.read(header.size + HEADER_CRC.size - PREFIX.size)
+        if len(raw) < header.size + HEADER_CRC.size:
+            raise SnapshotError(f"{path}: truncated header")
+        fields = header.unpack_from(raw)
+        _, _, context_dim, n_models, alpha, total, keys_nbytes, data_nbytes, data_crc = fields[:9]
+        wal_seq = fields[9] if version >= 2 else 0
+        rank = fields[10] if version >= 3 else 0
+        float_bytes = fields[11] if version >= 4 else 8
+        keys = f.read(keys_nbytes)
+
+    (header_crc,) = HEADER_CRC.unpack_from(raw, header.size)
+    if zlib.crc32(raw[:header.size] + keys) != header_crc:
+        raise SnapshotError(f"{path}: header checksum mismatch")
+
+    if float_bytes not in FLOAT_DTYPES:
+        raise SnapshotError(f"{path}: unsupported parameter width {float_bytes}")
+    offset = _data_offset(keys_nbytes, header)
+    if os.path.getsize(path) < offset + data_nbytes:
+        raise SnapshotError(f"{path}: truncated data block")
+
+    return {
+        'version': version,
+        'context_dim': context_dim,
+        'n_models': n_models,
+        'alpha': alpha,
+        'total_interactions': total,
+        'wal_seq': wal_seq,
+        'rank': rank,
+        'dtype': FLOAT_DTYPES[float_bytes],
+        'keys': keys.decode('utf-8').split('\n') if n_models else [],
+        'data_offset': offset,
+        'data_nbytes': data_nbytes,
+        'data_crc32': data_crc,
+    }
+
+
+def read_snapshot(path: str, verify: bool = False) -> Tuple[ModelRegistry, Dict]:
+    """
+    Map a snapshot into a ModelRegistry without copying the model arrays.
+
+    Args:
+        verify: also checksum the data block (reads the whole file)
+
+    Returns:
+        (registry, header)
+    """
+    header = read_header(path)
+    n = header['n_models']
+    d, rank, dtype = header['context_dim'], header['rank'], header['dtype']
+    if n == 0:
+        return (LowRankModelRegistry(d, rank=rank, dtype=dtype) if rank else ModelRegistry(d, dtype=dtype)), header
+
+    data = np.memmap(path, dtype=np.uint8, mode='c', offset=header['data_offset'], shape=(header['data_nbytes'],))
+    if verify and zlib.crc32(data) != header['data_crc32']:
+        raise SnapshotError(f"{path}: data checksum mismatch")
+
+    # Copy-on-write map: updates stay private to this process until the next write_snapshot
+    if rank:
+        registry = LowRankModelRegistry(d, rank=rank, capacity=n, buffer=data, growable=True, dtype=dtype,
+                                        keys=header['keys'])
+    else:
+        registry = ModelRegistry(d, capacity=n, buffer=data, growable=True, dtype=dtype, keys=header['keys'])
+    return registry, header
@@ -0,0 +1,260 @@
+"""
+Hybrid per-user LinUCB: shared emotion x category models plus per-user models.
+
+The shared models (LinUCBRecommender) learn what works for everyone in a given
+mood and category. Each user additionally gets a small ridge model over
+
+    z = [1, video features (5)]                                    (USER_DIM = 6)
+
+fit to the residual r - theta_shared . x, so it captures that user's own taste
+for the video features on top of the shared estimate. Candidates are scored as
+
+    mean = theta_shared . x + theta_user . z
+    ucb  = mean + alpha * sqrt(x' A_inv_shared x + z' A_inv_user z)
+
+User models live in a fixed-capacity slab with LRU eviction (UserModelStore):
+evicted models are spilled to a sqlite table as upper(A) + b in float64 (216
+bytes per user) and reloaded lazily on the next request from that user, so
+resident memory is bounded by `capacity` whatever the population size. Lookups,
+spills and reloads are counted and timed.
+
+User models are per process: with several server workers, route each user to
+one worker (or accept that workers refine diverging copies of the same row).
+"""
+import time
+import sqlite3
+import logging
+import numpy as np
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from src.rl.linucb_recommender import USER_OFFSET, VIDEO_OFFSET, LinUCBRecommender
+from src.utils.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+USER_DIM = 1 + USER_OFFSET - VIDEO_OFFSET
+
+
+def user_features(X: np.ndarray) -> np.ndarray:
+    """(n, 19) contexts -> (n, USER_DIM) per-user features: bias + video features."""
+    X = np.atleast_2d(X)
+    return np.hstack([np.ones((len(X), 1)), X[:, VIDEO_OFFSET:USER_OFFSET]])
+
+
+class UserModelStore:
+    """
+    Size-bounded LRU of per-user ridge models, spilling to sqlite.
+
+    Args:
+        capacity: resident models (memory is ~2.5 (d^2 + d) floats per slot, preallocated)
+        path: sqlite file for spilled models (None keeps them in an in-memory database)
+        lambda_forget: per-update forgetting factor of the user models
+        commit_every: spills between sqlite commits (flush() commits immediately)
+    """
+
+    def __init__(self, capacity: int = 50_000, path: Optional[str] = None, dim: int = USER_DIM,
+                 lambda_forget: float = 1.0, commit_every: int = 256):
+        self.capacity = capacity
+        self.dim = dim
+        self.lambda_forget = lambda_forget
+        self.commit_every = commit_every
+        self.A = np.zeros((capacity, dim, dim))
+        self.A_inv = np.zeros((capacity, dim, dim))
+        self.b = np.zeros((capacity, dim))
+        self.theta = np.zeros((capacity, dim))
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.slots: 'OrderedDict[str, int]' = OrderedDict()  # user_id -> slot, least recently used first
+        self.free = list(range(capacity - 1, -1, -1))
+        self._lock = Lock()
+        self._triu = np.triu_indices(dim)
+        self._uncommitted = 0
+
+        self.db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS user_models '
+                        '(user_id TEXT PRIMARY KEY, count INTEGER NOT NULL, params BLOB NOT NULL)')
+
+        self.hits = self.creates = self.reloads = self.evictions = self.spills = 0
+        self.lookup_latency = LatencyRecorder()
+        self.reload_latency = LatencyRecorder(seed=1)
+        self.spill_latency = LatencyRecorder(seed=2)
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes of the preallocated slab."""
+        return sum(arr.nbytes for arr in (self.A, self.A_inv, self.b, self.theta, self.counts, self.dirty))
+
+    def _slot(self, user_id: str, create: bool = True) -> Optional[int]:
+        """
+        Resident slot for `user_id`, reloading or creating it (evicting the LRU model if full).
+        Returns None for a user with no model yet if not `create`. Caller holds the lock.
+        """
+        start = time.perf_counter()
+        i = self.slots.get(user_id)
+        if i is not None:
+            self.slots.move_to_end(user_id)
+            self.hits += 1
+            self.lookup_latency.add(time.perf_counter() - start)
+            return i
+
+        row = self.db.execute('SELECT count, params FROM user_models WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None and not create:
+            self.lookup_latency.add(time.perf_counter() - start)
+            return None
+        if not self.free:
+            self._evict()
+        i = self.free.pop()
+        if row is None:
+            self.A[i] = np.identity(self.dim)
+            self.A_inv[i] = np.identity(self.dim)
+            self.b[i] = 0.0
+            self.theta[i] = 0.0
+            self.counts[i] = 0
+            self.creates += 1
+        else:
+            reload_start = time.perf_counter()
+            params = np.frombuffer(row[1], dtype=np.float64)
+            n_tri = len(self._triu[0])
+            A = np.zeros((self.dim, self.dim))
+            A[self._triu] = params[:n_tri]
+            A = A + np.triu(A, 1).T
+            self.A[i] = A
+            self.A_inv[i] = np.linalg.inv(A)
+            self.b[i] = params[n_tri:]
+            self.theta[i] = self.A_inv[i] @ self.b[i]
+            self.counts[i] = row[0]
+            self.reloads += 1
+            self.reload_latency.add(time.perf_counter() - reload_start)
+        self.dirty[i] = False
+        self.slots[user_id] = i
+        self.lookup_latency.add(time.perf_counter() - start)
+        return i
+
+    def _evict(self):
+        user_id, i = self.slots.popitem(last=False)
+        self.evictions += 1
+        if self.dirty[i]:
+            self._spill(user_id, i)
+        self.free.append(i)
+
+    def _spill(self, user_id: str, i: int):
+        start = time.perf_counter()
+        params = np.concatenate([self.A[i][self._triu], self.b[i]])
+        self.db.execute('INSERT OR REPLACE INTO user_models (user_id, count, params) VALUES (?, ?, ?)',
+                        (user_id, int(self.counts[i]), params.tobytes()))
+        self.dirty[i] = False
+        self.spills += 1
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.db.commit()
+            self._uncommitted = 0
+        self.spill_latency.add(time.perf_counter() - start)
+
+    def scores(self, user_id: str, Z: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(means, variances) of the rows of Z (n, dim) under the user's model (the prior for unseen users)."""
+        with self._lock:
+            i = self._slot(user_id, create=False)
+            if i is not None:
+                theta, A_inv = self.theta[i].copy(), self.A_inv[i].copy()
+        if i is None:
+            # Scoring alone never allocates: theta = 0, A_inv = I
+            return np.zeros(len(Z)), np.einsum('ij,ij->i', Z, Z)
+        return Z @ theta, np.einsum('ij,jk,ik->i', Z, A_inv, Z)
+
+    def update(self, user_id: str, z: np.ndarray, target: float):
+        """Sherman-Morrison update of the user's model with one (z, target) observation."""
+        z = np.reshape(z, -1)
+        lam = self.lambda_forget
+        with self._lock:
+            i = self._slot(user_id)
+            self.A[i] = lam * self.A[i] + np.outer(z, z)
+            self.b[i] = lam * self.b[i] + target * z
+            P = self.A_inv[i] / lam
+            Pz = P @ z
+            self.A_inv[i] = P - np.outer(Pz, Pz) / (1.0 + z @ Pz)
+            self.theta[i] = self.A_inv[i] @ self.b[i]
+            self.counts[i] += 1
+            self.dirty[i] = True
+
+    def interaction_count(self, user_id: str) -> int:
+        with self._lock:
+            i = self._slot(user_id, create=False)
+            return 0 if i is None else int(self.counts[i])
+
+    def flush(self):
+        """Spill every modified resident model and commit (resident copies stay cached)."""
+        with self._lock:
+            for user_id, i in self.slots.items():
+                if self.dirty[i]:
+                    self._spill(user_id, i)
+            self.db.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def stats(self) -> Dict:
+        lookups = self.lookup_latency.count
+        return {
+            'resident': len(self.slots),
+            'capacity': self.capacity,
+            'resident_bytes': self.nbytes,
+            'lookups': lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'creates': self.creates,
+            'reloads': self.reloads,
+            'evictions': self.evictions,
+            'spills': self.spills,
+            'latency': {
+                'lookup': self.lookup_latency.summary(),
+                'reload': self.reload_latency.summary(),
+                'spill': self.spill_latency.summary(),
+            },
+        }
+
+
+class HybridLinUCB:
+    """Shared LinUCBRecommender models plus per-user residual models from a UserModelStore."""
+
+    def __init__(self, shared: LinUCBRecommender, users: UserModelStore):
+        self.shared = shared
+        self.users = users
+
+    def score(self, user_id: str, emotion, category, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Args:
+            X: (n, 19) contexts from build_context_matrix
+
+        Returns:
+            (means, uncertainties, ucb_scores), each of shape (n,)
+        """
+        X = np.atleast_2d(X)
+        means, uncertainties, _ = self.shared.score_batch(emotion, category, X)
+        user_means, user_var = self.users.scores(user_id, user_features(X))
+        means = means + user_means
+        uncertainties = np.sqrt(uncertainties ** 2 + self.shared.alpha ** 2 * np.maximum(user_var, 0.0))
+        return means, uncertainties, means + uncertainties
+
+    def shared_mean(self, emotion, category, context: np.ndarray) -> float:
+        """The shared model's current mean estimate for one context."""
+        return float(self.shared.score_batch(emotion, category, np.reshape(context, (1, -1)))[0][0])
+
+    def observe(self, user_id: str, emotion, category, context: np.ndarray, reward: float,
+                shared_mean: Optional[float] = None):
+        """
+        Fit the user's model to the reward left over after the shared model's estimate.
+
+        Args:
+            shared_mean: Estimate read before the shared update was queued (defaults to the current one)
+        """
+        if shared_mean is None:
+            shared_mean = self.shared_mean(emotion, category, context)
+        self.users.update(user_id, user_features(np.reshape(context, (1, -1)))[0], reward - shared_mean)
@@ -0,0 +1,183 @@
+"""
+Offline bulk warm-start of LinUCB from historical watch-time / thumbs logs.
+
+Replaying history through update() costs one O(d^2) inverse refresh per event.
+The trainer instead folds each chunk of events into per-key sufficient statistics
+
+    A <- lambda^c A + sum_i lambda^(c-1-i) x_i x_i^T      b <- lambda^c b + sum_i lambda^(c-1-i) r_i x_i
+
+with einsum (c = events for that key in the chunk), and inverts every A exactly
+once at the end. The result is the same model that sequential update() calls
+from a fresh recommender produce. Accumulation runs in-process unless `workers`
+> 1; a pool then gets one task per worker, each carrying a contiguous span of
+the chunk's key groups, so every row crosses the process boundary once.
+
+Log columns (one row per event, chronological order):
+    emotion, category, watch_time, total_duration, [feedback], [timestamp]
+    f0..f4                                   normalized video features
+    avg_feedback, interaction_count, success_rate   user context at event time
+"""
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.rl.linucb_recommender import (
+    CATEGORY_INDEX, CATEGORY_OFFSET, CONTEXT_DIM, EMOTION_INDEX, USER_OFFSET, VIDEO_OFFSET,
+    LinUCBRecommender, calculate_production_rewards
+)
+from src.rl.model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+VIDEO_COLUMNS = ['f0', 'f1', 'f2', 'f3', 'f4']
+
+
+def build_event_contexts(events: pd.DataFrame) -> np.ndarray:
+    """
+    Per-row 19-dim contexts for logged events, encoded exactly like
+    LinUCBRecommender.build_context_matrix (same one-hot defaults and caps).
+    """
+    n = len(events)
+    X = np.zeros((n, CONTEXT_DIM))
+    rows = np.arange(n)
+    X[rows, events['emotion'].map(EMOTION_INDEX).fillna(EMOTION_INDEX['calm']).to_numpy(dtype=int)] = 1.0
+    X[rows, CATEGORY_OFFSET + events['category'].map(CATEGORY_INDEX).fillna(CATEGORY_INDEX['yoga']).to_numpy(dtype=int)] = 1.0
+    X[:, VIDEO_OFFSET:USER_OFFSET] = events[VIDEO_COLUMNS].to_numpy(dtype=float)
+    X[:, USER_OFFSET] = events['avg_feedback'].to_numpy(dtype=float)
+    X[:, USER_OFFSET + 1] = np.minimum(events['interaction_count'].to_numpy(dtype=float) / 100.0, 1.0)
+    X[:, USER_OFFSET + 2] = events['success_rate'].to_numpy(dtype=float)
+    return X
+
+
+def read_events(path: str, chunk_size: int = 500_000) -> Iterator[pd.DataFrame]:
+    """Stream a CSV (or Parquet, loaded whole) event log in chunks."""
+    if path.endswith('.parquet'):
+        yield pd.read_parquet(path)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _accumulate(key: str, X: np.ndarray, r: np.ndarray, lambda_forget: float) -> Tuple[str, int, np.ndarray, np.ndarray]:
+    """Forgetting-weighted X^T X and X^T r of one key's events in one chunk (oldest row first)."""
+    c = len(r)
+    w = lambda_forget ** np.arange(c - 1, -1, -1)
+    return key, c, np.einsum('i,ij,ik->jk', w, X, X, optimize=True), np.einsum('i,ij->j', w * r, X)
+
+
+def _accumulate_span(task: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]) -> List[Tuple]:
+    """_accumulate for every key group in one span; rows of group j are X[starts[j]:ends[j]]."""
+    keys, starts, ends, X, r, lambda_forget = task
+    return [_accumulate(key, X[s:e], r[s:e], lambda_forget) for key, s, e in zip(keys, starts, ends)]
+
+
+class WarmStartTrainer:
+    """
+    Bulk trainer producing a ready-to-serve LinUCBRecommender from event logs.
+
+    Args:
+        workers: process-pool size for per-key accumulation (None or <= 1 runs in-process)
+        alpha: initial exploration weight; decayed as if every event went through update()
+        precision: parameter storage of the built recommender (accumulation is always float64)
+    """
+
+    def __init__(self, context_dim: int = CONTEXT_DIM, alpha: float = 1.0, lambda_forget: float = 0.99,
+                 workers: Optional[int] = None, precision: str = 'float64'):
+        if context_dim != CONTEXT_DIM:
+            raise ValueError(f"Event logs encode {CONTEXT_DIM}-dim contexts, got context_dim={context_dim}")
+        self.context_dim = context_dim
+        self.alpha = alpha
+        self.lambda_forget = lambda_forget
+        self.workers = workers
+        self.precision = precision
+        self._A: Dict[str, np.ndarray] = {}
+        self._b: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+
+    def _tasks(self, events: pd.DataFrame, n_spans: int = 1):
+        """
+        Split a chunk into at most `n_spans` _accumulate_span tasks of roughly equal
+        row count; each task holds its own contiguous block of the key-sorted X.
+        """
+        if len(events) == 0:
+            return []
+        if 'timestamp' in events:
+            events = events.sort_values('timestamp', kind='stable')
+        feedback = events['feedback'].to_numpy(dtype=object) if 'feedback' in events else None
+        rewards = calculate_production_rewards(events['watch_time'].to_numpy(), events['total_duration'].to_numpy(), feedback)
+        X = build_event_contexts(events)
+        keys = (events['emotion'].astype(str) + '_' + events['category'].astype(str)).to_numpy()
+        # Stable grouping keeps each key's events in chronological order
+        order = np.argsort(keys, kind='stable')
+        keys, X, rewards = keys[order], X[order], rewards[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        # Span boundaries in group indices: cut after the group that crosses each row target
+        targets = np.linspace(0, len(keys), n_spans + 1)[1:-1]
+        bounds = np.unique(np.r_[0, np.searchsorted(ends, targets) + 1, len(starts)].clip(0, len(starts)))
+        tasks = []
+        for g0, g1 in zip(bounds[:-1], bounds[1:]):
+            lo, hi = starts[g0], ends[g1 - 1]
+            tasks.append((keys[starts[g0:g1]], starts[g0:g1] - lo, ends[g0:g1] - lo, X[lo:hi], rewards[lo:hi],
+                          self.lambda_forget))
+        return tasks
+
+    def _fold(self, key: str, c: int, dA: np.ndarray, db: np.ndarray):
+        d = self.context_dim
+        decay = self.lambda_forget ** c
+        if key not in self._A:
+            self._A[key] = np.identity(d)  # Ridge prior of a fresh model
+            self._b[key] = np.zeros(d)
+            self._counts[key] = 0
+        self._A[key] = decay * self._A[key] + dA
+        self._b[key] = decay * self._b[key] + db
+        self._counts[key] += c
+
+    def fit(self, chunks: Iterable[pd.DataFrame]) -> LinUCBRecommender:
+        """Accumulate every chunk (in chronological order) and build the recommender."""
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers and self.workers > 1 else None
+        try:
+            n_events = 0
+            for events in chunks:
+                tasks = self._tasks(events, self.workers if pool else 1)
+                for results in (pool.map(_accumulate_span, tasks) if pool else map(_accumulate_span, tasks)):
+                    for key, c, dA, db in results:
+                        self._fold(key, c, dA, db)
+                n_events += len(events)
+                logger.info(f"Warm start: {n_events} events folded into {len(self._A)} models")
+        finally:
+            if pool:
+                pool.shutdown()
+        return self.build()
+
+    def build(self) -> LinUCBRecommender:
+        """Invert every accumulated A once and pack the models into a recommender."""
+        recommender = LinUCBRecommender(context_dim=self.context_dim, alpha=self.alpha, lambda_forget=self.lambda_forget,
+                                        precision=self.precision)
+        keys = list(self._A)
+        if keys:
+            A = np.stack([self._A[k] for k in keys])
+            b = np.stack([self._b[k] for k in keys])
+            A_inv = np.linalg.solve(A, np.broadcast_to(np.identity(self.context_dim), A.shape))
+            A_inv = 0.5 * (A_inv + np.swapaxes(A_inv, 1, 2))
+            registry = ModelRegistry(self.context_dim, capacity=len(keys), dtype=recommender.dtype)
+            registry.load_arrays(keys, {
+                'A': A,
+                'A_inv': A_inv,
+                'b': b,
+                'theta': np.einsum('kij,kj->ki', A_inv, b),
+                'counts': np.array([self._counts[k] for k in keys]),
+            })
+            recommender.registry = registry
+        recommender._record_interactions(sum(self._counts.values()))
+        return recommender
+
+
+def warm_start(path: str, snapshot_path: str, lambda_forget: float = 0.99, alpha: float = 1.0,
+               chunk_size: int = 500_000, workers: Optional[int] = None, precision: str = 'float64') -> LinUCBRecommender:
+    """Train from the event log at `path` and write a binary snapshot to `snapshot_path`."""
+    trainer = WarmStartTrainer(alpha=alpha, lambda_forget=lambda_forget, workers=workers, precision=precision)
+    recommender = trainer.fit(read_events(path, chunk_size))
+    recommender.save_snapshot(snapshot_path)
+    return recommender
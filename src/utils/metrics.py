@@ -0,0 +1,112 @@
+"""
+Streaming metric accumulators shared by the API workers, the bandit simulator
+and the offline evaluators.
+
+StreamingMean keeps exact count / mean / variance / min / max in O(1) memory.
+RollingStats adds percentiles over a bounded sample of the stream: the most
+recent `window` values (live service metrics) or a uniform reservoir of that
+size (benchmark runs). LatencyRecorder reports a reservoir of per-call
+latencies in microseconds.
+"""
+import math
+import random
+import numpy as np
+from collections import deque
+from typing import Dict, List, Sequence
+
+
+class StreamingMean:
+    """Count / mean / variance (Welford) / min / max in O(1) memory."""
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stderr(self) -> float:
+        return math.sqrt(self.variance / self.count) if self.count else 0.0
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'std': math.sqrt(self.variance),
+            'stderr': self.stderr,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0,
+        }
+
+
+class RollingStats(StreamingMean):
+    """
+    StreamingMean plus percentiles over at most `window` values: the most recent
+    ones, or with `uniform=True` a uniform reservoir sample of the whole stream.
+    """
+
+    __slots__ = ('window', 'sample', '_rng')
+
+    def __init__(self, window: int = 1024, uniform: bool = False, seed: int = 0):
+        super().__init__()
+        self.window = window
+        self.sample = [] if uniform else deque(maxlen=window)
+        self._rng = random.Random(seed) if uniform else None
+
+    def add(self, value: float):
+        super().add(value)
+        if self._rng is None or len(self.sample) < self.window:
+            self.sample.append(value)
+        else:
+            j = self._rng.randrange(self.count)
+            if j < self.window:
+                self.sample[j] = value
+
+    def percentiles(self, qs: Sequence[float]) -> List[float]:
+        sample = np.array(self.sample) if self.sample else np.zeros(1)
+        return [float(p) for p in np.percentile(sample, qs)]
+
+    def summary(self) -> Dict:
+        p50, p95 = self.percentiles((50, 95))
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'p50': p50,
+            'p95': p95,
+            'max': self.max if self.count else 0.0
+        }
+
+
+class LatencyRecorder(RollingStats):
+    """Per-call latency in seconds: exact mean/max plus percentiles over a fixed-size uniform reservoir."""
+
+    __slots__ = ()
+
+    def __init__(self, reservoir: int = 10000, seed: int = 0):
+        super().__init__(window=reservoir, uniform=True, seed=seed)
+
+    def summary(self) -> Dict:
+        p50, p95, p99 = self.percentiles((50, 95, 99))
+        return {
+            'calls': self.count,
+            'mean_us': self.mean * 1e6,
+            'p50_us': p50 * 1e6,
+            'p95_us': p95 * 1e6,
+            'p99_us': p99 * 1e6,
+            'max_us': (self.max if self.count else 0.0) * 1e6,
+        }
@@ -0,0 +1,66 @@
+"""
+Stand-ins for the emotion detector's tokenizer, classifier and KeyBERT, shared by
+the NLP tests. Build a detector around them with EmotionDetector.from_components().
+Requires torch and transformers.
+"""
+import torch
+from transformers import BatchEncoding
+
+LABELS = {0: 'sadness', 1: 'joy', 2: 'love', 3: 'anger', 4: 'fear', 5: 'surprise'}
+STOP_WORDS = {'i', 'am', 'so', 'the', 'a', 'is', 'and', 'to', 'my', 'of', 'it'}
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with [CLS]/[SEP] ids and HF-style padding."""
+
+    def _encode(self, text):
+        return [101] + [1000 + sum(map(ord, word)) % 3000 for word in text.lower().split()][:62] + [102]
+
+    def __call__(self, text, return_tensors=None, truncation=True, padding=False):
+        texts = [text] if isinstance(text, str) else text
+        ids = [self._encode(t) for t in texts]
+        encoding = {'input_ids': ids, 'attention_mask': [[1] * len(row) for row in ids]}
+        if return_tensors:
+            return self.pad(encoding, padding=True, return_tensors=return_tensors)
+        return BatchEncoding(encoding)
+
+    def pad(self, encoding, padding=True, return_tensors=None):
+        width = max(len(row) for row in encoding['input_ids'])
+        return BatchEncoding({
+            'input_ids': [row + [0] * (width - len(row)) for row in encoding['input_ids']],
+            'attention_mask': [row + [0] * (width - len(row)) for row in encoding['attention_mask']],
+        }, tensor_type=return_tensors)
+
+
+class FakeModel(torch.nn.Module):
+    """Masked mean of token embeddings -> linear head."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.embed = torch.nn.Embedding(4200, 16)
+        self.head = torch.nn.Linear(16, len(LABELS))
+        self.config = type('Config', (), {'id2label': LABELS})()
+
+    def forward(self, input_ids, attention_mask):
+        mask = attention_mask.unsqueeze(-1).float()
+        pooled = (self.embed(input_ids) * mask).sum(1) / mask.sum(1)
+        return type('Output', (), {'logits': self.head(pooled)})()
+
+
+class FakeKeyBERT:
+    """Longest non-stop-words; a stop-word-only document fails like an empty CountVectorizer vocabulary."""
+
+    def _keywords(self, doc, top_n):
+        words = [w.strip('.,!?').lower() for w in doc.split()]
+        words = sorted({w for w in words if w and w not in STOP_WORDS}, key=lambda w: (-len(w), w))
+        return [(w, 1.0 / (k + 1)) for k, w in enumerate(words[:top_n])]
+
+    def extract_keywords(self, docs, keyphrase_ngram_range=(1, 1), stop_words='english', top_n=5):
+        if isinstance(docs, str):
+            keywords = self._keywords(docs, top_n)
+            if not keywords:
+                raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+            return keywords
+        results = [self._keywords(doc, top_n) for doc in docs]
+        return results[0] if len(results) == 1 else results
@@ -0,0 +1,100 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.linucb_recommender import LinUCBRecommender
+from src.rl.checkpoint import CheckpointManager
+from src.rl.delta_sync import decode_delta
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(4)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _feed(self, manager, n):
+        for i in range(n):
+            emotion = ['sad', 'happy'][i % 2]
+            ctx = manager.recommender.build_context_vector(emotion, 'yoga', self.rng.normal(size=5), {})
+            manager.apply(emotion, 'yoga', ctx, float(self.rng.uniform(-1.5, 1.0)))
+
+    def _restart(self):
+        manager = CheckpointManager(LinUCBRecommender(), self.tmpdir.name)
+        manager.recover()
+        return manager
+
+    def assertSameState(self, a, b):
+        self.assertEqual(a.total_interactions, b.total_interactions)
+        self.assertEqual(set(a.models), set(b.models))
+        for key, model in a.models.items():
+            np.testing.assert_allclose(b.models[key].theta, model.theta)
+            np.testing.assert_allclose(b.models[key].A_inv, model.A_inv)
+
+    def test_log_replay_after_crash(self):
+        manager = CheckpointManager(LinUCBRecommender(), self.tmpdir.name, fsync_every=1)
+        self._feed(manager, 25)
+        # No stop(): simulate a crash with only the write-ahead log on disk
+        self.assertSameState(manager.recommender, self._restart().recommender)
+
+    def test_replay_is_not_exported_as_delta(self):
+        manager = CheckpointManager(LinUCBRecommender(), self.tmpdir.name, fsync_every=1)
+        self._feed(manager, 10)
+        restarted = CheckpointManager(LinUCBRecommender(track_deltas=True), self.tmpdir.name)
+        self.assertEqual(restarted.recover(), 10)
+        self.assertEqual(decode_delta(restarted.recommender.export_delta())['models'], {})
+
+    def test_snapshot_plus_tail(self):
+        manager = CheckpointManager(LinUCBRecommender(), self.tmpdir.name, fsync_every=1)
+        self._feed(manager, 30)
+        manager.checkpoint()
+        self._feed(manager, 7)
+        manager.wal.sync()
+        
+        restarted = self._restart()
+        self.assertSameState(manager.recommender, restarted.recommender)
+        self.assertEqual(len(list(restarted.wal.replay(after_seq=30))), 7)
+
+    def test_torn_tail_is_ignored(self):
+        manager = CheckpointManager(LinUCBRecommender(), self.tmpdir.name, fsync_every=1)
+        self._feed(manager, 5)
+        segment = manager.wal._segment_path
+        manager.wal.close()
+        with open(segment, 'ab') as f:
+            f.write(b'\x10\x00\x00\x00partial')
+        self.assertEqual(self._restart().recommender.total_interactions, 5)
+
+    def test_torn_first_record_of_segment_is_truncated(self):
+        manager = CheckpointManager(LinUCBRecommender(), self.tmpdir.name, fsync_every=1)
+        self._feed(manager, 3)
+        manager.wal.rotate()
+        segment = manager.wal._segment_path
+        manager.wal.close()
+        with open(segment, 'ab') as f:
+            f.write(b'\x10\x00\x00\x00partial')
+
+        restarted = self._restart()
+        self._feed(restarted, 5)
+        restarted.wal.close()
+        self.assertEqual([seq for seq, _, _, _, _ in self._restart().wal.replay()], list(range(1, 9)))
+        self.assertEqual(self._restart().recommender.total_interactions, 8)
+
+    def test_sequence_continues_after_prune(self):
+        manager = CheckpointManager(LinUCBRecommender(), self.tmpdir.name)
+        manager.start()
+        self._feed(manager, 12)
+        manager.stop()
+        
+        restarted = self._restart()
+        self._feed(restarted, 3)
+        self.assertEqual(restarted.wal.last_seq, 15)
+        restarted.wal.sync()
+        self.assertEqual(self._restart().recommender.total_interactions, 15)
+
+if __name__ == '__main__':
+    unittest.main()
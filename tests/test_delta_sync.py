@@ -0,0 +1,115 @@
+import unittest
+import multiprocessing
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.linucb_recommender import LinUCBRecommender
+from src.rl.delta_sync import DeltaError, decode_delta
+
+KEYS = [('sad', 'yoga'), ('happy', 'exercise'), ('stressed', 'meditation')]
+N_NODES = 3
+ROUNDS = 4
+PER_ROUND = 40
+
+
+def _traffic(node, rnd):
+    rng = np.random.default_rng(1000 * rnd + node)
+    for _ in range(PER_ROUND):
+        emotion, category = KEYS[rng.integers(len(KEYS))]
+        yield emotion, category, rng.normal(size=(19, 1)), float(rng.uniform(-1.5, 1.0))
+
+
+def _node(node, lambda_forget, inbox, outbox):
+    recommender = LinUCBRecommender(track_deltas=True, lambda_forget=lambda_forget)
+    for rnd in range(ROUNDS):
+        for event in _traffic(node, rnd):
+            recommender.update(*event)
+        outbox.put((node, recommender.export_delta()))
+        for blob in inbox.get():
+            recommender.merge_delta(blob)
+    outbox.put((node, {key: (m.interaction_count, m.theta.copy(), m.A.copy()) for key, m in recommender.models.items()},
+                recommender.total_interactions, recommender.alpha))
+
+
+def _run_nodes(lambda_forget):
+    """Simulate N nodes that each see a shard of the traffic and sync after every round."""
+    ctx = multiprocessing.get_context('spawn')
+    outbox = ctx.Queue()
+    inboxes = [ctx.Queue() for _ in range(N_NODES)]
+    procs = [ctx.Process(target=_node, args=(i, lambda_forget, inboxes[i], outbox)) for i in range(N_NODES)]
+    for p in procs:
+        p.start()
+    for _ in range(ROUNDS):
+        blobs = dict(outbox.get(timeout=60) for _ in range(N_NODES))
+        for i in range(N_NODES):
+            inboxes[i].put([blob for j, blob in blobs.items() if j != i])
+    results = [outbox.get(timeout=60) for _ in range(N_NODES)]
+    for p in procs:
+        p.join()
+    return [result[1:] for result in sorted(results, key=lambda result: result[0])]
+
+
+class TestDeltaSync(unittest.TestCase):
+    def test_nodes_converge_to_single_node(self):
+        nodes = _run_nodes(lambda_forget=1.0)
+
+        single = LinUCBRecommender(track_deltas=True, lambda_forget=1.0)
+        for rnd in range(ROUNDS):
+            for node in range(N_NODES):
+                for event in _traffic(node, rnd):
+                    single.update(*event)
+
+        for models, total, alpha in nodes:
+            self.assertEqual(total, single.total_interactions)
+            self.assertAlmostEqual(alpha, single.alpha)
+            self.assertEqual(set(models), set(single.models))
+            for key, model in single.models.items():
+                count, theta, A = models[key]
+                self.assertEqual(count, model.interaction_count)
+                np.testing.assert_allclose(A, model.A, atol=1e-9)
+                np.testing.assert_allclose(theta, model.theta, atol=1e-8)
+
+    def test_nodes_agree_with_forgetting(self):
+        nodes = _run_nodes(lambda_forget=0.99)
+        reference = nodes[0][0]
+        for models, _, _ in nodes[1:]:
+            for key, (count, theta, A) in reference.items():
+                self.assertEqual(models[key][0], count)
+                np.testing.assert_allclose(models[key][2], A, rtol=1e-10)
+                np.testing.assert_allclose(models[key][1], theta, atol=1e-8)
+
+    def test_export_resets_and_roundtrips(self):
+        rec = LinUCBRecommender(track_deltas=True, lambda_forget=0.95)
+        X = np.random.default_rng(2).normal(size=(6, 19))
+        rec.update_batch('sad', 'yoga', X[:3], np.array([1.0, 0.5, -1.0]))
+        for x in X[3:]:
+            rec.update('sad', 'yoga', x.reshape(-1, 1), 0.2)
+
+        delta = decode_delta(rec.export_delta())
+        weights = 0.95 ** np.arange(5, -1, -1)
+        self.assertEqual(delta['models']['sad_yoga'].count, 6)
+        np.testing.assert_allclose(delta['models']['sad_yoga'].A, (X.T * weights) @ X)
+        self.assertEqual(decode_delta(rec.export_delta())['models'], {})
+
+    def test_rejects_incompatible_delta(self):
+        rec = LinUCBRecommender(track_deltas=True, lambda_forget=0.9)
+        rec.update('sad', 'yoga', np.ones((19, 1)), 1.0)
+        blob = rec.export_delta()
+        with self.assertRaises(DeltaError):
+            LinUCBRecommender(track_deltas=True, lambda_forget=0.99).merge_delta(blob)
+        with self.assertRaises(DeltaError):
+            LinUCBRecommender(track_deltas=True, lambda_forget=0.9).merge_delta(blob[:-4] + b'\0\0\0\0')
+
+    def test_tracking_is_opt_in(self):
+        rec = LinUCBRecommender()
+        rec.update('sad', 'yoga', np.ones((19, 1)), 1.0)
+        self.assertIsNone(rec.deltas)
+        with self.assertRaises(DeltaError):
+            rec.export_delta()
+
+
+if __name__ == '__main__':
+    unittest.main()
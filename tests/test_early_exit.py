@@ -0,0 +1,101 @@
+import unittest
+import importlib.util
+import tempfile
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+HAVE_NLP = all(importlib.util.find_spec(name) for name in ('torch', 'transformers', 'keybert'))
+
+if HAVE_NLP:
+    import torch
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification
+    from src.ml.early_exit import EarlyExitBackend, ExitHeads
+    from src.ml.inference_backend import TorchBackend
+
+    def tiny_classifier():
+        torch.manual_seed(0)
+        config = DistilBertConfig(vocab_size=4200, dim=32, n_layers=4, n_heads=2, hidden_dim=64, num_labels=6)
+        return DistilBertForSequenceClassification(config).eval()
+
+
+@unittest.skipUnless(HAVE_NLP, "torch / transformers / keybert not installed")
+class TestEarlyExitBackend(unittest.TestCase):
+    def setUp(self):
+        self.model = tiny_classifier()
+        torch.manual_seed(1)
+        self.heads = ExitHeads.for_model(self.model)
+        generator = torch.Generator().manual_seed(2)
+        self.inputs = {'input_ids': torch.randint(1000, 4000, (16, 13), generator=generator)}
+        self.inputs['attention_mask'] = torch.ones_like(self.inputs['input_ids'])
+        self.inputs['attention_mask'][::2, 7:] = 0  # Padded rows
+
+    def hidden_states(self):
+        with torch.no_grad():
+            return self.model(**self.inputs, output_hidden_states=True).hidden_states
+
+    def test_never_exiting_matches_full_model(self):
+        backend = EarlyExitBackend(self.model, self.heads, threshold=1.1)
+        torch.testing.assert_close(backend.logits(self.inputs), TorchBackend(self.model).logits(self.inputs))
+        self.assertEqual(backend.stats()['exits'], {1: 0, 2: 0, 3: 0, 4: 16})
+        self.assertEqual(backend.stats()['avg_layers'], 4.0)
+
+    def test_always_exiting_uses_first_head(self):
+        backend = EarlyExitBackend(self.model, self.heads, threshold=0.0)
+        with torch.no_grad():
+            expected = self.heads(1, self.hidden_states()[1][:, 0])
+        torch.testing.assert_close(backend.logits(self.inputs), expected)
+        self.assertEqual(backend.stats()['exits'][1], 16)
+
+    def test_mixed_exits_match_per_row_heads(self):
+        hidden = self.hidden_states()
+        with torch.no_grad():
+            candidates = [self.heads(layer, hidden[layer][:, 0]) for layer in (1, 2, 3)]
+            candidates.append(TorchBackend(self.model).logits(self.inputs))
+        confidence = torch.stack([torch.softmax(c, -1).max(-1).values for c in candidates[:3]])
+        threshold = float(confidence[0].median())
+
+        backend = EarlyExitBackend(self.model, self.heads, threshold=threshold)
+        logits = backend.logits(self.inputs)
+        exited = torch.full((16,), 3)
+        for layer in (2, 1, 0):
+            exited[confidence[layer] >= threshold] = layer
+        expected = torch.stack([candidates[exited[i]][i] for i in range(16)])
+        torch.testing.assert_close(logits, expected, atol=1e-5, rtol=1e-5)
+        stats = backend.stats()
+        self.assertEqual(sum(stats['exits'].values()), 16)
+        self.assertGreaterEqual(stats['exits'][1], 8)
+        self.assertLess(stats['avg_layers'], 4.0)
+
+    def test_heads_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'heads.pt')
+            self.heads.model_name = 'tiny/distilbert'
+            self.heads.save(path)
+            loaded = ExitHeads.load(path)
+        self.assertEqual((loaded.exit_layers, loaded.model_name), ([1, 2, 3], 'tiny/distilbert'))
+        cls_state = torch.randn(3, 32)
+        torch.testing.assert_close(loaded(2, cls_state), self.heads(2, cls_state))
+
+    def test_detector_batches_through_early_exit(self):
+        from tests.nlp_fakes import FakeKeyBERT, FakeTokenizer
+        from src.ml.emotion_detector import EmotionDetector
+
+        detector = EmotionDetector.from_components(FakeTokenizer(), self.model, FakeKeyBERT(),
+                                                   backend=EarlyExitBackend(self.model, self.heads, threshold=0.25))
+        texts = ["I am so happy today!", "This is so annoying!", "I'm terrified of what might happen",
+                 "Just a quiet evening.", "I feel ready to start my day."]
+        batched = detector.predict_emotion_batch(texts, max_padding=16)
+        for text, result in zip(texts, batched):
+            single = detector.predict_emotion(text)
+            self.assertEqual(result[0], single[0])
+            self.assertAlmostEqual(result[1], single[1], places=5)
+        self.assertEqual(sum(detector.backend.stats()['exits'].values()), 2 * len(texts))
+
+    def test_rejects_mismatched_heads(self):
+        with self.assertRaises(ValueError):
+            EarlyExitBackend(self.model, ExitHeads([1], 32, 4))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import importlib.util
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+HAVE_NLP = all(importlib.util.find_spec(name) for name in ('torch', 'transformers', 'keybert'))
+
+if HAVE_NLP:
+    from src.ml.emotion_detector import EmotionDetector, cache_namespace
+    from src.ml.emotion_cache import EmotionCache
+    from tests.nlp_fakes import FakeKeyBERT, FakeModel, FakeTokenizer
+
+
+@unittest.skipUnless(HAVE_NLP, "torch / transformers / keybert not installed")
+class TestPredictEmotionBatch(unittest.TestCase):
+    def setUp(self):
+        self.detector = EmotionDetector.from_components(FakeTokenizer(), FakeModel(), FakeKeyBERT())
+        self.texts = [
+            "I am so happy today!",
+            "I'm overwhelmed with my academic exams and the deadline is tomorrow",
+            "Just a quiet evening.",
+            "",
+            "I'm terrified of what might happen next week at the hospital",
+            "so the and it",
+            "I feel ready to start my day.",
+            None,
+            "This is so annoying!",
+        ]
+
+    def test_matches_single_text_path(self):
+        for batch_size in (1, 2, 32):
+            batched = self.detector.predict_emotion_batch(self.texts, batch_size=batch_size)
+            self.assertEqual(len(batched), len(self.texts))
+            for text, (emotion, confidence, keywords) in zip(self.texts, batched):
+                single = self.detector.predict_emotion(text)
+                self.assertEqual(emotion, single[0])
+                self.assertEqual(keywords, single[2])
+                self.assertAlmostEqual(confidence, single[1], places=6)
+
+    def test_padded_buckets_agree(self):
+        padded = self.detector.predict_emotion_batch(self.texts, max_padding=64)
+        exact = self.detector.predict_emotion_batch(self.texts)
+        for a, b in zip(padded, exact):
+            self.assertEqual(a[0], b[0])
+            self.assertAlmostEqual(a[1], b[1], places=5)
+
+    def test_single_document_batch(self):
+        self.assertEqual(self.detector.predict_emotion_batch(["I am so happy today!"]),
+                         [self.detector.predict_emotion("I am so happy today!")])
+        self.assertEqual(self.detector.predict_emotion_batch([]), [])
+
+@unittest.skipUnless(HAVE_NLP, "torch / transformers / keybert not installed")
+class TestCachedEmotionDetector(unittest.TestCase):
+    def setUp(self):
+        detector = EmotionDetector.from_components(FakeTokenizer(), FakeModel(), FakeKeyBERT(), cache=EmotionCache())
+        self.forwards = []
+        detector.model.register_forward_hook(lambda module, args, output: self.forwards.append(1))
+        self.detector = detector
+
+    def test_repeated_mood_skips_inference(self):
+        first = self.detector.predict_emotion("I feel stressed about the deadline")
+        self.assertEqual(self.detector.predict_emotion("i feel stressed about the deadline!"), first)
+        self.assertEqual(len(self.forwards), 1)
+        self.assertEqual(self.detector.cache.stats()['hits'], 1)
+
+    def test_batch_reads_and_fills_the_cache(self):
+        self.detector.predict_emotion("I am so happy today!")
+        texts = ["I am so happy today", "This is so annoying!", "this is so annoying", None]
+        results = self.detector.predict_emotion_batch(texts)
+        self.assertEqual(len(self.forwards), 2)  # One single-text call, one bucket for the shared new key
+        self.assertEqual(results[1], results[2])
+        self.assertEqual(results[3], ('calm', 0.0, []))
+        self.assertEqual(self.detector.predict_emotion("THIS is so annoying"), results[1])
+        self.assertEqual(len(self.forwards), 2)
+
+    def test_failures_are_not_cached(self):
+        self.assertEqual(self.detector.predict_emotion("so the and it"), ('calm', 0.5, []))
+        self.assertEqual(len(self.detector.cache), 0)
+        self.assertEqual(self.detector.predict_emotion_batch(["so the and it"]), [('calm', 0.5, [])])
+        self.assertEqual(len(self.detector.cache), 0)
+
+    def test_namespace_covers_every_prediction_setting(self):
+        configs = [{}, {'backend': 'onnx'}, {'backend': 'early_exit'},
+                   {'backend': 'early_exit', 'exit_threshold': 0.8}, {'cascade': True},
+                   {'model_name': 'other/model'}, {'classifier': 'shared'}]
+        self.assertEqual(len({cache_namespace(**config) for config in configs}), len(configs))
+        self.assertEqual(cache_namespace(exit_threshold=0.8), cache_namespace())  # Unused off early_exit
+
+@unittest.skipUnless(HAVE_NLP, "torch / transformers / keybert not installed")
+class TestRuleFirstCascade(unittest.TestCase):
+    def setUp(self):
+        detector = EmotionDetector.from_components(FakeTokenizer(), FakeModel(), FakeKeyBERT(), cascade=True)
+        self.rows = []
+        detector.model.register_forward_hook(
+            lambda module, args, kwargs, output: self.rows.append(len(kwargs['input_ids'])), with_kwargs=True)
+        self.detector = detector
+
+    def test_rule_decided_text_skips_the_model(self):
+        self.assertEqual(self.detector.predict_emotion("Just a normal day, nothing special"),
+                         ('calm', 0.80, ['nothing', 'special', 'normal']))
+        self.assertEqual(self.detector.predict_emotion("Overwhelmed by coursework")[:2], ('stressed', 0.75))
+        self.assertEqual(self.rows, [])
+        self.detector.predict_emotion("I am so happy today!")
+        self.assertEqual(self.rows, [1])
+        self.assertEqual(self.detector.cascade_stats(),
+                         {'rule_decisions': 2, 'model_decisions': 1, 'rule_fraction': 2 / 3})
+
+    def test_batch_matches_single_text_path(self):
+        texts = ["Overwhelmed by coursework", "I am so happy today!", "Just a normal day", "so the and it",
+                 "This is so annoying!", None]
+        batched = self.detector.predict_emotion_batch(texts)
+        self.assertEqual(sum(self.rows), 4)  # Three ambiguous rows plus the stop-word row's single-text retry
+        self.assertEqual(batched, [self.detector.predict_emotion(text) for text in texts])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import queue
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.api.emotion_batcher import EmotionMicroBatcher, _Histogram
+from src.ml.emotion_cache import EmotionCache
+
+class FakeDetector:
+    """Records each batch; the 'emotion' is the text itself so results can be matched to callers."""
+
+    def __init__(self, delay=0.0, fail=False, cache=None):
+        self.delay = delay
+        self.fail = fail
+        self.cache = cache
+        self.batches = []
+
+    def predict_emotion_batch(self, texts, batch_size=32, max_padding=0, check_cache=True):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        results = [(text, 0.5, [text]) for text in texts]
+        if self.cache is not None:
+            for text, result in zip(texts, results):
+                self.cache.put(text, result)
+        return results
+
+class TestEmotionMicroBatcher(unittest.TestCase):
+    def test_concurrent_requests_share_a_batch(self):
+        detector = FakeDetector(delay=0.01)
+        batcher = EmotionMicroBatcher(detector, max_batch=64, max_wait_ms=50)
+        batcher.start()
+        results = {}
+
+        def call(k):
+            results[k] = batcher.predict_emotion(f'text {k}', timeout=5)
+
+        threads = [threading.Thread(target=call, args=(k,)) for k in range(40)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        batcher.stop()
+
+        self.assertEqual(results, {k: (f'text {k}', 0.5, [f'text {k}']) for k in range(40)})
+        self.assertLess(len(detector.batches), 10)
+        metrics = batcher.metrics()
+        self.assertEqual(metrics['completed'], 40)
+        self.assertEqual(metrics['batch_size']['count'], metrics['batches'])
+        self.assertEqual(sum(metrics['queue_wait_ms']['buckets'].values()), 40)
+
+    def test_max_batch_bounds_every_batch(self):
+        detector = FakeDetector()
+        batcher = EmotionMicroBatcher(detector, max_batch=4, max_wait_ms=1000)
+        futures = [batcher.submit(str(k)) for k in range(10)]
+        batcher.flush()
+        self.assertEqual([len(b) for b in detector.batches], [4, 4, 2])
+        self.assertEqual([f.result()[0] for f in futures], [str(k) for k in range(10)])
+
+    def test_lone_request_waits_at_most_max_wait(self):
+        batcher = EmotionMicroBatcher(FakeDetector(), max_batch=32, max_wait_ms=20)
+        batcher.start()
+        start = time.monotonic()
+        self.assertEqual(batcher.predict_emotion('alone', timeout=5)[0], 'alone')
+        elapsed = time.monotonic() - start
+        batcher.stop()
+        self.assertLess(elapsed, 0.5)
+        self.assertGreaterEqual(batcher.metrics()['queue_wait_ms']['max'], 15)
+
+    def test_failures_reach_every_caller(self):
+        batcher = EmotionMicroBatcher(FakeDetector(fail=True), max_wait_ms=0)
+        futures = [batcher.submit('a'), batcher.submit('b')]
+        batcher.flush()
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result()
+        self.assertEqual(batcher.metrics()['failed'], 2)
+
+    def test_cancelled_and_rejected_requests(self):
+        detector = FakeDetector()
+        batcher = EmotionMicroBatcher(detector, maxsize=2)
+        kept, cancelled = batcher.submit('kept'), batcher.submit('cancelled')
+        with self.assertRaises(queue.Full):
+            batcher.submit('overflow')
+        cancelled.cancel()
+        batcher.stop(drain=True)
+        self.assertEqual(detector.batches, [['kept']])
+        self.assertEqual(kept.result()[0], 'kept')
+        self.assertEqual(batcher.metrics()['rejected'], 1)
+
+    def test_cache_hits_skip_the_queue(self):
+        detector = FakeDetector(cache=EmotionCache())
+        batcher = EmotionMicroBatcher(detector)
+        first = batcher.submit('I feel calm')
+        batcher.flush()
+        repeat = batcher.submit('i feel calm.')
+        self.assertTrue(repeat.done())
+        self.assertEqual(repeat.result(), first.result())
+        self.assertEqual(len(detector.batches), 1)
+        metrics = batcher.metrics()
+        self.assertEqual((metrics['cache_hits'], metrics['batches']), (1, 1))
+        self.assertEqual(detector.cache.stats()['misses'], 1)
+
+    def test_histogram_buckets(self):
+        hist = _Histogram((1, 4, 16))
+        for value in (0.5, 1, 3, 16, 100):
+            hist.add(value)
+        summary = hist.summary()
+        self.assertEqual(summary['buckets'], {'<=1': 2, '<=4': 1, '<=16': 1, '>16': 1})
+        self.assertEqual(summary['count'], 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ml.emotion_cache import ENTRY_OVERHEAD, EmotionCache, normalize_text
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestEmotionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'emotion_cache.sqlite')
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_normalization(self):
+        self.assertEqual(normalize_text("I feel stressed"), normalize_text("  i FEEL stressed!! "))
+        self.assertEqual(normalize_text("Ｉ feel\tstressed..."), "i feel stressed")
+        self.assertNotEqual(normalize_text("I feel 😢"), normalize_text("I feel 😊"))
+        self.assertNotEqual(normalize_text("I feel stressed"), normalize_text("I feel stressed out"))
+
+    def test_hit_on_equivalent_text(self):
+        cache = EmotionCache()
+        self.assertIsNone(cache.get("I feel stressed"))
+        cache.put("I feel stressed", ('stressed', 0.9, ['stressed']))
+        self.assertEqual(cache.get("i feel stressed!"), ('stressed', 0.9, ['stressed']))
+        cache.get("i feel stressed!")[2].append('mutated')
+        self.assertEqual(cache.get("I FEEL STRESSED")[2], ['stressed'])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['puts']), (3, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 0.75)
+
+    def test_entry_and_byte_bounds_evict_lru(self):
+        cache = EmotionCache(max_entries=3)
+        for k in range(4):
+            cache.put(f'text {k}', ('calm', 0.5, []))
+        cache.get('text 1')
+        cache.put('text 4', ('calm', 0.5, []))
+        self.assertIsNone(cache.get('text 0'))
+        self.assertIsNone(cache.get('text 2'))
+        self.assertIsNotNone(cache.get('text 1'))
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+        small = EmotionCache(max_entries=100, max_bytes=3 * (ENTRY_OVERHEAD + 20))
+        for k in range(10):
+            small.put(f'text {k}', ('calm', 0.5, ['kw']))
+        self.assertEqual(len(small), 3)
+        self.assertLessEqual(small.nbytes, small.max_bytes)
+
+    def test_ttl_expiry(self):
+        cache = EmotionCache(ttl=60, clock=self.clock)
+        cache.put('tired', ('tired', 0.8, ['tired']))
+        self.clock.now += 59
+        self.assertIsNotNone(cache.get('tired'))
+        self.clock.now += 2
+        self.assertIsNone(cache.get('tired'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_persistent_cache_survives_restart(self):
+        cache = EmotionCache(max_entries=2, ttl=60, path=self.path, clock=self.clock)
+        for k in range(3):
+            cache.put(f'mood {k}', ('happy', 0.7, [f'mood{k}']))
+        self.assertEqual(cache.get('mood 0'), ('happy', 0.7, ['mood0']))  # Evicted from memory, served from disk
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+        cache.close()
+
+        warm = EmotionCache(max_entries=2, ttl=60, path=self.path, clock=self.clock)
+        self.assertEqual(len(warm), 2)
+        self.assertEqual(warm.get('MOOD 2'), ('happy', 0.7, ['mood2']))
+        self.assertEqual(warm.stats()['hits'], 1)
+        self.assertIsNone(EmotionCache(path=self.path, namespace='other-model', clock=self.clock).get('mood 2'))
+        warm.close()
+
+        self.clock.now += 61
+        expired = EmotionCache(ttl=60, path=self.path, clock=self.clock)
+        self.assertEqual(len(expired), 0)
+        self.assertIsNone(expired.get('mood 2'))
+        expired.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import importlib.util
+import tempfile
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ml.emotion_head import EmotionHead
+
+HAVE_NLP = all(importlib.util.find_spec(name) for name in ('torch', 'transformers', 'keybert'))
+
+LABELS = ['sadness', 'joy', 'love', 'anger', 'fear', 'surprise']
+CUES = {0: 'lonely', 1: 'happy', 2: 'adore', 3: 'furious', 4: 'terrified', 5: 'surprised'}
+
+class FakeEncoder:
+    """Bag-of-words hashed into 64 dims and L2-normalized, counting calls like a sentence encoder would."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, docs):
+        self.calls.append(list(docs))
+        out = np.zeros((len(docs), 64), dtype=np.float32)
+        for i, doc in enumerate(docs):
+            for word in doc.lower().strip('.!?').split():
+                out[i, sum(map(ord, word)) % 64] += 1.0
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-9)
+
+class FakeKeyBERT:
+    def __init__(self):
+        self.model = FakeEncoder()
+        self.doc_embeddings = []
+
+    def extract_keywords(self, docs, keyphrase_ngram_range=(1, 1), stop_words='english', top_n=5, doc_embeddings=None):
+        if doc_embeddings is None:
+            doc_embeddings = self.model.embed(docs)
+        self.doc_embeddings.append(doc_embeddings)
+        results = [[(w, 1.0) for w in doc.lower().strip('.!?').split() if len(w) > 4][:top_n] for doc in docs]
+        return results[0] if len(results) == 1 else results
+
+def training_data(rng, n=600):
+    texts, targets = [], []
+    filler = ['i', 'feel', 'so', 'today', 'really', 'am', 'very']
+    for _ in range(n):
+        label = int(rng.integers(len(LABELS)))
+        words = list(rng.choice(filler, size=3)) + [CUES[label]]
+        rng.shuffle(words)
+        texts.append(' '.join(words))
+        targets.append(label)
+    return texts, np.array(targets)
+
+class TestEmotionHead(unittest.TestCase):
+    def test_fit_save_load_roundtrip(self):
+        rng = np.random.default_rng(0)
+        texts, targets = training_data(rng)
+        X = FakeEncoder().embed(texts)
+        head = EmotionHead.fit(X, targets, LABELS, encoder='fake-encoder', C=10.0)
+        self.assertGreater(np.mean(head.predict_proba(X).argmax(1) == targets), 0.95)
+        np.testing.assert_allclose(head.predict_proba(X).sum(1), 1.0, rtol=1e-5)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'head.npz')
+            head.save(path)
+            loaded = EmotionHead.load(path)
+        self.assertEqual((loaded.labels, loaded.encoder, loaded.dim), (LABELS, 'fake-encoder', 64))
+        np.testing.assert_array_equal(loaded.logits(X), head.logits(X))
+
+    def test_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            EmotionHead(np.zeros((6, 8)), np.zeros(5), LABELS)
+
+@unittest.skipUnless(HAVE_NLP, "torch / transformers / keybert not installed")
+class TestSharedEncoderDetector(unittest.TestCase):
+    def setUp(self):
+        from src.ml.emotion_detector import EmotionDetector
+
+        rng = np.random.default_rng(1)
+        texts, targets = training_data(rng)
+        keybert = FakeKeyBERT()
+        head = EmotionHead.fit(keybert.model.embed(texts), targets, LABELS, C=10.0)
+        keybert.model.calls.clear()
+        self.detector = EmotionDetector.from_components(keybert_model=keybert, head=head)
+
+    def test_one_encoder_pass_feeds_head_and_keywords(self):
+        texts = ["I feel so furious today", "really terrified", "I am lonely tonight"]
+        results = self.detector.predict_emotion_batch(texts)
+        self.assertEqual(len(self.detector.keybert_model.model.calls), 1)
+        self.assertEqual(len(self.detector.keybert_model.doc_embeddings), 1)
+        self.assertEqual([r[0] for r in results], ['angry', 'anxious', 'tired'])
+        self.assertEqual(results[0][2], ['furious', 'today'])
+
+    def test_single_path_matches_batch(self):
+        single = self.detector.predict_emotion("I feel happy!")
+        self.assertEqual(single, self.detector.predict_emotion_batch(["I feel happy!"])[0])
+        self.assertEqual(single[0], 'happy')
+
+    def test_shared_mode_rejects_onnx(self):
+        from src.ml.emotion_detector import EmotionDetector
+        with self.assertRaises(ValueError):
+            EmotionDetector(classifier='shared', backend='onnx')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -85,3 +85,23 @@ class TestEmotionValidator:
         emotion, conf = validator.validate("", "calm", 0.5, [])
         assert emotion == "calm"
 
+    def test_decide_neutral_without_model(self, validator):
+        """Cascade: neutral phrases settle 'calm' whatever the model would predict"""
+        text = "Just a normal day, nothing special"
+        assert validator.decide(text) == ("calm", 0.80)
+        for predicted in ["happy", "sad", "angry", "anxious", "tired", "motivated", "calm"]:
+            for confidence in [0.3, 0.7, 0.95]:
+                assert validator.validate(text, predicted, confidence, [])[0] == "calm"
+
+    def test_decide_unambiguous_stress(self, validator):
+        """Cascade: stress words with no competing cue settle 'stressed'"""
+        assert validator.decide("I feel overwhelmed with finals") == ("stressed", 0.75)
+        assert validator.decide("So much coursework, I'm exhausted") == ("stressed", 0.75)
+
+    def test_decide_defers_ambiguous_text(self, validator):
+        """Cascade: mixed or missing cues go to the model"""
+        assert validator.decide("I am so happy today!") is None
+        assert validator.decide("Worried and stressed about my exam") is None
+        assert validator.decide("Exam went great but I'm tired") is None
+        assert validator.decide("Stressed, but it's fine") is None
+        assert validator.decide("") is None
@@ -0,0 +1,61 @@
+import unittest
+import queue
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.api.feedback_queue import FeedbackQueue
+from src.rl.linucb_recommender import LinUCBRecommender
+
+class TestFeedbackQueue(unittest.TestCase):
+    def test_batched_ingestion_matches_sequential_updates(self):
+        sequential = LinUCBRecommender()
+        batched = LinUCBRecommender()
+        ingest = FeedbackQueue(batched.update_batch, max_batch=16)
+        ingest.start()
+        
+        rng = np.random.default_rng(5)
+        for i in range(150):
+            emotion = ['sad', 'happy', 'tired'][i % 3]
+            ctx = sequential.build_context_vector(emotion, 'yoga', rng.normal(size=5), {})
+            reward = float(rng.uniform(-1.5, 1.0))
+            sequential.update(emotion, 'yoga', ctx, reward)
+            self.assertGreaterEqual(ingest.submit(emotion, 'yoga', ctx, reward), 1)
+        ingest.stop(drain=True)
+        
+        self.assertEqual(batched.total_interactions, 150)
+        self.assertAlmostEqual(batched.alpha, sequential.alpha)
+        for key, model in sequential.models.items():
+            np.testing.assert_allclose(batched.models[key].theta, model.theta, atol=1e-10)
+            np.testing.assert_allclose(batched.models[key].A_inv, model.A_inv, atol=1e-10)
+        
+        metrics = ingest.metrics()
+        self.assertEqual(metrics['applied'], 150)
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertLessEqual(metrics['batch_size']['max'], 16)
+
+    def test_full_queue_rejects(self):
+        ingest = FeedbackQueue(lambda *args: None, maxsize=2)
+        ingest.submit('sad', 'yoga', np.zeros(19), 1.0)
+        ingest.submit('sad', 'yoga', np.zeros(19), 1.0)
+        with self.assertRaises(queue.Full):
+            ingest.submit('sad', 'yoga', np.zeros(19), 1.0)
+        self.assertEqual(ingest.metrics()['rejected'], 1)
+
+    def test_failed_groups_are_not_counted_as_applied(self):
+        def apply_batch(emotion, category, contexts, rewards):
+            if emotion == 'sad':
+                raise RuntimeError("disk full")
+
+        ingest = FeedbackQueue(apply_batch)
+        for emotion in ['sad', 'happy', 'sad', 'tired']:
+            ingest.submit(emotion, 'yoga', np.zeros(19), 1.0)
+        ingest.flush()
+        metrics = ingest.metrics()
+        self.assertEqual((metrics['applied'], metrics['failed']), (2, 2))
+        self.assertEqual(metrics['batch_size']['count'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import importlib.util
+import tempfile
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+HAVE_ONNX = all(importlib.util.find_spec(name) for name in ('torch', 'transformers', 'keybert', 'onnx', 'onnxruntime'))
+
+if HAVE_ONNX:
+    import torch
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification
+    from src.ml.emotion_detector import EmotionDetector
+    from src.ml.inference_backend import TorchBackend, load_onnx_backend
+
+    def tiny_classifier():
+        torch.manual_seed(0)
+        config = DistilBertConfig(vocab_size=4200, dim=32, n_layers=2, n_heads=2, hidden_dim=64, num_labels=6)
+        model = DistilBertForSequenceClassification(config).eval()
+        with torch.no_grad():
+            model.classifier.weight.mul_(20.0)  # Confident, well-separated logits like a trained head
+        return model
+
+
+@unittest.skipUnless(HAVE_ONNX, "torch / transformers / keybert / onnx / onnxruntime not installed")
+class TestOnnxBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.model = tiny_classifier()
+        generator = torch.Generator().manual_seed(1)
+        self.inputs = {'input_ids': torch.randint(1000, 4000, (64, 17), generator=generator)}
+        self.inputs['attention_mask'] = torch.ones_like(self.inputs['input_ids'])
+        self.inputs['attention_mask'][::2, 11:] = 0  # Padded rows
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fp32_export_matches_pytorch(self):
+        backend = load_onnx_backend(self.model, 'tiny/distilbert', self.tmpdir.name, quantize=False)
+        expected = TorchBackend(self.model).logits(self.inputs)
+        torch.testing.assert_close(backend.logits(self.inputs), expected, atol=1e-4, rtol=1e-4)
+
+    def test_int8_agrees_on_labels_and_is_reused(self):
+        backend = load_onnx_backend(self.model, 'tiny/distilbert', self.tmpdir.name)
+        self.assertTrue(backend.path.endswith('.int8.onnx'))
+        fp32_path = backend.path.replace('.int8.onnx', '.onnx')
+        self.assertLess(os.path.getsize(backend.path), os.path.getsize(fp32_path))
+
+        expected = TorchBackend(self.model).logits(self.inputs).argmax(-1)
+        agreement = (backend.logits(self.inputs).argmax(-1) == expected).float().mean().item()
+        self.assertGreaterEqual(agreement, 0.95)
+
+        mtime = os.path.getmtime(backend.path)
+        again = load_onnx_backend(self.model, 'tiny/distilbert', self.tmpdir.name)
+        self.assertEqual(os.path.getmtime(again.path), mtime)
+
+    def test_detector_falls_back_to_pytorch(self):
+        class Broken:
+            name = 'onnx'
+
+            def logits(self, inputs):
+                raise RuntimeError("session crashed")
+
+        detector = EmotionDetector.from_components(model=self.model, backend=Broken())
+        torch.testing.assert_close(detector._logits(self.inputs), TorchBackend(self.model).logits(self.inputs))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            EmotionDetector(backend='tensorrt')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import importlib.util
+import tempfile
+import zlib
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ml.keyword_index import KeywordIndex
+
+HAVE_KEYBERT = importlib.util.find_spec('keybert') is not None
+
+class FakeEncoder:
+    """Sum of deterministic random word vectors (no ties), recording every embed call."""
+
+    def __init__(self, dim=32):
+        self.dim = dim
+        self.calls = []
+
+    def _word(self, word):
+        return np.random.default_rng(zlib.crc32(word.encode())).standard_normal(self.dim)
+
+    def embed(self, docs, verbose=False):
+        self.calls.append(list(docs))
+        return np.array([sum(self._word(w) for w in doc.lower().split()) for doc in docs], dtype=np.float32)
+
+def brute_force(encoder, doc, words, top_n):
+    doc_vec = encoder.embed([doc])[0]
+    doc_vec /= np.linalg.norm(doc_vec)
+    scored = []
+    for word in words:
+        vec = encoder.embed([word])[0]
+        scored.append((word, round(float(doc_vec @ vec / np.linalg.norm(vec)), 4)))
+    return sorted(scored, key=lambda item: -item[1])[:top_n]
+
+class TestKeywordIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'keyword_index')
+        self.encoder = FakeEncoder()
+        self.index = KeywordIndex.build(self.encoder, ['stressed', 'exam', 'tired', 'lonely', 'happy'], self.path)
+        self.encoder.calls.clear()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_index_is_memory_mapped(self):
+        self.assertIsInstance(self.index.matrix, np.memmap)
+        self.assertEqual(self.index.matrix.shape, (5, 32))
+        np.testing.assert_allclose(np.linalg.norm(self.index.matrix, axis=1), 1.0, rtol=1e-5)
+
+    def test_matches_brute_force_ranking(self):
+        doc = "So stressed about the exam and tired of studying"
+        keywords = self.index.extract_keywords(doc, top_n=3)
+        self.assertEqual(keywords, brute_force(FakeEncoder(), doc, ['stressed', 'exam', 'tired', 'studying'], 3))
+
+    def test_indexed_words_need_only_the_document_embedding(self):
+        self.index.extract_keywords("I am tired and lonely", top_n=3)
+        self.assertEqual(self.encoder.calls, [["I am tired and lonely"]])
+
+    def test_oov_words_are_embedded_once_and_cached(self):
+        self.index.extract_keywords(["feeling anxious", "so anxious today"], top_n=3)
+        self.assertEqual(self.encoder.calls[1], ['feeling', 'anxious', 'today'])
+        self.encoder.calls.clear()
+        self.index.extract_keywords("anxious and tired", top_n=3)
+        self.assertEqual(self.encoder.calls, [["anxious and tired"]])
+        stats = self.index.stats()
+        self.assertEqual((stats['cached_oov_words'], stats['oov_embedded'], stats['oov_hits']), (3, 3, 1))
+
+    def test_flush_persists_oov_words(self):
+        self.index.extract_keywords("feeling anxious", top_n=3)
+        self.index.flush()
+        reloaded = KeywordIndex(FakeEncoder(), self.path)
+        self.assertEqual(len(reloaded.words), 7)
+        self.assertEqual(reloaded.extract_keywords("feeling anxious", top_n=3),
+                         self.index.extract_keywords("feeling anxious", top_n=3))
+        self.assertEqual(len(reloaded.model.calls), 1)  # the document embedding only
+
+    def test_missing_index_starts_empty(self):
+        index = KeywordIndex(FakeEncoder(), os.path.join(self.tmpdir.name, 'new_index'))
+        self.assertEqual({w for w, _ in index.extract_keywords("really happy", top_n=2)}, {'really', 'happy'})
+        index.flush()
+        self.assertEqual(len(KeywordIndex(FakeEncoder(), index.path)), 2)
+
+    def test_empty_index_round_trip(self):
+        path = os.path.join(self.tmpdir.name, 'empty_index')
+        index = KeywordIndex.build(FakeEncoder(), [], path)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(len(KeywordIndex(FakeEncoder(), path)), 0)
+        index.extract_keywords("really happy", top_n=2)
+        index.flush()
+        self.assertEqual(KeywordIndex(FakeEncoder(), path).words, ['really', 'happy'])
+
+    def test_interrupted_commit_is_completed_on_open(self):
+        self.index.extract_keywords("feeling anxious", top_n=3)
+        self.index.flush()
+        words = self.index.words
+        # Crash after the matrix rename but before the vocabulary rename
+        os.replace(self.path + '.vocab.txt', self.path + '.vocab.tmp')
+        with open(self.path + '.vocab.txt', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(words[:5]))
+        reloaded = KeywordIndex(FakeEncoder(), self.path)
+        self.assertEqual(reloaded.words, words)
+        self.assertFalse(os.path.exists(self.path + '.vocab.tmp'))
+
+    def test_keybert_return_conventions(self):
+        self.assertEqual(self.index.extract_keywords("the and of"), [])
+        self.assertEqual(self.index.extract_keywords(""), [])
+        batch = self.index.extract_keywords(["happy", "the"], top_n=2)
+        self.assertEqual(batch[1], [])
+        self.assertEqual(batch[0][0][0], 'happy')
+        with self.assertRaises(ValueError):
+            self.index.extract_keywords("happy exam", keyphrase_ngram_range=(1, 2))
+
+    @unittest.skipUnless(HAVE_KEYBERT, "keybert not installed")
+    def test_parity_with_keybert(self):
+        from keybert import KeyBERT
+        from keybert.backend import BaseEmbedder
+
+        class Backend(BaseEmbedder):
+            def embed(self, documents, verbose=False):
+                return FakeEncoder().embed(documents)
+
+        keybert = KeyBERT(model=Backend())
+        docs = ["Overwhelmed with exams and deadlines this week", "I feel lonely and tired tonight"]
+        for doc in docs:
+            self.assertEqual(self.index.extract_keywords(doc, top_n=3),
+                             keybert.extract_keywords(doc, keyphrase_ngram_range=(1, 1), stop_words='english', top_n=3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import threading
+from unittest import mock
 import numpy as np
 import sys
 import os
@@ -64,5 +66,122 @@ class TestLinUCB(unittest.TestCase):
         expected_theta = np.array([[0.5], [0.]])
         self.assertTrue(np.array_equal(model.theta, expected_theta))
 
+    def test_cached_inverse_tracks_exact_solve(self):
+        rec = LinUCBRecommender(context_dim=5, refactor_interval=7)
+        rng = np.random.default_rng(0)
+        for _ in range(60):
+            ctx = rng.normal(size=(5, 1))
+            rec.update('e', 'c', ctx, float(rng.uniform(-1.5, 1.0)))
+        
+        model = rec.get_or_create_model('e', 'c')
+        np.testing.assert_allclose(model.A_inv, np.linalg.inv(model.A), atol=1e-8)
+        np.testing.assert_allclose(model.theta, np.linalg.solve(model.A, model.b), atol=1e-8)
+        
+        x = rng.normal(size=(5, 1))
+        score, unc = rec.get_ucb_score('e', 'c', x)
+        expected_unc = rec.alpha * np.sqrt((x.T @ np.linalg.inv(model.A) @ x).item())
+        self.assertAlmostEqual(unc, expected_unc, places=8)
+
+    def test_failed_solve_resets_covariance_only(self):
+        rec = LinUCBRecommender(context_dim=5, refactor_interval=1, lambda_forget=1.0)
+        rng = np.random.default_rng(3)
+        contexts = [rng.normal(size=(5, 1)) for _ in range(4)]
+        for ctx in contexts[:3]:
+            rec.update('e', 'c', ctx, 1.0)
+        
+        with mock.patch.object(rec, '_refactor', side_effect=np.linalg.LinAlgError):
+            rec.update('e', 'c', contexts[3], 1.0)
+        
+        # As before the cached inverse: A back to I and theta to 0, while b and the count survive
+        model = rec.get_or_create_model('e', 'c')
+        np.testing.assert_array_equal(model.A, np.identity(5))
+        np.testing.assert_array_equal(model.A_inv, np.identity(5))
+        np.testing.assert_array_equal(model.theta, np.zeros((5, 1)))
+        np.testing.assert_allclose(model.b, sum(contexts))
+        self.assertEqual(model.interaction_count, 4)
+
+    def test_score_batch_matches_single_scoring(self):
+        rec = LinUCBRecommender(context_dim=19)
+        rng = np.random.default_rng(1)
+        for _ in range(20):
+            ctx = rec.build_context_vector('sad', 'yoga', rng.normal(size=5), {'avg_feedback': 0.3})
+            rec.update('sad', 'yoga', ctx, float(rng.uniform(-1.5, 1.0)))
+        
+        X = np.vstack([
+            rec.build_context_vector('sad', 'yoga', rng.normal(size=5), {}).ravel() for _ in range(8)
+        ])
+        means, uncertainties, ucb = rec.score_batch('sad', 'yoga', X)
+        for i in range(len(X)):
+            score, unc = rec.get_ucb_score('sad', 'yoga', X[i].reshape(-1, 1))
+            self.assertAlmostEqual(ucb[i], score, places=10)
+            self.assertAlmostEqual(uncertainties[i], unc, places=10)
+        np.testing.assert_allclose(ucb, means + uncertainties)
+
+    def test_structured_scoring_matches_full_scoring(self):
+        rec = LinUCBRecommender(context_dim=19)
+        rng = np.random.default_rng(5)
+        for emotion, category in (('sad', 'yoga'), ('angry', 'unknown')):
+            for _ in range(30):
+                ctx = rec.build_context_vector(emotion, category, rng.normal(size=5), {'avg_feedback': rng.uniform(-1, 1)})
+                rec.update(emotion, category, ctx, float(rng.uniform(-1.5, 1.0)))
+            
+            X = rec.build_context_matrix(emotion, category, rng.normal(size=(50, 5)), {'success_rate': 0.7})
+            means, uncertainties, ucb = rec.score_structured(emotion, category, X[:, 11:])
+            for i in range(len(X)):
+                score, unc = rec.get_ucb_score(emotion, category, X[i].reshape(-1, 1))
+                self.assertAlmostEqual(ucb[i], score, places=10)
+                self.assertAlmostEqual(uncertainties[i], unc, places=10)
+            np.testing.assert_allclose(means, rec.score_batch(emotion, category, X)[0], atol=1e-12)
+
+    def test_context_matrix_rows_match_single_vectors(self):
+        rec = LinUCBRecommender(context_dim=19)
+        feats = np.arange(15, dtype=float).reshape(3, 5)
+        user_ctx = {'avg_feedback': 0.5, 'interaction_count': 250, 'success_rate': 0.4}
+        
+        X = rec.build_context_matrix('angry', 'meditation', feats, user_ctx)
+        self.assertEqual(X.shape, (3, 19))
+        for i in range(3):
+            ctx = rec.build_context_vector('angry', 'meditation', list(feats[i]), user_ctx)
+            self.assertTrue(np.array_equal(X[i], ctx.ravel()))
+        
+        # Unknown emotion falls back to calm, interaction count is capped at 1.0
+        self.assertEqual(X[0, 6], 1.0)
+        self.assertEqual(X[0, 17], 1.0)
+
+    def test_concurrent_scoring_during_updates(self):
+        rec = LinUCBRecommender()
+        reference = LinUCBRecommender()
+        rng = np.random.default_rng(6)
+        contexts = [rec.build_context_vector('anxious', 'yoga', rng.normal(size=5), {}) for _ in range(300)]
+        rewards = rng.uniform(-1.5, 1.0, size=300)
+        X = np.hstack(contexts[:32]).T
+        errors = []
+        stop = threading.Event()
+        
+        def score():
+            try:
+                while not stop.is_set():
+                    means, unc, ucb = rec.score_batch('anxious', 'yoga', X)
+                    self.assertTrue(np.all(np.isfinite(ucb)))
+            except Exception as e:
+                errors.append(e)
+        
+        readers = [threading.Thread(target=score) for _ in range(4)]
+        for t in readers:
+            t.start()
+        for ctx, reward in zip(contexts, rewards):
+            rec.update('anxious', 'yoga', ctx, reward)
+            reference.update('anxious', 'yoga', ctx, reward)
+        stop.set()
+        for t in readers:
+            t.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(rec.total_interactions, 300)
+        np.testing.assert_allclose(rec.score_batch('anxious', 'yoga', X)[2], reference.score_batch('anxious', 'yoga', X)[2])
+        
+        snap = rec.registry.snapshot(rec.get_or_create_model('anxious', 'yoga').slot)
+        self.assertFalse(snap.A_inv.flags.writeable)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.linucb_recommender import CONTEXT_DIM, LinUCBRecommender
+from src.rl.model_registry import ModelRegistry
+from src.rl.low_rank import LowRankModelRegistry
+from src.rl.context_pipeline import ContextPipeline
+from src.rl.delta_sync import DeltaError
+from src.rl.snapshot import read_header
+
+def _dense_A(registry, i):
+    return np.diag(registry.D[i]) + registry.U[i] @ registry.U[i].T
+
+class TestLowRankCovariance(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(11)
+
+    def _feed(self, recs, n=60, d=CONTEXT_DIM):
+        for _ in range(n):
+            x = self.rng.normal(size=(d, 1))
+            r = float(self.rng.uniform(-1.5, 1.0))
+            for rec in recs:
+                rec.update('sad', 'yoga', x, r)
+
+    def test_full_rank_matches_dense_model(self):
+        full = LinUCBRecommender()
+        lowrank = LinUCBRecommender(covariance='lowrank', rank=CONTEXT_DIM)
+        self._feed([full, lowrank])
+        X = self.rng.normal(size=(8, CONTEXT_DIM))
+        for a, b in zip(full.score_batch('sad', 'yoga', X), lowrank.score_batch('sad', 'yoga', X)):
+            np.testing.assert_allclose(b, a, rtol=1e-8, atol=1e-10)
+        self.assertEqual(lowrank.total_interactions, 60)
+        self.assertEqual(lowrank.alpha, full.alpha)
+
+    def test_truncation_keeps_diagonal_exact(self):
+        d = 40
+        rec = LinUCBRecommender(context_dim=d, covariance='lowrank', rank=4, lambda_forget=0.97)
+        A = np.identity(d)
+        for _ in range(30):
+            X = self.rng.normal(size=(3, d))
+            rec.update_batch('sad', 'yoga', X, self.rng.normal(size=3))
+            weights = 0.97 ** np.arange(2, -1, -1)
+            A = 0.97 ** 3 * A + (X.T * weights) @ X
+        slot = rec.registry.index['sad_yoga']
+        np.testing.assert_allclose(np.diag(_dense_A(rec.registry, slot)), np.diag(A), rtol=1e-10)
+
+    def test_scores_match_dense_reconstruction(self):
+        d = 30
+        rec = LinUCBRecommender(context_dim=d, covariance='lowrank', rank=5)
+        self._feed([rec], n=50, d=d)
+        registry = rec.registry
+        slot = registry.index['sad_yoga']
+        A_inv = np.linalg.inv(_dense_A(registry, slot))
+        X = self.rng.normal(size=(6, d))
+        means, unc, _ = rec.score_batch('sad', 'yoga', X)
+        np.testing.assert_allclose(means, X @ (A_inv @ registry.b[slot]), rtol=1e-8)
+        np.testing.assert_allclose(unc, rec.alpha * np.sqrt(np.einsum('ij,jk,ik->i', X, A_inv, X)), rtol=1e-8)
+        ucb, uncertainty = rec.get_ucb_score('sad', 'yoga', X[0].reshape(-1, 1))
+        self.assertAlmostEqual(ucb, means[0] + unc[0])
+        self.assertAlmostEqual(uncertainty, unc[0])
+
+    def test_models_expose_dense_reconstructions(self):
+        d = 30
+        rec = LinUCBRecommender(context_dim=d, covariance='lowrank', rank=5)
+        self._feed([rec], n=50, d=d)
+        rec.update('calm', 'music', self.rng.normal(size=(d, 1)), 0.5)
+        for key, model in rec.models.items():
+            slot = rec.registry.index[key]
+            np.testing.assert_allclose(model.A, _dense_A(rec.registry, slot), rtol=1e-12)
+            np.testing.assert_allclose(model.A_inv, np.linalg.inv(model.A), rtol=1e-8, atol=1e-12)
+            np.testing.assert_allclose(model.A_inv @ model.b, model.theta, rtol=1e-8, atol=1e-12)
+        with self.assertRaises(TypeError):
+            rec.models['sad_yoga'].A = np.identity(d)
+
+    def test_memory_is_linear_in_dim(self):
+        d = 419
+        self.assertLess(LowRankModelRegistry.nbytes(d, 1, rank=16) * 20, ModelRegistry.nbytes(d, 1))
+
+    def test_snapshot_round_trip(self):
+        rec = LinUCBRecommender(covariance='lowrank', rank=6)
+        self._feed([rec])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'lowrank.snap')
+            rec.save_snapshot(path)
+            self.assertEqual(read_header(path)['rank'], 6)
+            loaded = LinUCBRecommender(covariance='lowrank', rank=6)
+            loaded.load(path)
+        self.assertTrue(loaded.low_rank)
+        X = self.rng.normal(size=(5, CONTEXT_DIM))
+        for a, b in zip(rec.score_batch('sad', 'yoga', X), loaded.score_batch('sad', 'yoga', X)):
+            np.testing.assert_array_equal(b, a)
+        self.assertEqual(loaded.total_interactions, 60)
+
+    def test_structured_scoring_and_delta_sync(self):
+        rec = LinUCBRecommender(covariance='lowrank', rank=8)
+        self._feed([rec])
+        X = rec.build_context_matrix('sad', 'yoga', self.rng.uniform(size=(4, 5)), {'avg_feedback': 0.2})
+        for a, b in zip(rec.score_batch('sad', 'yoga', X), rec.score_structured('sad', 'yoga', X[:, 11:])):
+            np.testing.assert_allclose(b, a)
+        with self.assertRaises(DeltaError):
+            rec.export_delta()
+        with self.assertRaises(ValueError):
+            LinUCBRecommender(covariance='sparse')
+
+class TestContextPipeline(unittest.TestCase):
+    def test_seeded_and_layout_preserving(self):
+        rng = np.random.default_rng(0)
+        base = rng.normal(size=(5, CONTEXT_DIM))
+        ext = rng.normal(size=(5, 400))
+        for method in ('hash', 'projection'):
+            a = ContextPipeline.from_config({'in_dim': 400, 'out_dim': 32, 'method': method, 'seed': 4})
+            b = ContextPipeline(400, 32, method=method, seed=4)
+            self.assertEqual(a.context_dim, CONTEXT_DIM + 32)
+            X = a.transform(base, ext)
+            np.testing.assert_array_equal(X, b.transform(base, ext))
+            np.testing.assert_array_equal(X[:, :CONTEXT_DIM], base)
+        with self.assertRaises(ValueError):
+            ContextPipeline(400, method='pca')
+
+    def test_norms_preserved_on_average(self):
+        rng = np.random.default_rng(1)
+        F = rng.normal(size=(500, 400))
+        norms = np.linalg.norm(F, axis=1) ** 2
+        for method in ('hash', 'projection'):
+            projected = ContextPipeline(400, 64, method=method, seed=2).projection.transform(F)
+            ratio = np.linalg.norm(projected, axis=1) ** 2 / norms
+            self.assertAlmostEqual(ratio.mean(), 1.0, delta=0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.model_registry import ModelRegistry
+from src.rl.linucb_recommender import LinUCBRecommender
+
+class TestModelRegistry(unittest.TestCase):
+    def test_growth_preserves_slots(self):
+        registry = ModelRegistry(context_dim=3, capacity=2)
+        first = registry.slot('sad_yoga')
+        registry.A[first] = 5 * np.identity(3)
+        for i in range(10):
+            registry.slot(f'key_{i}')
+        
+        self.assertEqual(len(registry), 11)
+        self.assertGreaterEqual(registry.capacity, 11)
+        self.assertEqual(registry.slot('sad_yoga'), first)
+        self.assertTrue(np.array_equal(registry.A[first], 5 * np.identity(3)))
+        self.assertTrue(registry.A.flags['C_CONTIGUOUS'])
+
+    def test_external_buffer_views(self):
+        buf = bytearray(ModelRegistry.nbytes(4, 3))
+        registry = ModelRegistry(context_dim=4, capacity=3, buffer=buf)
+        registry.slot('a')
+        registry.theta[0] = [1, 2, 3, 4]
+        
+        offset, shape, dtype = ModelRegistry.layout(4, 3)['theta']
+        view = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        self.assertTrue(np.array_equal(view[0], [1, 2, 3, 4]))
+
+    def test_pickle_roundtrip_publishes_loaded_state(self):
+        import pickle
+        rec = LinUCBRecommender()
+        ctx = rec.build_context_vector('sad', 'yoga', np.ones(5), {})
+        rec.update('sad', 'yoga', ctx, 1.0)
+        
+        restored = pickle.loads(pickle.dumps(rec.registry))
+        snap = restored.snapshot(restored.slot('sad_yoga'))
+        np.testing.assert_allclose(snap.theta, rec.registry.theta[0])
+        np.testing.assert_allclose(snap.A_inv, rec.registry.A_inv[0])
+
+    def test_score_categories_matches_score_batch(self):
+        rec = LinUCBRecommender()
+        rng = np.random.default_rng(2)
+        for cat in ('yoga', 'reading'):
+            for _ in range(10):
+                ctx = rec.build_context_vector('tired', cat, rng.normal(size=5), {})
+                rec.update('tired', cat, ctx, 1.0)
+        
+        feats = rng.normal(size=(6, 5))
+        X = np.stack([rec.build_context_matrix('tired', cat, feats, {}) for cat in ('yoga', 'reading')])
+        _, _, ucb = rec.score_categories('tired', ['yoga', 'reading'], X)
+        for j, cat in enumerate(('yoga', 'reading')):
+            np.testing.assert_allclose(ucb[j], rec.score_batch('tired', cat, X[j])[2])
+
+if __name__ == '__main__':
+    unittest.main()
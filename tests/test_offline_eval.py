@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.offline_eval import Impression, ImpressionLog, evaluate, sweep
+from src.utils.metrics import StreamingMean
+
+
+def _uniform_log(n, k=4, d=19, seed=0):
+    """Uniformly random logging policy over k candidates with linear rewards."""
+    rng = np.random.default_rng(seed)
+    theta = rng.normal(size=d)
+    impressions = []
+    for _ in range(n):
+        X = rng.uniform(0, 1, size=(k, d))
+        action = int(rng.integers(k))
+        reward = float(X[action] @ theta / d + rng.normal(scale=0.05))
+        impressions.append(Impression('sad', 'yoga', X, action, 1.0 / k, reward))
+    return impressions
+
+
+class TestOfflineEval(unittest.TestCase):
+    def test_streaming_mean_matches_numpy(self):
+        values = np.random.default_rng(3).normal(size=1000)
+        stats = StreamingMean()
+        for v in values:
+            stats.add(v)
+        self.assertAlmostEqual(stats.mean, values.mean())
+        self.assertAlmostEqual(stats.variance, values.var(ddof=1))
+        self.assertEqual(stats.max, values.max())
+
+    def test_estimators_agree_and_beat_logging_policy(self):
+        impressions = _uniform_log(3000)
+        logged_mean = np.mean([imp.reward for imp in impressions])
+        result = evaluate(impressions, alpha=0.5, lambda_forget=1.0)
+
+        self.assertEqual(result['events'], 3000)
+        self.assertAlmostEqual(result['match_rate'], result['replay']['count'] / 3000)
+        self.assertGreater(result['replay']['mean'], logged_mean)
+        self.assertAlmostEqual(result['ips']['mean'], result['replay']['mean'], delta=0.1)
+        self.assertAlmostEqual(result['dr']['mean'], result['replay']['mean'], delta=0.05)
+        self.assertLess(result['dr']['stderr'], result['ips']['stderr'])
+
+    def test_sweep_over_saved_log(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'impressions.npz')
+            log = ImpressionLog.from_impressions(_uniform_log(300))
+            log.save(path)
+            self.assertEqual(len(ImpressionLog.load(path)), 300)
+
+            report = sweep(path, alphas=[0.5, 1.0], lambdas=[0.99, 1.0], workers=2)
+            self.assertEqual(report['configs'], 4)
+            self.assertEqual(report['events'], 4 * 300)
+            self.assertGreater(report['events_per_sec'], 0)
+            dr = [r['dr']['mean'] for r in report['results']]
+            self.assertEqual(dr, sorted(dr, reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
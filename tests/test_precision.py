@@ -0,0 +1,108 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.linucb_recommender import LinUCBRecommender
+from src.rl.model_registry import ModelRegistry
+from src.rl.simulator import BanditSimulator
+from src.rl.snapshot import read_header
+
+class TestReducedPrecision(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(2)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _feed(self, *recs, n=200):
+        for i in range(n):
+            emotion = ['sad', 'calm'][i % 2]
+            ctx = recs[0].build_context_vector(emotion, 'yoga', self.rng.uniform(size=5), {'avg_feedback': 0.1})
+            reward = float(self.rng.uniform(-1.5, 1.0))
+            for rec in recs:
+                rec.update(emotion, 'yoga', ctx, reward)
+
+    def test_float32_halves_parameter_memory(self):
+        full = ModelRegistry.nbytes(19, 64)
+        half = ModelRegistry.nbytes(19, 64, np.float32)
+        self.assertLess(half, 0.51 * full)
+        rec = LinUCBRecommender(precision='float32')
+        self.assertEqual(rec.registry.A.dtype, np.float32)
+        self.assertEqual(rec.get_statistics()['precision'], 'float32')
+        with self.assertRaises(ValueError):
+            LinUCBRecommender(precision='float16')
+        with self.assertRaises(ValueError):
+            LinUCBRecommender(precision='float32', registry=ModelRegistry(19))
+
+    def test_float32_tracks_float64_rankings(self):
+        sim = BanditSimulator(n_users=300, n_videos=300, seed=4, shadow=LinUCBRecommender(precision='float32'))
+        report = sim.run(3000)['shadow']
+        self.assertGreater(report['top1_agreement'], 0.97)
+        self.assertGreater(report['rank_correlation'], 0.99)
+        self.assertLess(report['memory_ratio'], 0.51)
+        self.assertEqual(report['shadow_precision_alerts'], 0)
+
+    def test_updates_accumulate_in_float64(self):
+        rec = LinUCBRecommender(precision='float32')
+        self._feed(rec)
+        model = rec.models['sad_yoga']
+        self.assertEqual(model.A.dtype, np.float64)
+        self.assertEqual(model.interaction_count, 100)
+
+    def test_eigenvalue_floor_only_applies_to_the_inverse(self):
+        rec = LinUCBRecommender(precision='float32')
+        self._feed(rec, n=20)
+        model = rec.models['sad_yoga']
+        A = np.identity(19)
+        A[3, 3] = 1e-9  # Decayed below the floor
+        model.A = A
+        rec._refactor_reduced(model)
+        np.testing.assert_array_equal(model.A, A.astype(np.float32))
+        expected = np.identity(19)
+        expected[3, 3] = 1.0 / rec.min_eigenvalue
+        np.testing.assert_allclose(model.A_inv, expected, rtol=1e-6)
+        np.testing.assert_allclose(model.theta, expected @ model.b, rtol=1e-5)
+        self.assertEqual(rec.precision_alerts, {})
+
+    def test_snapshot_records_and_converts_precision(self):
+        rec64, rec32 = LinUCBRecommender(), LinUCBRecommender(precision='float32')
+        self._feed(rec64, rec32)
+        path = os.path.join(self.tmpdir.name, 'linucb_state.snap')
+        rec32.save_snapshot(path)
+        self.assertEqual(read_header(path)['dtype'], np.float32)
+        self.assertLess(os.path.getsize(path), 0.6 * self._snapshot_size(rec64))
+
+        same = LinUCBRecommender(precision='float32')
+        same.load(path)
+        self.assertEqual(same.registry.dtype, np.float32)
+        np.testing.assert_array_equal(same.registry.theta[:2], rec32.registry.theta[:2])
+
+        promoted = LinUCBRecommender()
+        promoted.load(path)
+        self.assertEqual(promoted.registry.dtype, np.float64)
+        X = self.rng.uniform(size=(4, 19))
+        for a, b in zip(promoted.score_batch('sad', 'yoga', X), rec64.score_batch('sad', 'yoga', X)):
+            np.testing.assert_allclose(a, b, atol=1e-3)
+
+    def test_pickle_path_honors_precision(self):
+        rec = LinUCBRecommender()
+        self._feed(rec)
+        path = os.path.join(self.tmpdir.name, 'linucb_models.pkl')
+        rec.save(path)
+        loaded = LinUCBRecommender(precision='float32')
+        loaded.load(path)
+        self.assertEqual(loaded.registry.dtype, np.float32)
+        self.assertEqual(loaded.total_interactions, 200)
+
+    def _snapshot_size(self, rec):
+        path = os.path.join(self.tmpdir.name, 'reference.snap')
+        rec.save_snapshot(path)
+        return os.path.getsize(path)
+
+if __name__ == '__main__':
+    unittest.main()
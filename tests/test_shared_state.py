@@ -0,0 +1,220 @@
+import unittest
+import time
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.checkpoint import CheckpointManager
+from src.rl.linucb_recommender import LinUCBRecommender
+from src.rl.shared_state import SharedCheckpointManager, SharedLinUCBRecommender
+
+CATEGORIES = ['yoga', 'music', 'meditation']
+
+
+def _events(seed, n):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        yield 'sad', CATEGORIES[seed % len(CATEGORIES)], rng.normal(size=(19, 1)), float(rng.uniform(-1.5, 1.0))
+
+
+def _worker(name, lock_dir, seed, n):
+    recommender = SharedLinUCBRecommender(name, lambda_forget=1.0, lock_dir=lock_dir)
+    for emotion, category, ctx, reward in _events(seed, n):
+        recommender.update(emotion, category, ctx, reward)
+    recommender.close()
+
+
+def _logging_worker(name, lock_dir, directory, seed, n):
+    recommender = SharedLinUCBRecommender(name, lambda_forget=1.0, lock_dir=lock_dir)
+    checkpointer = SharedCheckpointManager(recommender, directory)
+    checkpointer.attach()
+    for event in _events(seed, n):
+        checkpointer.apply(*event)
+    checkpointer.stop()
+    recommender.close()
+
+
+class TestSharedState(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.name = f'linucb_test_{os.getpid()}'
+        self.owner = SharedLinUCBRecommender(self.name, lambda_forget=1.0, lock_dir=self.tmpdir.name)
+
+    def tearDown(self):
+        self.owner.unlink()
+        self.owner.close()
+        self.tmpdir.cleanup()
+
+    def _attach(self):
+        return SharedLinUCBRecommender(self.name, lambda_forget=1.0, lock_dir=self.tmpdir.name)
+
+    def test_updates_visible_across_attachments(self):
+        other = self._attach()
+        self.assertTrue(self.owner.created)
+        self.assertFalse(other.created)
+        ctx = self.owner.build_context_vector('sad', 'yoga', np.ones(5), {})
+        before = other.get_ucb_score('sad', 'yoga', ctx)
+
+        self.owner.update('sad', 'yoga', ctx, 1.0)
+        after = other.get_ucb_score('sad', 'yoga', ctx)
+        self.assertNotEqual(before, after)
+        self.assertEqual(other.total_interactions, 1)
+        self.assertEqual(after, self.owner.get_ucb_score('sad', 'yoga', ctx))
+        other.close()
+
+    def test_only_creator_leads(self):
+        other = self._attach()
+        self.assertTrue(self.owner.leader)
+        self.assertFalse(other.try_lead())
+        other.close()
+
+    def test_seed_only_fills_empty_segment(self):
+        source = LinUCBRecommender(lambda_forget=1.0)
+        for event in _events(1, 10):
+            source.update(*event)
+        path = os.path.join(self.tmpdir.name, 'state.snap')
+        source.save_snapshot(path)
+
+        self.owner.load_snapshot(path)
+        self.assertEqual(self.owner.total_interactions, 10)
+        np.testing.assert_allclose(self.owner.models['sad_music'].theta, source.models['sad_music'].theta)
+
+        self.owner.update('sad', 'yoga', np.ones((19, 1)), 1.0)
+        other = self._attach()
+        other.load_snapshot(path)  # Segment is live: must not roll back
+        self.assertEqual(self.owner.total_interactions, 11)
+        other.close()
+
+    def test_multiprocess_updates_match_sequential(self):
+        n = 150
+        ctx = multiprocessing.get_context('spawn')
+        procs = [ctx.Process(target=_worker, args=(self.name, self.tmpdir.name, seed, n)) for seed in range(4)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        # Forgetting disabled, so per-key updates commute and the result is order independent
+        reference = LinUCBRecommender(lambda_forget=1.0)
+        for seed in range(4):
+            for event in _events(seed, n):
+                reference.update(*event)
+
+        self.assertEqual(self.owner.total_interactions, 4 * n)
+        self.assertAlmostEqual(self.owner.alpha, reference.alpha)
+        self.assertEqual(set(self.owner.models), set(reference.models))
+        for key, model in reference.models.items():
+            shared = self.owner.models[key]
+            self.assertEqual(shared.interaction_count, model.interaction_count)
+            np.testing.assert_allclose(shared.A, model.A, atol=1e-9)
+            np.testing.assert_allclose(shared.theta, model.theta, atol=1e-6)
+
+    def _recovered(self, directory):
+        recovered = LinUCBRecommender(lambda_forget=1.0)
+        CheckpointManager(recovered, directory).recover()
+        return recovered
+
+    def _assert_same_models(self, actual, expected):
+        self.assertEqual(set(actual.models), set(expected.models))
+        for key, model in expected.models.items():
+            np.testing.assert_allclose(actual.models[key].A, model.A, atol=1e-9)
+            np.testing.assert_allclose(actual.models[key].theta, model.theta, atol=1e-6)
+
+    def test_follower_updates_are_logged(self):
+        directory = os.path.join(self.tmpdir.name, 'ckpt')
+        leader = SharedCheckpointManager(self.owner, directory)
+        leader.recover()
+        other = self._attach()
+        follower = SharedCheckpointManager(other, directory)
+        follower.attach()
+
+        reference = LinUCBRecommender(lambda_forget=1.0)
+        for i, event in enumerate(_events(2, 40)):
+            (leader if i % 2 else follower).apply(*event)
+            reference.update(*event)
+            if i == 19:
+                leader.checkpoint()
+        follower.checkpoint()  # Not the leader: fsync only
+        self.assertEqual(leader.wal.last_seq, 40)
+        self.assertEqual(follower.wal.last_seq, 40)
+
+        # Crash without a final snapshot: the tail (half of it from the follower) comes from the log
+        self._assert_same_models(self._recovered(directory), reference)
+        follower.stop()
+        other.close()
+
+    def test_follower_takes_over_snapshots(self):
+        directory = os.path.join(self.tmpdir.name, 'ckpt')
+        leader = SharedCheckpointManager(self.owner, directory)
+        leader.recover()
+        other = self._attach()
+        follower = SharedCheckpointManager(other, directory)
+        follower.attach()
+        for event in _events(3, 10):
+            leader.apply(*event)
+        leader.stop()
+        self.owner.registry.close()  # Releases the leader lock
+        self.owner = other
+
+        for event in _events(4, 5):
+            follower.apply(*event)
+        follower.checkpoint()
+        self.assertTrue(other.leader)
+        self.assertEqual(follower._snapshot_seq, 15)
+        self.assertEqual(follower.wal.segments(), [f"{follower.wal.path}.{16:012d}"])
+        follower.stop()
+
+    def test_workers_wait_for_recovery(self):
+        directory = os.path.join(self.tmpdir.name, 'ckpt')
+        os.makedirs(directory)
+        source = LinUCBRecommender(lambda_forget=1.0)
+        for event in _events(5, 10):
+            source.update(*event)
+        source.save_snapshot(os.path.join(directory, 'linucb_state.snap'))
+
+        name = f'{self.name}_recovering'
+        creator = SharedLinUCBRecommender(name, lambda_forget=1.0, lock_dir=self.tmpdir.name, recovering=True)
+        self.addCleanup(creator.close)
+        self.addCleanup(creator.unlink)
+        follower = threading.Thread(target=_logging_worker, args=(name, self.tmpdir.name, directory, 6, 5))
+        follower.start()
+        time.sleep(0.2)
+        self.assertTrue(follower.is_alive())
+        self.assertEqual(creator.total_interactions, 0)
+
+        SharedCheckpointManager(creator, directory).recover()
+        creator.finish_recovery()
+        follower.join()
+
+        # Snapshot seeded once and the follower's updates applied (and logged) once, after it
+        for event in _events(6, 5):
+            source.update(*event)
+        self.assertEqual(creator.total_interactions, 15)
+        self._assert_same_models(creator, source)
+        self._assert_same_models(self._recovered(directory), source)
+
+    def test_multiprocess_log_recovers_every_update(self):
+        directory = os.path.join(self.tmpdir.name, 'ckpt')
+        n = 60
+        ctx = multiprocessing.get_context('spawn')
+        procs = [ctx.Process(target=_logging_worker, args=(self.name, self.tmpdir.name, directory, seed, n))
+                 for seed in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        # No worker led (the owner holds the leader lock), so every update lives only in the log
+        self.assertFalse(os.path.exists(os.path.join(directory, 'linucb_state.snap')))
+        self._assert_same_models(self._recovered(directory), self.owner)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.simulator import BanditSimulator
+from src.utils.metrics import LatencyRecorder
+
+
+class TestSimulator(unittest.TestCase):
+    def test_seeded_runs_are_reproducible(self):
+        a = BanditSimulator(n_users=500, n_videos=200, seed=7).run(300)
+        b = BanditSimulator(n_users=500, n_videos=200, seed=7).run(300)
+        self.assertEqual(a['cumulative_regret'], b['cumulative_regret'])
+        self.assertEqual(a['curve'], b['curve'])
+
+    def test_report_contents(self):
+        report = BanditSimulator(n_users=1000, n_videos=200, seed=1).run(400, curve_points=20, trace_memory=True)
+        self.assertEqual(report['curve'][-1]['t'], 400)
+        self.assertLessEqual(len(report['curve']), 21)
+        regrets = [point['cumulative_regret'] for point in report['curve']]
+        self.assertEqual(regrets, sorted(regrets))  # Pseudo-regret is non-negative per step
+        self.assertEqual(report['latency']['score']['calls'], 400)
+        self.assertEqual(report['latency']['update']['calls'], 400)
+        self.assertGreater(report['memory']['linucb_registry_bytes'], 0)
+        self.assertIn('traced_peak_bytes', report['memory'])
+
+    def test_linucb_beats_random(self):
+        linucb = BanditSimulator(n_users=200, n_videos=300, seed=3).run(3000)
+        baseline = BanditSimulator(n_users=200, n_videos=300, seed=3, policy='random').run(3000)
+        self.assertLess(linucb['mean_regret'], baseline['mean_regret'])
+
+    def test_latency_reservoir_is_bounded(self):
+        recorder = LatencyRecorder(reservoir=100)
+        for v in np.linspace(0, 1e-3, 5000):
+            recorder.add(v)
+        self.assertEqual(len(recorder.sample), 100)
+        self.assertEqual(recorder.summary()['calls'], 5000)
+        self.assertAlmostEqual(recorder.summary()['max_us'], 1000.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
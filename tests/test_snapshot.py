@@ -0,0 +1,67 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.linucb_recommender import LinUCBRecommender
+from src.rl.snapshot import SnapshotError, read_snapshot
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'linucb_state.snap')
+        self.rec = LinUCBRecommender()
+        rng = np.random.default_rng(3)
+        for i in range(40):
+            emotion = ['sad', 'happy', 'calm'][i % 3]
+            ctx = self.rec.build_context_vector(emotion, 'yoga', rng.normal(size=5), {})
+            self.rec.update(emotion, 'yoga', ctx, float(rng.uniform(-1.5, 1.0)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        self.rec.save_snapshot(self.path)
+        self.assertEqual(os.listdir(self.tmpdir.name), ['linucb_state.snap'])  # No temp files left behind
+        
+        loaded = LinUCBRecommender()
+        loaded.load(self.path)
+        self.assertEqual(loaded.total_interactions, 40)
+        self.assertEqual(loaded.alpha, self.rec.alpha)
+        for key, model in self.rec.models.items():
+            other = loaded.models[key]
+            np.testing.assert_array_equal(other.A_inv, model.A_inv)
+            np.testing.assert_array_equal(other.theta, model.theta)
+            self.assertEqual(other.interaction_count, model.interaction_count)
+
+    def test_updates_do_not_touch_file(self):
+        self.rec.save_snapshot(self.path)
+        loaded = LinUCBRecommender()
+        loaded.load_snapshot(self.path)
+        loaded.update('sad', 'yoga', np.ones((19, 1)), 1.0)
+        loaded.get_or_create_model('new', 'reading')  # Forces growth off the mapped buffer
+        
+        registry, header = read_snapshot(self.path, verify=True)
+        self.assertEqual(header['n_models'], 3)
+        np.testing.assert_array_equal(registry.theta[registry.index['sad_yoga']],
+                                      self.rec.registry.theta[self.rec.registry.index['sad_yoga']])
+
+    def test_corruption_detected(self):
+        self.rec.save_snapshot(self.path)
+        with open(self.path, 'r+b') as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b'\xff' * 8)
+        with self.assertRaises(SnapshotError):
+            read_snapshot(self.path, verify=True)
+        
+        with open(self.path, 'r+b') as f:
+            f.seek(12)
+            f.write(b'\xff')
+        with self.assertRaises(SnapshotError):
+            read_snapshot(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.linucb_recommender import LinUCBRecommender
+from src.rl.user_models import USER_DIM, HybridLinUCB, UserModelStore, user_features
+
+class TestUserModelStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'users.sqlite')
+        self.rng = np.random.default_rng(5)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_eviction_spills_and_reloads_exactly(self):
+        store = UserModelStore(capacity=4, path=self.path)
+        for step in range(3):
+            for u in range(10):
+                store.update(f'user{u}', self.rng.normal(size=USER_DIM), float(u))
+        reference = UserModelStore(capacity=10)
+        rng = np.random.default_rng(5)
+        for step in range(3):
+            for u in range(10):
+                reference.update(f'user{u}', rng.normal(size=USER_DIM), float(u))
+
+        self.assertEqual(len(store), 4)
+        Z = self.rng.normal(size=(3, USER_DIM))
+        for u in range(10):
+            for a, b in zip(store.scores(f'user{u}', Z), reference.scores(f'user{u}', Z)):
+                np.testing.assert_allclose(a, b, rtol=1e-9)
+            self.assertEqual(store.interaction_count(f'user{u}'), 3)
+        stats = store.stats()
+        self.assertGreater(stats['evictions'], 0)
+        self.assertGreater(stats['reloads'], 0)
+        self.assertEqual(stats['creates'], 10)
+        self.assertLessEqual(stats['resident'], 4)
+
+    def test_memory_is_flat_in_user_count(self):
+        store = UserModelStore(capacity=50)
+        nbytes = store.nbytes
+        for u in range(2000):
+            store.update(str(u), self.rng.normal(size=USER_DIM), 1.0)
+        self.assertEqual(store.nbytes, nbytes)
+        self.assertEqual(len(store), 50)
+        self.assertEqual(store.stats()['spills'], 1950)
+
+    def test_flush_persists_across_instances(self):
+        store = UserModelStore(capacity=8, path=self.path)
+        z = self.rng.normal(size=USER_DIM)
+        store.update('alice', z, 1.0)
+        expected = store.scores('alice', z[None, :])
+        store.close()
+
+        reopened = UserModelStore(capacity=8, path=self.path)
+        for a, b in zip(reopened.scores('alice', z[None, :]), expected):
+            np.testing.assert_allclose(a, b)
+        self.assertEqual(reopened.stats()['reloads'], 1)
+
+    def test_hit_rate_instrumentation(self):
+        store = UserModelStore(capacity=2)
+        z = np.ones(USER_DIM)
+        for user in ['a', 'a', 'b', 'a', 'c', 'b']:
+            store.update(user, z, 1.0)
+        stats = store.stats()
+        self.assertEqual(stats['lookups'], 6)
+        self.assertEqual(stats['hits'], 2)  # Second 'a', third 'a'
+        self.assertEqual(stats['evictions'], 2)
+        self.assertEqual(stats['latency']['lookup']['calls'], 6)
+
+    def test_scoring_unseen_users_does_not_allocate(self):
+        store = UserModelStore(capacity=2)
+        z = self.rng.normal(size=USER_DIM)
+        store.update('a', z, 1.0)
+        store.update('b', z, -1.0)
+        trained = store.scores('a', z[None, :])
+
+        Z = self.rng.normal(size=(3, USER_DIM))
+        for u in range(20):
+            means, variances = store.scores(f'new{u}', Z)
+            np.testing.assert_allclose(means, 0.0)
+            np.testing.assert_allclose(variances, (Z ** 2).sum(axis=1))
+            self.assertEqual(store.interaction_count(f'new{u}'), 0)
+        stats = store.stats()
+        self.assertEqual((stats['evictions'], stats['creates'], len(store)), (0, 2, 2))
+        for a, b in zip(store.scores('a', z[None, :]), trained):
+            np.testing.assert_allclose(a, b)
+
+class TestHybridLinUCB(unittest.TestCase):
+    def test_users_with_opposite_tastes_get_opposite_rankings(self):
+        shared = LinUCBRecommender(alpha=0.1)
+        hybrid = HybridLinUCB(shared, UserModelStore(capacity=16))
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            user = rng.choice(['likes_long', 'likes_short'])
+            features = rng.uniform(size=(1, 5))
+            X = shared.build_context_matrix('calm', 'yoga', features, {})
+            reward = features[0, 0] if user == 'likes_long' else 1.0 - features[0, 0]
+            hybrid.observe(user, 'calm', 'yoga', X[0], reward)
+            shared.update('calm', 'yoga', X[0].reshape(-1, 1), reward)
+
+        candidates = np.full((2, 5), 0.5)
+        candidates[:, 0] = [0.9, 0.1]
+        X = shared.build_context_matrix('calm', 'yoga', candidates, {})
+        long_means, _, _ = hybrid.score('likes_long', 'calm', 'yoga', X)
+        short_means, _, _ = hybrid.score('likes_short', 'calm', 'yoga', X)
+        self.assertGreater(long_means[0], long_means[1])
+        self.assertGreater(short_means[1], short_means[0])
+        self.assertEqual(user_features(X).shape, (2, USER_DIM))
+
+if __name__ == '__main__':
+    unittest.main()
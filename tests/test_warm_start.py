@@ -0,0 +1,98 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rl.linucb_recommender import LinUCBRecommender, calculate_production_reward, calculate_production_rewards
+from src.rl.warm_start import WarmStartTrainer, build_event_contexts, warm_start
+
+
+def _event_log(n, seed=0):
+    rng = np.random.default_rng(seed)
+    log = pd.DataFrame({
+        'timestamp': np.arange(n),
+        'emotion': rng.choice(['sad', 'happy', 'stressed', 'unknown'], n),
+        'category': rng.choice(['yoga', 'exercise', 'meditation'], n),
+        'watch_time': rng.uniform(0, 900, n),
+        'total_duration': rng.uniform(0, 600, n),
+        'feedback': rng.choice(['thumbs_up', 'thumbs_down', None, 'skip'], n),
+        'avg_feedback': rng.uniform(-1, 1, n),
+        'interaction_count': rng.integers(0, 300, n),
+        'success_rate': rng.uniform(0, 1, n),
+    })
+    for i in range(5):
+        log[f'f{i}'] = rng.uniform(0, 1, n)
+    return log
+
+
+class TestWarmStart(unittest.TestCase):
+    def test_vectorized_reward_matches_scalar(self):
+        log = _event_log(500)
+        expected = [calculate_production_reward(w, d, f) for w, d, f in
+                    zip(log['watch_time'], log['total_duration'], log['feedback'])]
+        np.testing.assert_allclose(
+            calculate_production_rewards(log['watch_time'], log['total_duration'], log['feedback']), expected)
+
+    def test_event_contexts_match_context_builder(self):
+        log = _event_log(20)
+        X = build_event_contexts(log)
+        rec = LinUCBRecommender()
+        for i, row in log.iterrows():
+            user = {k: row[k] for k in ('avg_feedback', 'interaction_count', 'success_rate')}
+            ctx = rec.build_context_vector(row['emotion'], row['category'], row[[f'f{j}' for j in range(5)]].to_numpy(float), user)
+            np.testing.assert_allclose(X[i], ctx.ravel())
+
+    def test_matches_sequential_updates(self):
+        log = _event_log(3000)
+        X = build_event_contexts(log)
+        rewards = calculate_production_rewards(log['watch_time'], log['total_duration'], log['feedback'])
+        sequential = LinUCBRecommender(lambda_forget=0.99)
+        for i, row in log.iterrows():
+            sequential.update(row['emotion'], row['category'], X[i].reshape(-1, 1), rewards[i])
+
+        chunks = [log.iloc[i:i + 700] for i in range(0, len(log), 700)]
+        bulk = WarmStartTrainer(lambda_forget=0.99, workers=2).fit(chunks)
+
+        self.assertEqual(bulk.total_interactions, sequential.total_interactions)
+        self.assertAlmostEqual(bulk.alpha, sequential.alpha)
+        self.assertEqual(set(bulk.models), set(sequential.models))
+        for key, model in sequential.models.items():
+            self.assertEqual(bulk.models[key].interaction_count, model.interaction_count)
+            np.testing.assert_allclose(bulk.models[key].A, model.A, rtol=1e-9, atol=1e-9)
+            np.testing.assert_allclose(bulk.models[key].theta, model.theta, atol=1e-6)
+
+    def test_spans_cover_each_key_group_once(self):
+        log = _event_log(2000)
+        trainer = WarmStartTrainer()
+        self.assertIsNone(trainer.workers)  # In-process unless asked for a pool
+        tasks = trainer._tasks(log, 3)
+        self.assertLessEqual(len(tasks), 3)
+        self.assertEqual(sum(len(task[3]) for task in tasks), len(log))
+        keys = [key for task in tasks for key in task[0]]
+        self.assertEqual(sorted(keys), sorted(set(keys)))
+        self.assertEqual(len(trainer._tasks(log)), 1)
+
+        pooled = WarmStartTrainer(workers=3).fit([log])
+        local = WarmStartTrainer().fit([log])
+        for key, model in local.models.items():
+            np.testing.assert_allclose(pooled.models[key].A, model.A, rtol=1e-12)
+
+    def test_writes_servable_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.csv')
+            _event_log(1000).to_csv(path, index=False)
+            trained = warm_start(path, os.path.join(tmp, 'state.snap'), chunk_size=256, workers=1)
+
+            served = LinUCBRecommender()
+            served.load_snapshot(os.path.join(tmp, 'state.snap'))
+            self.assertEqual(served.total_interactions, 1000)
+            ctx = np.full((19, 1), 0.1)
+            self.assertEqual(served.get_ucb_score('sad', 'yoga', ctx), trained.get_ucb_score('sad', 'yoga', ctx))
+
+
+if __name__ == '__main__':
+    unittest.main()